@@ -2,12 +2,28 @@
 import logging
 import os
 import json
-from logging.handlers import RotatingFileHandler
-from flask import Flask, jsonify, request, send_from_directory
+import math
+import time
+import atexit
+import itertools
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from flask import Flask, Response, abort, g, jsonify, request, send_from_directory
 from flask_cors import CORS
 
 from modules.mqtt_client import MQTTClient
 from modules.device_manager import DeviceManager
+from modules.config_watcher import ConfigWatcher
+from modules.status_stream import StatusStream
+from modules.timeseries import TimeSeriesStore, downsample
+from modules.telemetry_log import TelemetryLog
+from modules.worker_sync import WorkerCoordinator, acquire_owner_lock
+from modules.command_tracker import CommandTracker
+from modules.command_scheduler import CommandScheduler
+from modules.outbox import CommandOutbox
+from modules.response_cache import ResponseCache
+from modules.assets import AssetPipeline
+from modules.metrics import registry as metrics, process_rss_bytes
 from config import get_config
 
 # Inicjalizacja aplikacji Flask
@@ -25,13 +41,105 @@ handler.setFormatter(logging.Formatter(
     '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
 ))
 handler.setLevel(logging.INFO)
-app.logger.addHandler(handler)
+
+if app.config['LOG_ASYNC']:
+    # Zapis do pliku i rotacja odbywają się w wątku nasłuchującym,
+    # więc logowanie nie blokuje obsługi żądań ani wiadomości MQTT
+    log_queue = queue.SimpleQueue()
+    log_listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    log_listener.start()
+    atexit.register(log_listener.stop)
+    app.logger.addHandler(QueueHandler(log_queue))
+else:
+    app.logger.addHandler(handler)
 app.logger.setLevel(logging.INFO)
 app.logger.info('Uruchomienie API IoT')
 
-# Inicjalizacja menedżera urządzeń
+# Inicjalizacja menedżera urządzeń (zapis przy zamknięciu rejestruje
+# tylko właściciel - start_owner_services)
 device_manager = DeviceManager(app.config)
 
+# Inicjalizacja strumienia zmian stanu urządzeń
+status_stream = StatusStream(app.config['STATUS_STREAM_BACKLOG'])
+device_manager.add_status_listener(status_stream.publish)
+
+# Inicjalizacja historii wartości urządzeń
+history = TimeSeriesStore(app.config['HISTORY_CAPACITY'])
+device_manager.add_status_listener(history.on_status_change)
+
+# Pakiety plików statycznych: jeden skrypt i arkusz stylów z hashem w nazwie
+assets = None
+if app.config['ASSETS_BUNDLE']:
+    assets = AssetPipeline(app.static_folder, logger=app.logger)
+    try:
+        assets.build()
+    except (OSError, UnicodeDecodeError) as e:
+        app.logger.error(f"Błąd budowania pakietów statycznych: {str(e)}")
+        assets = None
+
+# Zserializowane i skompresowane odpowiedzi dla list urządzeń, pomieszczeń
+# i scen - przebudowywane tylko po zmianie konfiguracji
+response_cache = ResponseCache(app.config['RESPONSE_CACHE_MIN_COMPRESS_SIZE'])
+response_cache.register('devices', lambda: app.json.dumps(device_manager.get_all_devices()).encode('utf-8'))
+response_cache.register('rooms', lambda: app.json.dumps(device_manager.get_all_rooms()).encode('utf-8'))
+response_cache.register('scenes', lambda: app.json.dumps(device_manager.get_all_scenes()).encode('utf-8'))
+
+CACHED_COLLECTIONS = {
+    'put_device': ('devices',),
+    'delete_device': ('devices',),
+    'put_room': ('rooms',),
+    'delete_room': ('rooms',),
+    'put_scene': ('scenes',),
+    'delete_scene': ('scenes',),
+}
+
+
+def _invalidate_response_cache(mutation):
+    # Nieznana zmiana (np. "reload" po imporcie stanu) unieważnia wszystko
+    response_cache.invalidate(*CACHED_COLLECTIONS.get(mutation.get('op'), ()))
+
+
+device_manager.add_registry_listener(_invalidate_response_cache)
+
+
+def open_telemetry(read_only=False):
+    """
+    Otwiera trwały dziennik telemetrii (None, jeśli jest wyłączony).
+
+    Args:
+        read_only (bool): Tryb odczytu dla workerów, które nie zapisują danych
+    """
+    if not app.config['TELEMETRY_ENABLED']:
+        return None
+    return TelemetryLog(
+        app.config['TELEMETRY_DIR'],
+        fsync=app.config['TELEMETRY_FSYNC'],
+        retention_days=app.config['TELEMETRY_RETENTION_DAYS'],
+        max_bytes=app.config['TELEMETRY_MAX_BYTES'],
+        logger=app.logger,
+        read_only=read_only
+    )
+
+
+# Inicjalizacja trwałego dziennika telemetrii - w trybie MULTI_WORKER
+# do czasu wyboru właściciela każdy worker tylko odczytuje dane
+telemetry = open_telemetry(read_only=app.config['MULTI_WORKER'])
+
+# Śledzenie opóźnień komend (potwierdzenie publikacji i odpowiedź urządzenia)
+command_tracker = CommandTracker(app.config['COMMAND_TIMEOUT'])
+device_manager.add_status_listener(command_tracker.on_status_change)
+device_manager.add_message_listener(command_tracker.on_device_message)
+
+# Skrzynka nadawcza komend wydanych bez połączenia z brokerem
+outbox = CommandOutbox(
+    app.config['OUTBOX_FILE'],
+    max_size=app.config['OUTBOX_MAX_SIZE'],
+    ttl=app.config['OUTBOX_TTL'],
+    drain_rate=app.config['OUTBOX_DRAIN_RATE'],
+    fsync=app.config['CONFIG_FSYNC'],
+    logger=app.logger
+)
+
 # Inicjalizacja klienta MQTT
 mqtt_client = MQTTClient(
     app.config['MQTT_BROKER'],
@@ -39,20 +147,200 @@ mqtt_client = MQTTClient(
     app.config['MQTT_USER'],
     app.config['MQTT_PASSWORD'],
     app.config['MQTT_KEEPALIVE'],
-    app.logger
+    app.logger,
+    ingest_queue_size=app.config['MQTT_INGEST_QUEUE_SIZE'],
+    ingest_policy=app.config['MQTT_INGEST_POLICY'],
+    ingest_batch_size=app.config['MQTT_INGEST_BATCH_SIZE'],
+    message_log_limit=app.config['MQTT_LOG_SAMPLE_LIMIT'],
+    message_log_interval=app.config['MQTT_LOG_SAMPLE_INTERVAL'],
+    qos=app.config['MQTT_QOS'],
+    command_tracker=command_tracker,
+    reconnect_min_delay=app.config['MQTT_RECONNECT_MIN_DELAY'],
+    reconnect_max_delay=app.config['MQTT_RECONNECT_MAX_DELAY'],
+    outbox=outbox
 )
 mqtt_client.set_device_manager(device_manager)
 
+# Komendy z API przechodzą przez ogranicznik częstotliwości na temat
+# (np. przeciąganie suwaka wysyła tylko najnowszą wartość)
+command_scheduler = CommandScheduler(
+    mqtt_client, app.config['COMMAND_MIN_INTERVAL'], logger=app.logger
+)
+atexit.register(command_scheduler.close)
+
+# Koordynacja workerów gunicorna (tylko w trybie MULTI_WORKER)
+coordinator = None
+owner_lock = None  # blokada jedynego właściciela (bez MULTI_WORKER)
+if app.config['MULTI_WORKER']:
+    coordinator = WorkerCoordinator(
+        device_manager,
+        mqtt_client,
+        app.config['SYNC_SOCKET'],
+        app.config['SYNC_LOCK_FILE'],
+        app.logger
+    )
+
+
+def start_owner_services():
+    """
+    Uruchamia usługi, które w całym wdrożeniu działają w jednym procesie:
+    zapis i obserwacja pliku konfiguracji, dziennik telemetrii i połączenie
+    z brokerem MQTT (nawiązywane w tle - gotowość zgłasza /api/ready).
+    """
+    global telemetry
+    # Plik skrzynki mógł zmieniać poprzedni właściciel połączenia
+    outbox.reload()
+    device_manager.start_persistence()
+    atexit.register(device_manager.close)
+    device_manager.start_liveness()
+    if app.config['CONFIG_WATCH_INTERVAL']:
+        # Edycje devices.json są stosowane bez restartu (tylko różnice)
+        config_watcher = ConfigWatcher(
+            device_manager.devices_file,
+            device_manager.reload_configuration,
+            interval=app.config['CONFIG_WATCH_INTERVAL'],
+            logger=app.logger
+        )
+        config_watcher.start()
+        atexit.register(config_watcher.close)
+    if telemetry and telemetry.read_only:
+        telemetry = open_telemetry()
+    if telemetry:
+        telemetry.start()
+        atexit.register(telemetry.close)
+        device_manager.add_status_listener(telemetry.on_status_change)
+    mqtt_client.connect()
+
+
+def start_services():
+    """
+    Uruchamia usługi w tle. Wywoływana raz na proces - przez app.run
+    lub w każdym workerze gunicorna (wsgi.py, bez opcji --preload).
+
+    W trybie MULTI_WORKER tylko jeden worker zostaje właścicielem połączenia
+    z brokerem, pozostałe odbierają od niego stan. Bez tego trybu proces
+    odmawia startu, jeśli właścicielem jest już inny proces.
+    """
+    global owner_lock
+    if coordinator:
+        coordinator.start(start_owner_services)
+        return
+    owner_lock = acquire_owner_lock(app.config['SYNC_LOCK_FILE'], app.config['SYNC_LOCK_TIMEOUT'])
+    if owner_lock is None:
+        raise RuntimeError(
+            'Inny proces jest już właścicielem połączenia MQTT i plików stanu - '
+            'kilka workerów wymaga MULTI_WORKER=1'
+        )
+    start_owner_services()
+
+
+def mqtt_connected():
+    """
+    Zwraca stan połączenia z brokerem MQTT widziany przez ten worker.
+    """
+    if coordinator:
+        return coordinator.is_mqtt_connected()
+    return mqtt_client.is_connected()
+
+
+def readiness_checks():
+    """
+    Zwraca warunki gotowości workera do obsługi ruchu.
+    """
+    if coordinator:
+        return {
+            'mqtt': coordinator.is_mqtt_ready(),
+            'state': coordinator.is_synced(),
+        }
+    return {'mqtt': mqtt_client.is_ready()}
+
+# ===================== Metryki =====================
+
+REQUEST_DURATION = metrics.histogram(
+    'http_request_duration_seconds',
+    'Czas obsługi żądań HTTP',
+    labelnames=('method', 'endpoint', 'status')
+)
+
+
+def _devices_by_state():
+    counts = {('online',): 0, ('offline',): 0}
+    for status in list(device_manager.get_all_devices_status().values()):
+        counts[('online',) if status.get('online') else ('offline',)] += 1
+    return counts
+
+
+metrics.gauge('devices', 'Liczba urządzeń według stanu połączenia',
+              _devices_by_state, labelnames=('state',))
+metrics.gauge('mqtt_connected', 'Połączenie z brokerem MQTT (1 - połączono)',
+              lambda: int(mqtt_connected()))
+metrics.gauge('mqtt_ingest_queue_depth', 'Wiadomości oczekujące w kolejce przetwarzania',
+              lambda: mqtt_client.get_ingest_stats()['depth'])
+metrics.gauge('mqtt_ingest_dropped_total', 'Wiadomości odrzucone przez przepełnioną kolejkę',
+              lambda: mqtt_client.get_ingest_stats()['dropped'], kind='counter')
+metrics.gauge('mqtt_outbox_depth', 'Komendy oczekujące w skrzynce nadawczej',
+              lambda: len(outbox))
+metrics.gauge('process_resident_memory_bytes', 'Pamięć rezydentna procesu (RSS)',
+              process_rss_bytes)
+
+
+@app.before_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def _observe_request(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        # Szablon trasy zamiast ścieżki - ograniczona liczba serii
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        REQUEST_DURATION.observe(
+            time.perf_counter() - started,
+            (request.method, endpoint, str(response.status_code))
+        )
+    return response
+
 # ===================== Endpointy WEB =====================
 
 # Endpoint dla strony głównej (serwowanie pliku HTML)
 @app.route('/')
 def index():
-    return send_from_directory('static', 'index.html')
+    if assets is None:
+        return send_from_directory('static', 'index.html')
+    # index.html z odwołaniami do pakietów - zawsze sprawdzany (ETag),
+    # bo wskazuje aktualne nazwy plików
+    response = Response(assets.index_html, mimetype='text/html')
+    response.add_etag()
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+# Endpoint dla pakietów plików statycznych
+@app.route('/dist/<path:filename>')
+def dist_files(filename):
+    """
+    Zwraca pakiet z hashem w nazwie - wariant .br/.gz zgodnie
+    z Accept-Encoding, z bezterminowym buforowaniem w przeglądarce.
+    """
+    found = assets.find(filename, request.accept_encodings) if assets else None
+    if found is None:
+        if assets is None:
+            abort(404)
+        # Pakiet z poprzedniej wersji (np. strona otwarta przed wdrożeniem)
+        found = (filename, None, None)
+    disk_name, encoding, mimetype = found
+    response = send_from_directory(assets.output_dir, disk_name, mimetype=mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Cache-Control'] = f"public, max-age={app.config['ASSETS_MAX_AGE']}, immutable"
+    response.vary.add('Accept-Encoding')
+    return response
 
 # Endpoint dla plików statycznych
 @app.route('/<path:path>')
 def static_files(path):
+    if path == 'index.html':
+        return index()
     return send_from_directory('static', path)
 
 # ===================== Endpointy API =====================
@@ -61,12 +349,34 @@ def static_files(path):
 @app.route('/api/status', methods=['GET'])
 def status():
     """Zwraca status API i połączenia MQTT."""
-    mqtt_status = mqtt_client.is_connected()
+    mqtt_status = mqtt_connected()
     return jsonify({
         'status': 'ok',
-        'mqtt_connected': mqtt_status
+        'mqtt_connected': mqtt_status,
+        'ingest': mqtt_client.get_ingest_stats()
     })
 
+# Endpoint gotowości (np. dla load balancera lub sondy readiness)
+@app.route('/api/ready', methods=['GET'])
+def ready():
+    """
+    Zwraca 200, gdy worker ma aktualny stan i połączenie z brokerem
+    z potwierdzonymi subskrypcjami, w przeciwnym razie 503.
+    W odróżnieniu od /api/status nie zwraca statystyk.
+    """
+    checks = readiness_checks()
+    is_ready = all(checks.values())
+    return jsonify({'ready': is_ready, 'checks': checks}), 200 if is_ready else 503
+
+# Endpoint z metrykami w formacie Prometheusa
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """
+    Zwraca metryki procesu w formacie tekstowym Prometheusa. Liczniki są
+    skumulowane - wartości na sekundę wylicza Prometheus (rate()).
+    """
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
 # Endpoint do sterowania urządzeniami
 @app.route('/api/device/<device_id>/control', methods=['POST'])
 def control_device(device_id):
@@ -86,21 +396,93 @@ def control_device(device_id):
     if not command:
         return jsonify({'error': 'Brak komendy'}), 400
     
-    success = device_manager.send_command(device_id, command, mqtt_client)
+    success, delivery = device_manager.send_command(device_id, command, command_scheduler)
     
-    if success:
-        return jsonify({'status': 'ok', 'message': f'Komenda wysłana do {device_id}'})
+    if success and delivery == 'queued':
+        # Komenda czeka na wysłanie (np. brak połączenia z brokerem)
+        return jsonify({
+            'status': 'ok',
+            'delivery': delivery,
+            'message': f'Komenda dla {device_id} oczekuje na wysłanie'
+        }), 202
+    elif success:
+        return jsonify({'status': 'ok', 'delivery': delivery, 'message': f'Komenda wysłana do {device_id}'})
     else:
         return jsonify({'error': 'Błąd wysyłania komendy'}), 500
 
+def _commands_response(results):
+    """
+    Buduje odpowiedź z wynikami komend zbiorczych.
+    """
+    succeeded = sum(1 for result in results if result['success'])
+    if succeeded == len(results):
+        status = 'ok'
+    elif succeeded:
+        status = 'partial'
+    else:
+        status = 'error'
+    return jsonify({'status': status, 'results': results})
+
+# Endpoint do sterowania wieloma urządzeniami jednym żądaniem
+@app.route('/api/devices/commands', methods=['POST'])
+def control_devices():
+    """
+    Wysyła komendy do wielu urządzeń (np. "wszystko wyłącz").
+
+    Treść żądania: {"commands": [{"device_id" | "device_ids" | "room" | "type": ...,
+    "command": ...}, ...]}. Zwraca wynik dla każdej pozycji.
+    """
+    if not request.json:
+        return jsonify({'error': 'Brak danych JSON'}), 400
+
+    commands = request.json.get('commands')
+    if not isinstance(commands, list) or not commands:
+        return jsonify({'error': 'Brak listy komend'}), 400
+
+    results = device_manager.send_commands(commands, command_scheduler)
+    return _commands_response(results)
+
+# Endpoint zwracający statystyki opóźnień komend
+@app.route('/api/commands/stats', methods=['GET'])
+def command_stats():
+    """
+    Zwraca percentyle opóźnień komend (potwierdzenie publikacji i pełny obieg
+    do odpowiedzi urządzenia) oraz liczby przekroczeń czasu - dla całej
+    instalacji i dla każdego urządzenia.
+    """
+    if coordinator:
+        stats = coordinator.get_command_stats()
+    else:
+        stats = mqtt_client.get_command_stats()
+    if stats is None:
+        return jsonify({'error': 'Statystyki komend są niedostępne'}), 503
+    return jsonify(stats)
+
+def _cached_response(name):
+    """
+    Zwraca kolekcję z pamięci podręcznej odpowiedzi (304 przy zgodnym ETag,
+    wariant gzip/br zgodnie z Accept-Encoding).
+    """
+    entry = response_cache.get(name)
+    if request.if_none_match.contains(entry.etag):
+        response = Response(status=304)
+    else:
+        body, encoding = entry.select(request.accept_encodings)
+        response = Response(body, mimetype='application/json')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+    response.set_etag(entry.etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept-Encoding')
+    return response
+
 # Endpoint do pobierania listy urządzeń
 @app.route('/api/devices', methods=['GET'])
 def get_devices():
     """
     Zwraca listę wszystkich urządzeń.
     """
-    devices = device_manager.get_all_devices()
-    return jsonify(devices)
+    return _cached_response('devices')
 
 # Endpoint do pobierania listy pomieszczeń
 @app.route('/api/rooms', methods=['GET'])
@@ -108,17 +490,161 @@ def get_rooms():
     """
     Zwraca listę wszystkich pomieszczeń.
     """
-    rooms = device_manager.get_all_rooms()
-    return jsonify(rooms)
+    return _cached_response('rooms')
 
 # Endpoint do zwracania aktualnego stanu urządzeń
 @app.route('/api/devices/status', methods=['GET'])
 def devices_status():
     """
     Zwraca aktualny stan wszystkich urządzeń.
+
+    Z parametrem since=<wersja> zwraca tylko urządzenia zmienione po tej
+    wersji. Obsługuje ETag/If-None-Match - gdy nic się nie zmieniło,
+    odpowiada kodem 304.
+    """
+    since = request.args.get('since', type=int)
+    version = device_manager.status_version
+    etag = str(version)
+
+    if request.if_none_match.contains(etag) or (since is not None and since == version):
+        response = Response(status=304)
+    elif since is not None:
+        version, changed, removed = device_manager.get_devices_status_since(since)
+        response = jsonify({'version': version, 'devices': changed, 'removed': removed})
+    else:
+        response = jsonify(device_manager.get_all_devices_status())
+
+    response.set_etag(str(version))
+    response.headers['X-Status-Version'] = str(version)
+    return response
+
+def _sse_event(event, data, event_id=None):
     """
-    status = device_manager.get_all_devices_status()
-    return jsonify(status)
+    Formatuje pojedyncze zdarzenie Server-Sent Events.
+    """
+    message = ''
+    if event_id is not None:
+        message += f'id: {event_id}\n'
+    message += f'event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n'
+    return message
+
+# Endpoint strumieniujący zmiany stanu urządzeń
+@app.route('/api/devices/stream', methods=['GET'])
+def devices_stream():
+    """
+    Strumień Server-Sent Events ze zmianami stanu urządzeń.
+
+    Po połączeniu wysyła pełny stan (snapshot), a następnie pojedyncze zmiany
+    (update/remove). Klient wznawia strumień od kursora przekazanego
+    w nagłówku Last-Event-ID lub parametrze cursor.
+
+    Połączenie jest zamykane po STATUS_STREAM_MAX_AGE sekundach, a EventSource
+    wznawia je po STATUS_STREAM_RETRY_MS - strumień nie zajmuje wątku workera
+    bez końca i przeżywa restart workera.
+    """
+    cursor = status_stream.parse_id(
+        request.headers.get('Last-Event-ID') or request.args.get('cursor')
+    )
+    heartbeat = app.config['STATUS_STREAM_HEARTBEAT']
+    deadline = time.monotonic() + app.config['STATUS_STREAM_MAX_AGE']
+    retry = app.config['STATUS_STREAM_RETRY_MS']
+
+    def generate():
+        last = cursor
+        events = status_stream.events_since(last) if last is not None else None
+        yield f'retry: {retry}\n\n'
+        while True:
+            if events is None:
+                # Brak kursora lub kursor zbyt stary - wyślij pełny stan
+                last = status_stream.cursor
+                snapshot = {
+                    device_id: dict(status)
+                    for device_id, status in device_manager.get_all_devices_status().items()
+                }
+                yield _sse_event('snapshot', snapshot, status_stream.format_id(last))
+            elif events:
+                for seq, device_id, changes in events:
+                    if changes is None:
+                        yield _sse_event('remove', {'device_id': device_id}, status_stream.format_id(seq))
+                    else:
+                        yield _sse_event(
+                            'update', {'device_id': device_id, 'changes': changes},
+                            status_stream.format_id(seq)
+                        )
+                last = events[-1][0]
+            else:
+                # Komentarz podtrzymujący połączenie
+                yield ': keepalive\n\n'
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            events = status_stream.wait_for_events(last, min(heartbeat, remaining))
+
+    return Response(
+        generate(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+# Endpoint zwracający historię wartości urządzenia
+@app.route('/api/device/<device_id>/history', methods=['GET'])
+def device_history(device_id):
+    """
+    Zwraca historię wartości urządzenia zagregowaną po stronie serwera.
+
+    Parametry: value (nazwa wartości), from/to (znaczniki czasu unix,
+    domyślnie ostatnia godzina), step (długość przedziału w sekundach).
+    Każdy przedział zawiera min, max, avg i count.
+    """
+    if not device_manager.get_device(device_id):
+        return jsonify({'error': 'Urządzenie o podanym ID nie istnieje'}), 404
+
+    value_name = request.args.get('value')
+    if not value_name:
+        return jsonify({
+            'error': 'Brak parametru value',
+            'values': history.value_names(device_id)
+        }), 400
+
+    # 0 to poprawny znacznik czasu - domyślne wartości tylko przy braku parametru
+    time_to = request.args.get('to', type=float)
+    if time_to is None:
+        time_to = time.time()
+    time_from = request.args.get('from', type=float)
+    if time_from is None:
+        time_from = time_to - 3600
+    step = request.args.get('step', type=float)
+    # float() przyjmuje też nan i inf - porównania z NaN są zawsze fałszywe
+    if not all(math.isfinite(value) for value in (time_from, time_to, step or 0)) \
+            or time_from >= time_to:
+        return jsonify({'error': 'Nieprawidłowy zakres czasu'}), 400
+
+    # Domyślny krok ogranicza liczbę przedziałów do HISTORY_MAX_POINTS
+    min_step = (time_to - time_from) / app.config['HISTORY_MAX_POINTS']
+    step = max(step or min_step, min_step)
+
+    # Dane starsze niż bufor w pamięci uzupełnij z dziennika telemetrii
+    series = history.get_series(device_id, value_name)
+    memory_from = series.first_timestamp() if series is not None else None
+    if telemetry and (memory_from is None or memory_from > time_from):
+        older_to = time_to if memory_from is None else min(time_to, memory_from)
+        older = (
+            point for point in telemetry.query(device_id, value_name, time_from, older_to)
+            if memory_from is None or point[0] < memory_from
+        )
+        recent = history.range(device_id, value_name, memory_from, time_to) if series is not None else ()
+        points = downsample(itertools.chain(older, recent), time_from, time_to, step)
+    else:
+        points = history.query(device_id, value_name, time_from, time_to, step)
+
+    return jsonify({
+        'device_id': device_id,
+        'value': value_name,
+        'from': time_from,
+        'to': time_to,
+        'step': step,
+        'points': points
+    })
 
 # Endpoint do rejestracji nowego urządzenia
 @app.route('/api/devices', methods=['POST'])
@@ -172,14 +698,97 @@ def delete_device(device_id):
     else:
         return jsonify({'error': message}), 400
 
+# Endpoint do pobierania listy scen
+@app.route('/api/scenes', methods=['GET'])
+def get_scenes():
+    """
+    Zwraca listę wszystkich scen.
+    """
+    return _cached_response('scenes')
+
+# Endpoint do tworzenia sceny
+@app.route('/api/scenes', methods=['POST'])
+def add_scene():
+    """
+    Tworzy nową scenę (nazwany zestaw komend zbiorczych).
+    """
+    if not request.json:
+        return jsonify({'error': 'Brak danych JSON'}), 400
+
+    scene_data = request.json
+    if not scene_data.get('id') or not scene_data.get('name'):
+        return jsonify({'error': 'Brakujące wymagane pola'}), 400
+
+    success, message = device_manager.add_scene(scene_data)
+
+    if success:
+        return jsonify({'status': 'ok', 'message': message})
+    else:
+        return jsonify({'error': message}), 400
+
+# Endpoint do aktualizacji sceny
+@app.route('/api/scene/<scene_id>', methods=['PUT'])
+def update_scene(scene_id):
+    """
+    Aktualizuje istniejącą scenę.
+    """
+    if not request.json:
+        return jsonify({'error': 'Brak danych JSON'}), 400
+
+    scene_data = request.json
+    scene_data['id'] = scene_id  # Upewnij się, że ID jest zgodne z URL
+
+    success, message = device_manager.update_scene(scene_id, scene_data)
+
+    if success:
+        return jsonify({'status': 'ok', 'message': message})
+    else:
+        return jsonify({'error': message}), 400
+
+# Endpoint do usuwania sceny
+@app.route('/api/scene/<scene_id>', methods=['DELETE'])
+def delete_scene(scene_id):
+    """
+    Usuwa scenę.
+    """
+    success, message = device_manager.delete_scene(scene_id)
+
+    if success:
+        return jsonify({'status': 'ok', 'message': message})
+    else:
+        return jsonify({'error': message}), 400
+
+# Endpoint do uruchamiania sceny
+@app.route('/api/scene/<scene_id>/activate', methods=['POST'])
+def activate_scene(scene_id):
+    """
+    Wysyła wszystkie komendy sceny w jednym przebiegu publikacji.
+    """
+    results = device_manager.activate_scene(scene_id, command_scheduler)
+    if results is None:
+        return jsonify({'error': 'Scena o podanym ID nie istnieje'}), 404
+    return _commands_response(results)
+
 # Główna funkcja do uruchomienia aplikacji
-if __name__ == '__main__':
-    # Nawiąż połączenie MQTT
-    mqtt_client.connect()
-    
+def main():
+    """
+    Uruchamia serwer deweloperski (python app.py).
+
+    Przy DEBUG reloader Werkzeuga uruchamia app.py ponownie w procesie
+    potomnym (WERKZEUG_RUN_MAIN=true), a proces nadrzędny tylko go
+    restartuje po zmianie plików. Usługi w tle (i blokada właściciela)
+    są uruchamiane wyłącznie w procesie obsługującym żądania.
+    """
+    if not app.debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        # Uruchom zapis stanu i połączenie MQTT
+        start_services()
+
     # Dodano 0.0.0.0 aby API było dostępne z sieci lokalnej
     app.run(host='0.0.0.0', port=5000, debug=app.config['DEBUG'])
 
+if __name__ == '__main__':
+    main()
+
 
 
 
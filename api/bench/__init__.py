@@ -0,0 +1 @@
+# bench - testy wydajności (python -m bench)
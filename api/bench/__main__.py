@@ -0,0 +1,275 @@
+# bench/__main__.py - Test wydajności API i przetwarzania MQTT
+"""
+Uruchamia aplikację (app.py) z brokerem w pamięci procesu (bench/fake_mqtt.py),
+symuluje N urządzeń publikujących status i wartości oraz klientów HTTP
+odpytujących /api/devices/status i wysyłających komendy /control.
+Wynik (JSON) można porównywać między commitami.
+
+Przykład (z katalogu api):
+    python -m bench --devices 200 --rate 5 --duration 30 --output wynik.json
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from bench.fake_mqtt import FakeBroker, install
+
+MAX_SAMPLES = 200000
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--devices", type=int, default=100, help="liczba symulowanych urządzeń")
+    parser.add_argument("--rate", type=float, default=5.0, help="wiadomości na sekundę na urządzenie")
+    parser.add_argument("--values", type=int, default=2, help="liczba wartości liczbowych na urządzenie")
+    parser.add_argument("--duration", type=float, default=10.0, help="czas trwania w sekundach")
+    parser.add_argument("--http-clients", type=int, default=4, help="liczba równoległych klientów HTTP")
+    parser.add_argument("--control-ratio", type=float, default=0.1, help="udział żądań /control")
+    parser.add_argument("--reply-delay", type=float, default=0.01, help="czas odpowiedzi urządzenia na komendę")
+    parser.add_argument("--seed", type=int, default=1, help="ziarno generatora losowego")
+    parser.add_argument("--output", help="plik wyniku JSON (domyślnie stdout)")
+    return parser.parse_args(argv)
+
+
+def percentiles(samples):
+    """
+    Zwraca liczbę próbek oraz p50/p90/p99/max w milisekundach.
+    """
+    if not samples:
+        return {"count": 0, "p50_ms": None, "p90_ms": None, "p99_ms": None, "max_ms": None}
+    ordered = sorted(samples)
+
+    def at(p):
+        return round(ordered[min(len(ordered) - 1, int(p / 100.0 * len(ordered)))] * 1000, 3)
+
+    return {
+        "count": len(ordered),
+        "p50_ms": at(50),
+        "p90_ms": at(90),
+        "p99_ms": at(99),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+def write_devices(path, count, values):
+    devices = [
+        {
+            "id": f"bench_{i}",
+            "name": f"Bench {i}",
+            "type": "sensor" if i % 2 else "switch",
+            "room": f"room_{i % 10}",
+            "topic": f"iot/device/bench_{i}",
+            "values": [f"v{j}" for j in range(values)],
+        }
+        for i in range(count)
+    ]
+    rooms = [{"id": f"room_{i}", "name": f"Pokój {i}"} for i in range(10)]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"devices": devices, "rooms": rooms, "scenes": []}, f)
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class DevicePublisher:
+    def __init__(self, broker, devices, rate, values):
+        """
+        Symulowane urządzenia publikujące status i wartości ze stałą łączną
+        częstotliwością. Wartości niosą czas wysłania, co pozwala zmierzyć
+        opóźnienie od publikacji do aktualizacji stanu w DeviceManager.
+        """
+        self.broker = broker
+        self.devices = devices
+        self.total_rate = devices * rate
+        self.values = values
+        self.sent = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="bench-publisher", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        tick = 0.01
+        started = time.monotonic()
+        while not self._stop.is_set():
+            due = int((time.monotonic() - started) * self.total_rate)
+            while self.sent < due:
+                i = self.sent
+                device = i % self.devices
+                slot = (i // self.devices) % (self.values + 1)
+                base = f"iot/device/bench_{device}"
+                if slot == 0 or not self.values:
+                    self.broker.publish(f"{base}/status", "on" if i % 2 else "off")
+                else:
+                    self.broker.publish(f"{base}/value/v{slot - 1}", repr(time.time()))
+                self.sent += 1
+            self._stop.wait(tick)
+
+
+def http_client(port, devices, control_ratio, deadline, samples, errors, rng):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    version = None
+    while time.monotonic() < deadline:
+        if rng.random() < control_ratio:
+            name = "control"
+            device_id = f"bench_{rng.randrange(devices)}"
+            method, path = "POST", f"/api/device/{device_id}/control"
+            body = json.dumps({"command": rng.choice(["on", "off"])})
+        else:
+            name = "devices_status"
+            method, path, body = "GET", "/api/devices/status", None
+            if version is not None and rng.random() < 0.5:
+                path += f"?since={version}"
+        started = time.perf_counter()
+        try:
+            connection.request(method, path, body=body, headers={"Content-Type": "application/json"})
+            response = connection.getresponse()
+            response.read()
+            if response.status >= 500:
+                errors[name] = errors.get(name, 0) + 1
+            version = response.getheader("X-Status-Version") or version
+        except (OSError, http.client.HTTPException):
+            errors[name] = errors.get(name, 0) + 1
+            connection.close()
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+            continue
+        if len(samples[name]) < MAX_SAMPLES:
+            samples[name].append(time.perf_counter() - started)
+    connection.close()
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    workdir = tempfile.mkdtemp(prefix="home_app_bench_")
+
+    # Aplikacja czyta konfigurację przy imporcie - ścieżki tymczasowe i broker
+    # w pamięci muszą być ustawione wcześniej
+    devices_file = os.path.join(workdir, "devices.json")
+    write_devices(devices_file, args.devices, args.values)
+    os.environ.update({
+        "DEVICES_FILE": devices_file,
+        "TELEMETRY_DIR": os.path.join(workdir, "telemetry"),
+        "LOG_FILE": os.path.join(workdir, "logs", "api.log"),
+        "STATUS_SNAPSHOT_FILE": os.path.join(workdir, "status.json"),
+        "OUTBOX_FILE": os.path.join(workdir, "outbox.json"),
+        "MULTI_WORKER": "0",
+        "SYNC_LOCK_FILE": os.path.join(workdir, "sync.lock"),
+    })
+    broker = FakeBroker(reply_delay=args.reply_delay)
+    install(broker)
+
+    import app as application
+    from modules.metrics import process_rss_bytes
+    from werkzeug.serving import make_server
+
+    # Opóźnienie od publikacji wartości do aktualizacji stanu
+    ingest_latency = []
+
+    def on_status(device_id, changes):
+        if changes and "values" in changes and len(ingest_latency) < MAX_SAMPLES:
+            now = time.time()
+            for payload in changes["values"].values():
+                try:
+                    ingest_latency.append(now - float(payload))
+                except (TypeError, ValueError):
+                    pass
+
+    application.device_manager.add_status_listener(on_status)
+    application.start_services()
+
+    server = make_server("127.0.0.1", 0, application.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="bench-http", daemon=True).start()
+
+    rss_start = process_rss_bytes()
+    publisher = DevicePublisher(broker, args.devices, args.rate, args.values)
+    samples = {"devices_status": [], "control": []}
+    errors = {}
+    deadline = time.monotonic() + args.duration
+    clients = [
+        threading.Thread(
+            target=http_client,
+            args=(server.port, args.devices, args.control_ratio, deadline, samples, errors,
+                  random.Random(args.seed + i)),
+            daemon=True,
+        )
+        for i in range(args.http_clients)
+    ]
+
+    started = time.monotonic()
+    publisher.start()
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    publisher.stop()
+    elapsed = time.monotonic() - started
+
+    # Poczekaj na opróżnienie kolejki przetwarzania
+    drain_deadline = time.monotonic() + 10
+    while application.mqtt_client.get_ingest_stats()["depth"] and time.monotonic() < drain_deadline:
+        time.sleep(0.05)
+    ingest = application.mqtt_client.get_ingest_stats()
+    rss_end = process_rss_bytes()
+    server.shutdown()
+
+    result = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "params": vars(args),
+        "duration_s": round(elapsed, 3),
+        "mqtt": {
+            "published_by_devices": publisher.sent,
+            "received": ingest["received"],
+            "processed": ingest["processed"],
+            "dropped": ingest["dropped"],
+            "coalesced": ingest["coalesced"],
+            "max_queue_depth": ingest["max_depth"],
+            "messages_per_second": round(ingest["processed"] / elapsed, 1),
+            "ingest_latency": percentiles(ingest_latency),
+        },
+        "http": {
+            name: dict(
+                percentiles(values),
+                requests_per_second=round(len(values) / elapsed, 1),
+                errors=errors.get(name, 0),
+            )
+            for name, values in samples.items()
+        },
+        "commands": application.mqtt_client.get_command_stats()["fleet"],
+        "memory": {
+            "rss_start_bytes": rss_start,
+            "rss_end_bytes": rss_end,
+            "rss_growth_bytes": rss_end - rss_start if rss_start and rss_end else None,
+        },
+    }
+
+    output = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
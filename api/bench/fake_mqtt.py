@@ -0,0 +1,262 @@
+# bench/fake_mqtt.py
+import heapq
+import itertools
+import queue
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+
+from modules.topic_router import TopicRouter
+
+
+class FakeMessage:
+    __slots__ = ("topic", "payload", "qos", "retain", "mid")
+
+    def __init__(self, topic, payload, qos=0, retain=False, mid=0):
+        self.topic = topic
+        self.payload = payload
+        self.qos = qos
+        self.retain = retain
+        self.mid = mid
+
+
+class FakeMessageInfo:
+    __slots__ = ("mid", "rc")
+
+    def __init__(self, mid, rc):
+        self.mid = mid
+        self.rc = rc
+
+    def is_published(self):
+        return self.rc == mqtt.MQTT_ERR_SUCCESS
+
+    def wait_for_publish(self, timeout=None):
+        return None
+
+
+class FakeBroker:
+    def __init__(self, reply_delay=0.01):
+        """
+        Broker w pamięci procesu do testów wydajności.
+
+        Przekazuje wiadomości do klientów z pasującą subskrypcją i symuluje
+        urządzenia: na komendę <temat>/command odpowiada po reply_delay
+        wiadomością <temat>/status z treścią komendy.
+
+        Args:
+            reply_delay (float): Opóźnienie odpowiedzi urządzenia w sekundach
+                (None - urządzenia nie odpowiadają)
+        """
+        self.reply_delay = reply_delay
+        self.clients = []
+        self.published = 0  # Wiadomości wysłane przez klientów aplikacji
+        self._retained = {}
+        self._lock = threading.Lock()
+        self._timers = []  # (czas, seq, temat, treść)
+        self._timer_seq = itertools.count()
+        self._timer_event = threading.Condition(self._lock)
+        threading.Thread(target=self._run_timers, name="fake-broker-timers", daemon=True).start()
+
+    def attach(self, client):
+        with self._lock:
+            self.clients.append(client)
+
+    def detach(self, client):
+        with self._lock:
+            if client in self.clients:
+                self.clients.remove(client)
+
+    def publish(self, topic, payload, qos=0, retain=False):
+        """
+        Publikuje wiadomość do wszystkich pasujących subskrybentów
+        (np. symulowane urządzenie wysyłające status).
+        """
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        with self._lock:
+            if retain:
+                self._retained[topic] = payload
+            clients = list(self.clients)
+        for client in clients:
+            client._deliver(topic, payload, qos, False)
+
+    def client_published(self, topic, payload, qos, retain):
+        with self._lock:
+            self.published += 1
+        if retain:
+            with self._lock:
+                self._retained[topic] = payload
+        if self.reply_delay is not None and topic.endswith("/command"):
+            base = topic[:-len("/command")]
+            self.schedule(self.reply_delay, f"{base}/status", payload)
+
+    def retained(self, topic_filter):
+        router = TopicRouter()
+        router.add(topic_filter, True)
+        with self._lock:
+            return [(topic, payload) for topic, payload in self._retained.items() if router.match(topic)]
+
+    def schedule(self, delay, topic, payload):
+        """
+        Publikuje wiadomość po podanym czasie.
+        """
+        with self._lock:
+            heapq.heappush(self._timers, (time.monotonic() + delay, next(self._timer_seq), topic, payload))
+            self._timer_event.notify()
+
+    def _run_timers(self):
+        while True:
+            with self._lock:
+                while not self._timers or self._timers[0][0] > time.monotonic():
+                    timeout = self._timers[0][0] - time.monotonic() if self._timers else None
+                    self._timer_event.wait(timeout)
+                _, _, topic, payload = heapq.heappop(self._timers)
+            self.publish(topic, payload)
+
+
+class FakeClient:
+    def __init__(self, broker, client_id="", clean_session=None, userdata=None, *args, **kwargs):
+        """
+        Zamiennik paho.mqtt.client.Client połączony z FakeBroker.
+
+        Callbacki są wywoływane w osobnym wątku (jak wątek sieciowy paho
+        po loop_start).
+        """
+        self.broker = broker
+        self._userdata = userdata
+        self.on_connect = None
+        self.on_disconnect = None
+        self.on_message = None
+        self.on_publish = None
+        self.on_subscribe = None
+        self._connected = False
+        self._router = TopicRouter()
+        self._mid = itertools.count(1)
+        self._events = queue.SimpleQueue()
+        self._thread = None
+
+    # ===================== Połączenie =====================
+
+    def username_pw_set(self, username, password=None):
+        pass
+
+    def will_set(self, topic, payload=None, qos=0, retain=False, properties=None):
+        self._will = (topic, payload, qos, retain)
+
+    def reconnect_delay_set(self, min_delay=1, max_delay=120):
+        pass
+
+    def connect(self, host, port=1883, keepalive=60, *args, **kwargs):
+        self.broker.attach(self)
+        self._connected = True
+        self._events.put(("connect",))
+        return mqtt.MQTT_ERR_SUCCESS
+
+    connect_async = connect
+
+    def reconnect(self):
+        return self.connect(None)
+
+    def disconnect(self, *args, **kwargs):
+        self.broker.detach(self)
+        was_connected = self._connected
+        self._connected = False
+        if was_connected:
+            self._events.put(("disconnect", 0))
+        return mqtt.MQTT_ERR_SUCCESS
+
+    def is_connected(self):
+        return self._connected
+
+    def loop_start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="fake-mqtt-loop", daemon=True)
+            self._thread.start()
+        return mqtt.MQTT_ERR_SUCCESS
+
+    def loop_stop(self, force=False):
+        if self._thread is not None:
+            self._events.put(None)
+            if self._thread is not threading.current_thread():
+                self._thread.join()
+            self._thread = None
+        return mqtt.MQTT_ERR_SUCCESS
+
+    # ===================== Wiadomości =====================
+
+    def subscribe(self, topic, qos=0, options=None, properties=None):
+        mid = next(self._mid)
+        if not self._connected:
+            return mqtt.MQTT_ERR_NO_CONN, None
+        topics = topic if isinstance(topic, list) else [(topic, qos)]
+        for topic_filter, _ in topics:
+            if topic_filter not in self._router:
+                self._router.add(topic_filter, True)
+                for retained_topic, payload in self.broker.retained(topic_filter):
+                    self._deliver(retained_topic, payload, 0, True)
+        self._events.put(("subscribe", mid, tuple(q for _, q in topics)))
+        return mqtt.MQTT_ERR_SUCCESS, mid
+
+    def unsubscribe(self, topic, properties=None):
+        for topic_filter in topic if isinstance(topic, list) else [topic]:
+            self._router.remove(topic_filter)
+        return mqtt.MQTT_ERR_SUCCESS, next(self._mid)
+
+    def publish(self, topic, payload=None, qos=0, retain=False, properties=None):
+        mid = next(self._mid)
+        if not self._connected:
+            return FakeMessageInfo(mid, mqtt.MQTT_ERR_NO_CONN)
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        self.broker.client_published(topic, payload, qos, retain)
+        self._events.put(("publish", mid))
+        return FakeMessageInfo(mid, mqtt.MQTT_ERR_SUCCESS)
+
+    def _deliver(self, topic, payload, qos, retain):
+        if self._connected and self._router.match(topic):
+            self._events.put(("message", FakeMessage(topic, payload, qos, retain)))
+
+    def loop(self, timeout=1.0, max_packets=1):
+        """
+        Jedna iteracja pętli sieciowej (jak paho Client.loop).
+        """
+        try:
+            event = self._events.get(timeout=timeout)
+        except queue.Empty:
+            event = None
+        while event is not None:
+            self._dispatch(event)
+            try:
+                event = self._events.get_nowait()
+            except queue.Empty:
+                event = None
+        return mqtt.MQTT_ERR_SUCCESS if self._connected else mqtt.MQTT_ERR_NO_CONN
+
+    def _loop(self):
+        while True:
+            event = self._events.get()
+            if event is None:
+                return
+            self._dispatch(event)
+
+    def _dispatch(self, event):
+        kind = event[0]
+        if kind == "message" and self.on_message:
+            self.on_message(self, self._userdata, event[1])
+        elif kind == "publish" and self.on_publish:
+            self.on_publish(self, self._userdata, event[1])
+        elif kind == "subscribe" and self.on_subscribe:
+            self.on_subscribe(self, self._userdata, event[1], event[2])
+        elif kind == "connect" and self.on_connect:
+            self.on_connect(self, self._userdata, {}, 0)
+        elif kind == "disconnect" and self.on_disconnect:
+            self.on_disconnect(self, self._userdata, event[1])
+
+
+def install(broker):
+    """
+    Podmienia paho.mqtt.client.Client na FakeClient połączony z brokerem.
+    Wywoływać przed importem aplikacji.
+    """
+    mqtt.Client = lambda *args, **kwargs: FakeClient(broker, *args, **kwargs)
@@ -0,0 +1,75 @@
+# bench/ingest.py - Koszt obsługi jednej wiadomości w zależności od liczby urządzeń
+"""
+Mierzy czas obsługi wiadomości MQTT w DeviceManager
+(update_device_status_from_mqtt) dla flot o różnej liczbie urządzeń.
+Każde urządzenie ma już status i wartości, a wiadomości przychodzą
+w losowej kolejności: połowa zmienia wartość, połowa powtarza poprzednią
+(odświeża tylko last_seen). Koszt na wiadomość nie powinien rosnąć
+z liczbą urządzeń.
+
+Przykład (z katalogu api):
+    python -m bench.ingest --devices 1000,10000,50000 --messages 200000
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from bench.__main__ import write_devices
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench.ingest", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--devices", default="1000,10000,50000", help="liczby urządzeń (oddzielone przecinkami)")
+    parser.add_argument("--values", type=int, default=2, help="liczba wartości na urządzenie")
+    parser.add_argument("--messages", type=int, default=200000, help="liczba mierzonych wiadomości na flotę")
+    parser.add_argument("--seed", type=int, default=1, help="ziarno generatora losowego")
+    return parser.parse_args(argv)
+
+
+def measure(count, values, messages, rng):
+    from modules.device_manager import DeviceManager
+
+    devices_file = os.path.join(tempfile.mkdtemp(prefix="home_app_ingest_"), "devices.json")
+    write_devices(devices_file, count, values)
+    manager = DeviceManager({"DEVICES_FILE": devices_file, "STATUS_SNAPSHOT_FILE": None, "CONFIG_FSYNC": False})
+
+    # Stan początkowy - każde urządzenie ma status i wszystkie wartości
+    for i in range(count):
+        base = f"iot/device/bench_{i}"
+        manager.update_device_status_from_mqtt(f"{base}/status", "on")
+        for j in range(values):
+            manager.update_device_status_from_mqtt(f"{base}/value/v{j}", "20.0")
+
+    batch = []
+    for n in range(messages):
+        i = rng.randrange(count)
+        reading = f"{20 + n % 100 / 10:.1f}" if n % 2 else "20.0"
+        batch.append((f"iot/device/bench_{i}/value/v{rng.randrange(values)}", reading))
+
+    gc.collect()
+    started = time.perf_counter()
+    for topic, payload in batch:
+        manager.update_device_status_from_mqtt(topic, payload)
+    elapsed = time.perf_counter() - started
+    manager.close()
+    return round(elapsed / messages * 1e6, 2)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    rng = random.Random(args.seed)
+    results = {}
+    for count in (int(value) for value in args.devices.split(",")):
+        results[str(count)] = measure(count, args.values, args.messages, rng)
+
+    print(json.dumps({"params": vars(args), "us_per_message": results}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+# bench/memory.py - Pomiar pamięci zajmowanej przez urządzenia
+"""
+Mierzy pamięć (tracemalloc) zajmowaną przez definicje i statusy urządzeń
+w DeviceManager - w przeliczeniu na jedno urządzenie. Każde urządzenie
+dostaje status i wszystkie wartości, jak po kilku minutach pracy.
+
+Przykład (z katalogu api):
+    python -m bench.memory --devices 10000 --values 2
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+
+from bench.__main__ import write_devices
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench.memory", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--devices", type=int, default=10000, help="liczba urządzeń")
+    parser.add_argument("--values", type=int, default=2, help="liczba wartości na urządzenie")
+    parser.add_argument("--rounds", type=int, default=3, help="liczba wiadomości na status i wartość")
+    return parser.parse_args(argv)
+
+
+def traced_bytes():
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0]
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    from modules.device_manager import DeviceManager
+
+    devices_file = os.path.join(tempfile.mkdtemp(prefix="home_app_memory_"), "devices.json")
+    write_devices(devices_file, args.devices, args.values)
+    config = {"DEVICES_FILE": devices_file, "STATUS_SNAPSHOT_FILE": None, "CONFIG_FSYNC": False}
+
+    tracemalloc.start()
+    start = traced_bytes()
+    manager = DeviceManager(config)
+    loaded = traced_bytes()
+
+    for round_index in range(args.rounds):
+        for i in range(args.devices):
+            base = f"iot/device/bench_{i}"
+            manager.update_device_status_from_mqtt(f"{base}/status", "on" if (i + round_index) % 2 else "off")
+            for j in range(args.values):
+                reading = f"{20 + (i * 7 + j + round_index) % 150 / 10:.1f}"
+                manager.update_device_status_from_mqtt(f"{base}/value/v{j}", reading)
+    updated = traced_bytes()
+    tracemalloc.stop()
+    manager.close()
+
+    result = {
+        "params": vars(args),
+        "bytes_per_device": {
+            "definition": round((loaded - start) / args.devices),
+            "status": round((updated - loaded) / args.devices),
+            "total": round((updated - start) / args.devices),
+        },
+    }
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
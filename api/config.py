@@ -18,16 +18,107 @@ class Config:
     MQTT_USER = os.environ.get("MQTT_USER") or "admin"
     MQTT_PASSWORD = os.environ.get("MQTT_PASSWORD") or "silne_haslo_admin"
     MQTT_KEEPALIVE = 60
+    # Opóźnienie ponownego łączenia z brokerem (wykładnicze, w sekundach)
+    MQTT_RECONNECT_MIN_DELAY = 0.5
+    MQTT_RECONNECT_MAX_DELAY = 60.0
+
+    # Tryb wielu workerów gunicorna: jeden worker łączy się z brokerem,
+    # pozostałe synchronizują stan przez gniazdo Unix (gunicorn.conf.py
+    # włącza go sam przy workers > 1). Bez tego trybu drugi proces nie
+    # wystartuje, jeśli blokady SYNC_LOCK_FILE nie zwolni poprzedni
+    # w ciągu SYNC_LOCK_TIMEOUT sekund
+    MULTI_WORKER = (os.environ.get("MULTI_WORKER") or "0") == "1"
+    SYNC_SOCKET = os.environ.get("SYNC_SOCKET") or "/tmp/home_app_sync.sock"
+    SYNC_LOCK_FILE = os.environ.get("SYNC_LOCK_FILE") or "/tmp/home_app_sync.lock"
+    SYNC_LOCK_TIMEOUT = 30.0
+
+    # Domyślny QoS komend (urządzenie może go nadpisać polem "qos") i czas
+    # oczekiwania na odpowiedź urządzenia w statystykach komend
+    MQTT_QOS = int(os.environ.get("MQTT_QOS") or "0")
+    COMMAND_TIMEOUT = 10.0
+    # Minimalny odstęp komend na ten sam temat w sekundach - komendy
+    # w tym czasie są łączone (wysyłana jest ostatnia), 0 - bez ograniczeń
+    COMMAND_MIN_INTERVAL = 0.1
+
+    # Skrzynka nadawcza komend wydanych bez połączenia z brokerem: na temat
+    # zostaje najnowsza komenda, ważna OUTBOX_TTL sekund (urządzenie może to
+    # nadpisać polem "command_ttl"), wysyłana po połączeniu OUTBOX_DRAIN_RATE/s
+    OUTBOX_FILE = os.environ.get("OUTBOX_FILE") or "/home/kichnu/app/outbox.json"
+    OUTBOX_MAX_SIZE = 1000
+    OUTBOX_TTL = 300.0
+    OUTBOX_DRAIN_RATE = 50.0
+
+    # Kolejka wiadomości przychodzących (drop-oldest, coalesce, block)
+    MQTT_INGEST_QUEUE_SIZE = 10000
+    MQTT_INGEST_POLICY = os.environ.get("MQTT_INGEST_POLICY") or "drop-oldest"
+    MQTT_INGEST_BATCH_SIZE = 100
+
+    # Próbkowanie logów wiadomości MQTT: maks. liczba linii na temat w oknie
+    # (0 - loguj każdą wiadomość), pozostałe trafiają do podsumowania
+    MQTT_LOG_SAMPLE_LIMIT = 5
+    MQTT_LOG_SAMPLE_INTERVAL = 60
+
+    # Zapis konfiguracji urządzeń: dziennik zmian i kompakcja do devices.json
+    # (domyślnie static/config/devices.json)
+    DEVICES_FILE = os.environ.get("DEVICES_FILE")
+    CONFIG_COMPACT_AFTER = 500
+    CONFIG_FLUSH_DELAY = 2.0
+    CONFIG_FSYNC = True
+    # Przeładowanie devices.json po edycji z zewnątrz: odstęp sprawdzania
+    # w sekundach (0 - wyłączone, zmiany wymagają restartu)
+    CONFIG_WATCH_INTERVAL = 2.0
+
+    # Ostatni znany stan urządzeń zapisywany co STATUS_SNAPSHOT_INTERVAL
+    # sekund i odtwarzany przy starcie (pusta ścieżka - wyłączone)
+    STATUS_SNAPSHOT_FILE = os.environ.get("STATUS_SNAPSHOT_FILE", "/home/kichnu/app/status.json")
+    STATUS_SNAPSHOT_INTERVAL = 30.0
+
+    # Wykrywanie urządzeń offline: czas bez wiadomości w sekundach
+    # (0 - wyłączone); urządzenie może go nadpisać polem "heartbeat_timeout"
+    LIVENESS_TIMEOUT = 300
+    LIVENESS_TYPE_TIMEOUTS = {}  # np. {"sensor": 900}
+    LIVENESS_TICK = 1.0
+
+    # Strumień zmian stanu urządzeń (Server-Sent Events)
+    STATUS_STREAM_BACKLOG = 1000
+    STATUS_STREAM_HEARTBEAT = 15
+    # Maksymalny czas jednego połączenia w sekundach - potem serwer je zamyka,
+    # a przeglądarka wznawia strumień od ostatniego zdarzenia (Last-Event-ID)
+    STATUS_STREAM_MAX_AGE = 300
+    STATUS_STREAM_RETRY_MS = 1000
+
+    # Łączenie i minifikacja skryptów oraz stylów przy starcie (static/dist)
+    ASSETS_BUNDLE = True
+    ASSETS_MAX_AGE = 365 * 24 * 3600
+
+    # Odpowiedzi /api/devices, /api/rooms i /api/scenes mniejsze niż
+    # podana liczba bajtów nie są kompresowane
+    RESPONSE_CACHE_MIN_COMPRESS_SIZE = 512
+
+    # Historia wartości urządzeń w pamięci (punktów na serię, 16 B/punkt)
+    HISTORY_CAPACITY = 4096
+    HISTORY_MAX_POINTS = 500
+
+    # Trwały dziennik telemetrii (segmenty na dysku)
+    TELEMETRY_ENABLED = True
+    TELEMETRY_DIR = os.environ.get("TELEMETRY_DIR") or "/home/kichnu/app/telemetry"
+    TELEMETRY_RETENTION_DAYS = 180
+    TELEMETRY_MAX_BYTES = 2 * 1024 * 1024 * 1024
+    TELEMETRY_FSYNC = True
 
     # Konfiguracja logowania
-    LOG_FILE = "/home/kichnu/app/logs/api.log"
+    LOG_FILE = os.environ.get("LOG_FILE") or "/home/kichnu/app/logs/api.log"
     LOG_LEVEL = "INFO"
+    # Zapis logów do pliku w wątku w tle (QueueHandler + QueueListener)
+    LOG_ASYNC = True
 
 
 class DevelopmentConfig(Config):
     """Konfiguracja dla środowiska rozwojowego."""
 
     DEBUG = True
+    # Zmiany w plikach JS/CSS widoczne bez ponownego budowania pakietów
+    ASSETS_BUNDLE = False
 
 
 class ProductionConfig(Config):
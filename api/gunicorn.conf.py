@@ -0,0 +1,17 @@
+# gunicorn.conf.py - Konfiguracja gunicorna (wczytywana automatycznie z katalogu api)
+import os
+
+wsgi_app = "wsgi:app"
+
+# Strumień /api/devices/stream utrzymuje połączenie (do STATUS_STREAM_MAX_AGE),
+# więc workery obsługują żądania w wątkach - przy workerach sync każdy
+# otwarty dashboard blokowałby cały worker, a limit timeout przerywałby strumień
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS") or 32)
+
+
+def on_starting(server):
+    # Przy wielu workerach tylko jeden może łączyć się z brokerem i zapisywać
+    # pliki stanu - włącz koordynację, jeśli nie ustawiono jej jawnie
+    if server.cfg.workers > 1 and "MULTI_WORKER" not in os.environ:
+        os.environ["MULTI_WORKER"] = "1"
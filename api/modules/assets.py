@@ -0,0 +1,295 @@
+# modules/assets.py
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+
+try:
+    import brotli
+except ImportError:  # Brotli jest opcjonalny - bez niego tylko gzip
+    brotli = None
+
+SCRIPT_TAG = re.compile(r'[ \t]*<script src="(/[^"]+\.js)"></script>\n?')
+STYLE_TAG = re.compile(r'<link rel="stylesheet" href="(/[^"]+\.css)" />')
+
+IDENTIFIER_CHARS = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_$\\")
+# Znaki, po których "/" rozpoczyna wyrażenie regularne, a nie dzielenie
+REGEX_PRECEDERS = frozenset("(,=:[!&|?{};+-*%<>~^\n")
+REGEX_KEYWORDS = ("return", "typeof", "case", "do", "else", "in", "of", "new", "delete", "void", "throw")
+
+
+def minify_js(source):
+    """
+    Zachowawcza minifikacja JavaScript: usuwa komentarze, wcięcia i puste
+    linie, nie zmieniając nazw ani treści napisów, szablonów i wyrażeń
+    regularnych. Końce linii są zachowane (automatyczne średniki).
+    """
+    out = []
+    i = 0
+    length = len(source)
+    # Stos zagnieżdżeń ${...} w szablonach - głębokość nawiasów w każdym
+    template_depths = []
+
+    def whitespace(newline):
+        if not out or out[-1] == "\n":
+            return
+        if newline:
+            if out[-1] == " ":
+                out.pop()
+            out.append("\n")
+        elif out[-1] != " ":
+            out.append(" ")
+
+    while i < length:
+        char = source[i]
+
+        if char in " \t\r\n":
+            start = i
+            while i < length and source[i] in " \t\r\n":
+                i += 1
+            whitespace("\n" in source[start:i])
+            continue
+
+        if char == "/" and source.startswith("//", i):
+            end = source.find("\n", i)
+            i = length if end == -1 else end
+            continue
+
+        if char == "/" and source.startswith("/*", i):
+            end = source.find("*/", i + 2)
+            end = length if end == -1 else end + 2
+            whitespace("\n" in source[i:end])
+            i = end
+            continue
+
+        # Spacja zostaje tylko tam, gdzie jest potrzebna (np. "let x", "a + +b")
+        if out and out[-1] == " ":
+            previous = out[-2][-1] if len(out) > 1 else ""
+            if not ((previous in IDENTIFIER_CHARS and char in IDENTIFIER_CHARS)
+                    or (previous in "+-" and char in "+-")):
+                out.pop()
+
+        if char in "'\"":
+            end = _string_end(source, i, char)
+            out.append(source[i:end])
+            i = end
+            continue
+
+        if char == "`" or (char == "}" and template_depths and template_depths[-1] == 0):
+            if char == "}":
+                template_depths.pop()
+            end, opens_expression = _template_end(source, i + 1)
+            out.append(source[i:end])
+            if opens_expression:
+                template_depths.append(0)
+            i = end
+            continue
+
+        if char == "/" and _starts_regex(out):
+            end = _regex_end(source, i)
+            out.append(source[i:end])
+            i = end
+            continue
+
+        if template_depths:
+            if char == "{":
+                template_depths[-1] += 1
+            elif char == "}":
+                template_depths[-1] -= 1
+
+        out.append(char)
+        i += 1
+
+    return "".join(out).strip() + "\n"
+
+
+def _string_end(source, start, quote):
+    i = start + 1
+    while i < len(source):
+        if source[i] == "\\":
+            i += 2
+            continue
+        if source[i] == quote or source[i] == "\n":
+            return i + 1
+        i += 1
+    return len(source)
+
+
+def _template_end(source, i):
+    """
+    Zwraca (koniec fragmentu szablonu, czy kończy się na "${").
+    """
+    while i < len(source):
+        if source[i] == "\\":
+            i += 2
+            continue
+        if source[i] == "`":
+            return i + 1, False
+        if source.startswith("${", i):
+            return i + 2, True
+        i += 1
+    return len(source), False
+
+
+def _starts_regex(out):
+    text = "".join(out[-8:]).rstrip(" ")
+    if not text:
+        return True
+    if text[-1] in REGEX_PRECEDERS:
+        return True
+    match = re.search(r"[A-Za-z_$][\w$]*$", text)
+    return bool(match) and match.group(0) in REGEX_KEYWORDS
+
+
+def _regex_end(source, start):
+    i = start + 1
+    in_class = False
+    while i < len(source):
+        char = source[i]
+        if char == "\\":
+            i += 2
+            continue
+        if char == "\n":
+            break
+        if char == "[":
+            in_class = True
+        elif char == "]":
+            in_class = False
+        elif char == "/" and not in_class:
+            return i + 1
+        i += 1
+    return i
+
+
+def minify_css(source):
+    """
+    Minifikacja CSS: usuwa komentarze i zbędne białe znaki poza napisami.
+    """
+    parts = re.split(r'("(?:[^"\\\n]|\\.)*"|\'(?:[^\'\\\n]|\\.)*\')', source)
+    for index in range(0, len(parts), 2):
+        text = re.sub(r"/\*.*?\*/", "", parts[index], flags=re.S)
+        text = re.sub(r"\s+", " ", text)
+        text = re.sub(r"\s*([{};,>])\s*", r"\1", text)
+        parts[index] = text.replace(";}", "}")
+    return "".join(parts).strip() + "\n"
+
+
+class AssetPipeline:
+    def __init__(self, static_dir, output_dir=None, logger=None):
+        """
+        Łączy i minifikuje skrypty oraz style wskazane w index.html, zapisuje
+        je pod nazwami z hashem treści (z wariantami .gz/.br) i przepisuje
+        odwołania w index.html.
+
+        Pliki z hashem w nazwie nigdy się nie zmieniają, więc mogą być
+        buforowane przez przeglądarkę bezterminowo (Cache-Control: immutable).
+
+        Args:
+            static_dir (str): Katalog plików statycznych (z index.html)
+            output_dir (str): Katalog wynikowy (domyślnie static/dist)
+            logger: Logger
+        """
+        self.static_dir = static_dir
+        self.output_dir = output_dir or os.path.join(static_dir, "dist")
+        self.logger = logger
+        self.index_html = None
+        self.files = {}  # nazwa pliku -> dostępne kodowania
+
+    def build(self):
+        """
+        Buduje pakiety i przepisany index.html.
+
+        Returns:
+            dict: Manifest - ścieżka źródłowa -> ścieżka pakietu
+        """
+        with open(os.path.join(self.static_dir, "index.html"), "r", encoding="utf-8") as f:
+            html = f.read()
+        os.makedirs(self.output_dir, exist_ok=True)
+        manifest = {}
+
+        # Skrypty w kolejności z index.html (kolejność zależności)
+        scripts = SCRIPT_TAG.findall(html)
+        if scripts:
+            bundle = ";\n".join(minify_js(self._read(path)) for path in scripts)
+            name = self._write("app", ".js", bundle)
+            for path in scripts:
+                manifest[path] = f"/dist/{name}"
+            first = True
+
+            def replace_script(match):
+                nonlocal first
+                if not first:
+                    return ""
+                first = False
+                return match.group(0).replace(match.group(1), f"/dist/{name}")
+
+            html = SCRIPT_TAG.sub(replace_script, html)
+
+        for path in STYLE_TAG.findall(html):
+            stem = os.path.splitext(os.path.basename(path))[0]
+            name = self._write(stem, ".css", minify_css(self._read(path)))
+            manifest[path] = f"/dist/{name}"
+            html = html.replace(f'href="{path}"', f'href="/dist/{name}"')
+
+        self.index_html = html.encode("utf-8")
+        self._write_file("index.html", self.index_html)
+        self._write_file("manifest.json", json.dumps(manifest, indent=2).encode("utf-8"))
+        if self.logger:
+            self.logger.info(f"Zbudowano pakiety statyczne: {', '.join(sorted(set(manifest.values())))}")
+        return manifest
+
+    def find(self, filename, accept_encodings):
+        """
+        Wybiera plik pakietu do wysłania zgodnie z Accept-Encoding.
+
+        Returns:
+            tuple: (nazwa pliku na dysku, kodowanie lub None, typ MIME)
+                lub None, jeśli pakiet nie istnieje
+        """
+        encodings = self.files.get(filename)
+        if encodings is None:
+            return None
+        mimetype = mimetypes.guess_type(filename)[0]
+        for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+            if encoding in encodings and accept_encodings[encoding]:
+                return filename + suffix, encoding, mimetype
+        return filename, None, mimetype
+
+    def _read(self, path):
+        with open(os.path.join(self.static_dir, path.lstrip("/")), "r", encoding="utf-8") as f:
+            return f.read()
+
+    def _write(self, stem, extension, text):
+        data = text.encode("utf-8")
+        name = f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{extension}"
+        encodings = set()
+        self._write_file(name, data)
+        self._write_file(name + ".gz", gzip.compress(data, 9, mtime=0))
+        encodings.add("gzip")
+        if brotli is not None:
+            self._write_file(name + ".br", brotli.compress(data))
+            encodings.add("br")
+        self.files[name] = encodings
+        return name
+
+    def _write_file(self, name, data):
+        path = os.path.join(self.output_dir, name)
+        try:
+            with open(path, "rb") as f:
+                if f.read() == data:
+                    return
+        except OSError:
+            pass
+        # Zapis atomowy - inne workery mogą w tym czasie czytać plik
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+
+if __name__ == "__main__":
+    # Budowa pakietów przy wdrożeniu: python -m modules.assets
+    static = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static")
+    print(json.dumps(AssetPipeline(static).build(), indent=2))
@@ -0,0 +1,154 @@
+# modules/command_scheduler.py
+import heapq
+import threading
+import time
+
+from modules.metrics import registry
+from modules.outbox import QUEUED
+
+COMMANDS_COALESCED = registry.counter(
+    "mqtt_commands_coalesced_total", "Komendy zastąpione nowszą komendą na ten sam temat"
+)
+COMMANDS_DEFERRED = registry.counter(
+    "mqtt_commands_deferred_total", "Komendy wysłane z opóźnieniem (limit częstotliwości tematu)"
+)
+
+
+class _TopicState:
+    __slots__ = ("last_sent", "pending")
+
+    def __init__(self):
+        self.last_sent = float("-inf")
+        self.pending = None  # (wiadomość, device_id) czekająca na wysłanie
+
+
+class CommandScheduler:
+    def __init__(self, mqtt_client, min_interval=0.1, logger=None):
+        """
+        Ogranicza częstotliwość komend wysyłanych na ten sam temat.
+
+        Pierwsza komenda jest wysyłana od razu. Kolejne w ciągu min_interval
+        od poprzedniej publikacji czekają - nowsza zastępuje starszą (wygrywa
+        ostatnia), a po upływie odstępu wysyłana jest tylko ostatnia wartość.
+        Przeciąganie suwaka daje więc najwyżej 1/min_interval wiadomości na
+        sekundę, a wartość końcowa dociera najpóźniej po min_interval.
+
+        Ma ten sam interfejs publikacji co MQTTClient (publish, publish_many),
+        więc można go przekazać do DeviceManager zamiast klienta.
+
+        Args:
+            mqtt_client: Klient MQTT
+            min_interval (float): Minimalny odstęp publikacji na temat w sekundach
+                (0 - bez ograniczeń)
+            logger: Logger do raportowania błędów
+        """
+        self.mqtt_client = mqtt_client
+        self.min_interval = min_interval
+        self.logger = logger
+        self._topics = {}
+        self._due = []  # (czas wysłania, temat)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._thread = None
+        self._running = True
+
+    def publish(self, topic, message, qos=None):
+        """
+        Publikuje wiadomość (patrz publish_many).
+        """
+        return self.publish_many([(topic, message, qos)])[0]
+
+    def publish_many(self, messages, device_ids=None):
+        """
+        Publikuje wiadomości z ograniczeniem częstotliwości na temat.
+
+        Returns:
+            list: Status dla każdej wiadomości - wynik publikacji
+                (patrz MQTTClient.publish_many) lub QUEUED, jeśli wiadomość
+                czeka na upływ odstępu
+        """
+        if not self.min_interval:
+            return self.mqtt_client.publish_many(messages, device_ids)
+
+        now = time.monotonic()
+        immediate = []  # (indeks, wiadomość, device_id)
+        results = [QUEUED] * len(messages)
+        with self._lock:
+            for index, message in enumerate(messages):
+                device_id = device_ids[index] if device_ids else None
+                state = self._topics.get(message[0])
+                if state is None:
+                    state = self._topics[message[0]] = _TopicState()
+                if state.pending is not None:
+                    COMMANDS_COALESCED.inc()
+                    state.pending = (message, device_id)
+                elif now - state.last_sent >= self.min_interval:
+                    state.last_sent = now
+                    immediate.append((index, message, device_id))
+                else:
+                    state.pending = (message, device_id)
+                    self._schedule(state.last_sent + self.min_interval, message[0])
+
+        if immediate:
+            sent = self.mqtt_client.publish_many(
+                [message for _, message, _ in immediate],
+                [device_id for _, _, device_id in immediate] if device_ids else None,
+            )
+            for (index, _, _), success in zip(immediate, sent):
+                results[index] = success
+        return results
+
+    def flush(self):
+        """
+        Wysyła od razu wszystkie oczekujące komendy.
+        """
+        with self._lock:
+            pending = [topic for topic, state in self._topics.items() if state.pending is not None]
+        for topic in pending:
+            self._send_pending(topic)
+
+    def close(self):
+        """
+        Zatrzymuje wątek i wysyła oczekujące komendy.
+        """
+        with self._lock:
+            self._running = False
+            self._wakeup.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _schedule(self, due, topic):
+        # Wywoływana pod blokadą
+        heapq.heappush(self._due, (due, topic))
+        if self._thread is None and self._running:
+            self._thread = threading.Thread(target=self._run, name="command-scheduler", daemon=True)
+            self._thread.start()
+        self._wakeup.notify()
+
+    def _send_pending(self, topic):
+        with self._lock:
+            state = self._topics.get(topic)
+            if state is None or state.pending is None:
+                return
+            message, device_id = state.pending
+            state.pending = None
+            state.last_sent = time.monotonic()
+        COMMANDS_DEFERRED.inc()
+        try:
+            self.mqtt_client.publish_many([message], [device_id] if device_id else None)
+        except Exception as e:
+            if self.logger:
+                self.logger.error(f"Błąd wysyłania komendy do {topic}: {str(e)}")
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while self._running and (not self._due or self._due[0][0] > time.monotonic()):
+                    timeout = self._due[0][0] - time.monotonic() if self._due else None
+                    self._wakeup.wait(timeout)
+                if not self._running:
+                    return
+                _, topic = heapq.heappop(self._due)
+            self._send_pending(topic)
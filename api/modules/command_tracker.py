@@ -0,0 +1,250 @@
+# modules/command_tracker.py
+import threading
+import time
+from collections import deque
+
+# Górne granice przedziałów histogramu opóźnień w sekundach
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+
+# Limit potwierdzeń publikacji oczekujących na rejestrację komendy
+MAX_EARLY_ACKS = 1024
+
+
+class LatencyHistogram:
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    def __init__(self):
+        """
+        Histogram opóźnień o stałych przedziałach (LATENCY_BUCKETS).
+
+        Zajmuje stałą pamięć niezależnie od liczby pomiarów, a percentyle są
+        szacowane przez interpolację liniową wewnątrz przedziału.
+        """
+        self.counts = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def observe(self, value):
+        """
+        Dodaje pomiar w sekundach.
+        """
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, p):
+        """
+        Zwraca szacowany percentyl p (0-100) lub None, jeśli brak pomiarów.
+        """
+        if not self.count:
+            return None
+        rank = p / 100.0 * self.count
+        cumulative = 0
+        lower = 0.0
+        for bound, bucket_count in zip(LATENCY_BUCKETS, self.counts):
+            if bucket_count and cumulative + bucket_count >= rank:
+                # Zakres przedziału zawężony do obserwowanych min/max
+                lower = max(lower, self.min)
+                upper = min(bound, self.max)
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+            lower = bound
+        return self.max
+
+    def summary(self):
+        """
+        Zwraca podsumowanie histogramu (liczba, średnia, p50/p90/p99, max) w ms.
+        """
+        def ms(value):
+            return round(value * 1000, 2) if value is not None else None
+
+        return {
+            "count": self.count,
+            "avg_ms": ms(self.total / self.count) if self.count else None,
+            "p50_ms": ms(self.percentile(50)),
+            "p90_ms": ms(self.percentile(90)),
+            "p99_ms": ms(self.percentile(99)),
+            "max_ms": ms(self.max) if self.count else None,
+        }
+
+
+class _DeviceCommands:
+    __slots__ = ("pending", "round_trip", "publish_ack", "timeouts", "publish_failures")
+
+    def __init__(self):
+        self.pending = deque()  # Czasy wysłania komend oczekujących na odpowiedź
+        self.round_trip = LatencyHistogram()
+        self.publish_ack = LatencyHistogram()
+        self.timeouts = 0
+        self.publish_failures = 0
+
+
+class CommandTracker:
+    def __init__(self, timeout=10.0, max_pending=100):
+        """
+        Śledzenie komend wysyłanych do urządzeń.
+
+        Mierzy dwa opóźnienia:
+        - potwierdzenie publikacji przez klienta/broker (on_publish paho,
+          dla QoS 0 - zapis do gniazda, dla QoS 1/2 - PUBACK/PUBCOMP),
+        - pełny obieg: od wysłania komendy do następnej wiadomości statusu
+          lub wartości od urządzenia (także bez zmiany wartości).
+        Komenda bez odpowiedzi w czasie timeout jest liczona jako przekroczenie.
+
+        Args:
+            timeout (float): Maksymalny czas oczekiwania na odpowiedź w sekundach
+            max_pending (int): Limit oczekujących komend na urządzenie
+        """
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self._devices = {}  # device_id -> _DeviceCommands
+        self._in_flight = {}  # mid -> (device_id, czas wysłania)
+        self._acked_early = {}  # mid -> czas potwierdzenia przed rejestracją
+        self._lock = threading.Lock()
+        self._publishes = 0
+
+    def _device(self, device_id):
+        device = self._devices.get(device_id)
+        if device is None:
+            device = self._devices[device_id] = _DeviceCommands()
+        return device
+
+    def command_sent(self, device_id, mid=None, sent_at=None, published=True):
+        """
+        Rejestruje wysłaną komendę.
+
+        Args:
+            device_id (str): ID urządzenia
+            mid (int, optional): ID wiadomości paho do korelacji z on_publish
+            sent_at (float, optional): Czas wysłania (time.monotonic)
+            published (bool): False, jeśli klient odrzucił publikację
+        """
+        now = sent_at if sent_at is not None else time.monotonic()
+        with self._lock:
+            device = self._device(device_id)
+            if not published:
+                device.publish_failures += 1
+                return
+
+            self._expire(device, now)
+            if len(device.pending) >= self.max_pending:
+                device.pending.popleft()
+                device.timeouts += 1
+            device.pending.append(now)
+
+            if mid is not None:
+                acked_at = self._acked_early.pop(mid, None)
+                if acked_at is not None:
+                    device.publish_ack.observe(max(acked_at - now, 0.0))
+                else:
+                    self._in_flight[mid] = (device_id, now)
+
+            self._publishes += 1
+            if self._publishes % 256 == 0:
+                self._expire_in_flight(now)
+
+    def publish_acked(self, mid):
+        """
+        Słuchacz on_publish klienta MQTT - rejestruje potwierdzenie publikacji.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._in_flight.pop(mid, None)
+            if entry is None:
+                # on_publish przed zarejestrowaniem komendy (wątek sieciowy paho)
+                # lub publikacja, która nie jest komendą - bufor ograniczony
+                self._acked_early[mid] = now
+                if len(self._acked_early) > MAX_EARLY_ACKS:
+                    del self._acked_early[next(iter(self._acked_early))]
+                return
+            device_id, sent_at = entry
+            device = self._devices.get(device_id)
+            if device is not None:
+                device.publish_ack.observe(now - sent_at)
+
+    def on_status_change(self, device_id, changes):
+        """
+        Słuchacz zmian statusu z DeviceManager - usuwa dane usuniętych urządzeń.
+        """
+        if changes is None:
+            with self._lock:
+                self._devices.pop(device_id, None)
+
+    def on_device_message(self, device_id, kind):
+        """
+        Słuchacz wiadomości z DeviceManager - zamyka oczekujące komendy.
+        """
+        # Szybka ścieżka bez blokady dla urządzeń bez oczekujących komend
+        device = self._devices.get(device_id)
+        if device is None or not device.pending or kind == "availability":
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._expire(device, now)
+            while device.pending:
+                device.round_trip.observe(now - device.pending.popleft())
+
+    def _expire(self, device, now):
+        while device.pending and now - device.pending[0] > self.timeout:
+            device.pending.popleft()
+            device.timeouts += 1
+
+    def _expire_in_flight(self, now):
+        # Potwierdzenia, które nie nadeszły, i wpisy bez rejestracji
+        for mid, (device_id, sent_at) in list(self._in_flight.items()):
+            if now - sent_at > self.timeout:
+                del self._in_flight[mid]
+        for mid, acked_at in list(self._acked_early.items()):
+            if now - acked_at > self.timeout:
+                del self._acked_early[mid]
+
+    def stats(self):
+        """
+        Zwraca statystyki opóźnień dla całej instalacji i poszczególnych urządzeń.
+
+        Returns:
+            dict: {"fleet": {...}, "devices": {device_id: {...}}}
+        """
+        now = time.monotonic()
+        fleet_round_trip = LatencyHistogram()
+        fleet_publish_ack = LatencyHistogram()
+        fleet = {"timeouts": 0, "pending": 0, "publish_failures": 0}
+        devices = {}
+        with self._lock:
+            self._expire_in_flight(now)
+            for device_id, device in self._devices.items():
+                self._expire(device, now)
+                _merge(fleet_round_trip, device.round_trip)
+                _merge(fleet_publish_ack, device.publish_ack)
+                fleet["timeouts"] += device.timeouts
+                fleet["pending"] += len(device.pending)
+                fleet["publish_failures"] += device.publish_failures
+                devices[device_id] = {
+                    "round_trip": device.round_trip.summary(),
+                    "publish_ack": device.publish_ack.summary(),
+                    "timeouts": device.timeouts,
+                    "pending": len(device.pending),
+                    "publish_failures": device.publish_failures,
+                }
+            fleet["in_flight"] = len(self._in_flight)
+        fleet["round_trip"] = fleet_round_trip.summary()
+        fleet["publish_ack"] = fleet_publish_ack.summary()
+        return {"timeout": self.timeout, "fleet": fleet, "devices": devices}
+
+
+def _merge(target, source):
+    for i, bucket_count in enumerate(source.counts):
+        target.counts[i] += bucket_count
+    target.count += source.count
+    target.total += source.total
+    target.min = min(target.min, source.min)
+    target.max = max(target.max, source.max)
@@ -0,0 +1,353 @@
+# modules/config_store.py
+import json
+import os
+import threading
+import time
+
+
+def file_signature(path):
+    """
+    Zwraca podpis pliku (czas modyfikacji, rozmiar, i-węzeł) lub None,
+    jeśli plik nie istnieje - zmiana podpisu oznacza zmianę treści.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+class ConfigStore:
+    def __init__(self, snapshot_path, snapshot_provider=None, compact_after=500,
+                 flush_delay=2.0, fsync=True, logger=None):
+        """
+        Inicjalizacja trwałego magazynu konfiguracji urządzeń.
+
+        Każda zmiana jest dopisywana jako jedna linia do dziennika
+        (<snapshot>.journal), więc koszt zapisu nie zależy od rozmiaru
+        konfiguracji. Wątek w tle po okresie bezczynności (flush_delay) lub po
+        compact_after wpisach zapisuje pełny plik JSON atomowo (plik tymczasowy
+        + rename) i czyści dziennik. Równoległe zapisy dzielą jeden fsync.
+
+        Args:
+            snapshot_path (str): Ścieżka pliku konfiguracji (devices.json)
+            snapshot_provider (function): Funkcja zwracająca bieżącą konfigurację
+            compact_after (int): Liczba wpisów dziennika wymuszająca kompakcję
+            flush_delay (float): Czas bezczynności przed kompakcją w sekundach
+            fsync (bool): Czy wywoływać fsync po zapisie do dziennika
+            logger: Logger do raportowania błędów
+
+        Po ustawieniu read_only (np. po nieudanym wczytaniu konfiguracji)
+        magazyn nie przyjmuje zmian i nie nadpisuje pliku konfiguracji.
+        """
+        self.snapshot_path = snapshot_path
+        self.journal_path = snapshot_path + ".journal"
+        self.snapshot_provider = snapshot_provider
+        self.compact_after = compact_after
+        self.flush_delay = flush_delay
+        self.fsync = fsync
+        self.logger = logger
+        self.read_only = False
+
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._sync_lock = threading.Lock()
+        self._journal = None
+        self._journal_entries = 0
+        self._written_seq = 0
+        self._synced_seq = 0
+        self._last_append = 0.0
+        self._written_signature = None  # podpis pliku po ostatnim własnym zapisie
+        self._thread = None
+        self._running = False
+
+    # ===================== Odczyt =====================
+
+    def load(self):
+        """
+        Wczytuje konfigurację: plik JSON oraz zmiany z dziennika.
+
+        Returns:
+            dict: Konfiguracja z listami devices, rooms i scenes
+        """
+        os.makedirs(os.path.dirname(self.snapshot_path), exist_ok=True)
+
+        # Jeśli plik nie istnieje, utwórz go z pustą konfiguracją
+        if not os.path.exists(self.snapshot_path):
+            self._write_snapshot({"devices": [], "rooms": []})
+
+        config, self._journal_entries = self._read()
+        return config
+
+    def reload(self, apply):
+        """
+        Wczytuje ponownie konfigurację zmienioną z zewnątrz (edycja pliku)
+        i przekazuje ją do apply w sekcji krytycznej zapisu - równoległa
+        zmiana przez API nie przeplecie się z przeładowaniem.
+
+        Edytowany plik jest nowym stanem konfiguracji: dziennik nie jest
+        odtwarzany na jego treści (usunięte w pliku elementy wróciłyby),
+        a po zastosowaniu zmian jest usuwany - stan w pamięci odpowiada
+        wtedy plikowi.
+
+        Args:
+            apply (function): Funkcja przyjmująca wczytaną konfigurację;
+                zwraca None, jeśli konfiguracja została odrzucona (dziennik
+                zostaje do czasu poprawnej edycji)
+
+        Returns:
+            Wynik apply lub None, jeśli plik nie zmienił się od ostatniego
+            zapisu przez magazyn
+        """
+        with self._sync_lock, self._lock:
+            signature = file_signature(self.snapshot_path)
+            if signature == self._written_signature:
+                return None
+            config, _ = self._read(journal=False)
+            result = apply(config)
+            if result is not None and not self.read_only:
+                if self._journal is not None:
+                    self._journal.close()
+                    self._journal = None
+                self._synced_seq = self._written_seq
+                self._remove_journal()
+                self._written_signature = signature
+            return result
+
+    def _read(self, journal=True):
+        with open(self.snapshot_path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+
+        # Odtwórz zmiany niezapisane jeszcze w pliku JSON
+        entries = 0
+        if journal:
+            for mutation in self._read_journal(self.journal_path):
+                apply_mutation(config, mutation)
+                entries += 1
+        return config, entries
+
+    def _read_journal(self, path):
+        if not os.path.exists(path):
+            return
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # Niedokończona ostatnia linia po awarii
+                    self._log_error(f"Pominięto uszkodzony wpis dziennika konfiguracji: {line[:80]}")
+
+    # ===================== Zapis =====================
+
+    def start(self):
+        """
+        Uruchamia wątek kompakcji.
+        """
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name="config-store", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """
+        Zatrzymuje wątek kompakcji i zapisuje pełny plik konfiguracji.
+        """
+        with self._lock:
+            self._running = False
+            self._changed.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._journal_entries:
+            self.compact()
+
+    def append(self, mutation, apply=None):
+        """
+        Dopisuje zmianę do dziennika.
+
+        Args:
+            mutation (dict): Zmiana, np. {"op": "put_device", "data": {...}}
+            apply (function, optional): Funkcja stosująca zmianę w pamięci,
+                wywoływana po zapisie, w tej samej sekcji krytycznej co zapis
+                (dzięki temu kompakcja nigdy nie pominie zapisanej zmiany).
+                Jeśli zgłosi wyjątek, wpis jest usuwany z dziennika.
+
+        Returns:
+            bool: True, jeśli zmiana została zapisana
+        """
+        if self.read_only:
+            self._log_error("Konfiguracja nie została wczytana - zmiana odrzucona")
+            return False
+
+        line = json.dumps(mutation, ensure_ascii=False) + "\n"
+        with self._lock:
+            try:
+                if self._journal is None:
+                    self._journal = open(self.journal_path, "a", encoding="utf-8")
+                position = self._journal.tell()
+                self._journal.write(line)
+                self._journal.flush()
+            except Exception as e:
+                self._log_error(f"Błąd zapisu dziennika konfiguracji: {str(e)}")
+                return False
+
+            if apply is not None:
+                try:
+                    apply(mutation)
+                except Exception as e:
+                    # Zmiana nie trafiła do pamięci - nie może trafić do pliku
+                    self._journal.truncate(position)
+                    self._journal.flush()
+                    self._log_error(f"Błąd stosowania zmiany konfiguracji: {str(e)}")
+                    return False
+            self._written_seq += 1
+            seq = self._written_seq
+            self._journal_entries += 1
+            self._last_append = time.monotonic()
+            self._changed.notify_all()
+
+        return self._sync(seq)
+
+    def _sync(self, seq):
+        if not self.fsync:
+            return True
+        # Zatwierdzanie grupowe - jeden fsync obejmuje wszystkie zapisane linie
+        with self._sync_lock:
+            if self._synced_seq >= seq:
+                return True
+            with self._lock:
+                target = self._written_seq
+                journal = self._journal
+            try:
+                if journal is not None:
+                    os.fsync(journal.fileno())
+            except OSError as e:
+                self._log_error(f"Błąd fsync dziennika konfiguracji: {str(e)}")
+                return False
+            self._synced_seq = target
+            return True
+
+    def compact(self):
+        """
+        Zapisuje pełny plik konfiguracji i usuwa zastosowane wpisy dziennika.
+
+        Migawka, zapis pliku, podmiana nazwy i usunięcie dziennika odbywają się
+        pod blokadą magazynu - równoległa zmiana lub przeładowanie czeka na
+        koniec kompakcji, więc plik i dziennik zawsze opisują ten sam stan.
+        """
+        if self.snapshot_provider is None or self.read_only:
+            return False
+
+        with self._sync_lock, self._lock:
+            config = self.snapshot_provider()
+            if self._journal is not None:
+                if self.fsync:
+                    os.fsync(self._journal.fileno())
+                self._journal.close()
+                self._journal = None
+            self._synced_seq = self._written_seq
+
+            try:
+                self._write_snapshot(config)
+            except Exception as e:
+                # Dziennik zostaje - zmiany zostaną zapisane przy następnej kompakcji
+                self._log_error(f"Błąd zapisywania konfiguracji: {str(e)}")
+                return False
+
+            # Awaria przed usunięciem dziennika jest bezpieczna - ponowne
+            # odtworzenie zmian put/delete na nowym pliku niczego nie zmienia
+            self._remove_journal()
+        return True
+
+    def _remove_journal(self):
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self._journal_entries = 0
+
+    def _write_snapshot(self, config):
+        # Zapis atomowy: plik tymczasowy, fsync i podmiana nazwy
+        tmp_path = f"{self.snapshot_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(config, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        self._written_signature = file_signature(self.snapshot_path)
+        try:
+            directory = os.open(os.path.dirname(self.snapshot_path) or ".", os.O_RDONLY)
+            try:
+                os.fsync(directory)
+            finally:
+                os.close(directory)
+        except OSError:
+            pass
+
+    def _run(self):
+        while True:
+            with self._lock:
+                # Czekaj na zmiany, potem na okres bezczynności lub limit wpisów
+                while self._running:
+                    if self._journal_entries >= self.compact_after:
+                        break
+                    if self._journal_entries:
+                        remaining = self._last_append + self.flush_delay - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._changed.wait(remaining)
+                    else:
+                        self._changed.wait()
+                if not self._running:
+                    return
+            self.compact()
+
+    def _log_error(self, message):
+        if self.logger:
+            self.logger.error(message)
+        else:
+            print(message)
+
+
+def apply_mutation(config, mutation):
+    """
+    Stosuje zmianę z dziennika do konfiguracji w postaci list.
+    """
+    op = mutation.get("op")
+    collection = {"device": "devices", "room": "rooms", "scene": "scenes"}.get(op.split("_", 1)[-1]) if op else None
+    if collection is None:
+        return
+    items = config.setdefault(collection, [])
+
+    if op.startswith("put_"):
+        data = mutation["data"]
+        for i, item in enumerate(items):
+            if item["id"] == data["id"]:
+                items[i] = data
+                break
+        else:
+            items.append(data)
+    elif op.startswith("delete_"):
+        config[collection] = [item for item in items if item["id"] != mutation["id"]]
+
+
+def diff_configuration(current, config):
+    """
+    Porównuje dwie konfiguracje i zwraca zmiany prowadzące od current
+    do config - po jednej na dodany, zmieniony lub usunięty element
+    (porównanie po "id", kolejność elementów jest pomijana).
+
+    Returns:
+        list: Zmiany w postaci wpisów dziennika, np. {"op": "put_device", ...}
+    """
+    mutations = []
+    for kind, collection in (("room", "rooms"), ("device", "devices"), ("scene", "scenes")):
+        before = {item["id"]: item for item in current.get(collection) or []}
+        after = {item["id"]: item for item in config.get(collection) or []}
+        for item_id in before:
+            if item_id not in after:
+                mutations.append({"op": f"delete_{kind}", "id": item_id})
+        for item_id, item in after.items():
+            if before.get(item_id) != item:
+                mutations.append({"op": f"put_{kind}", "data": item})
+    return mutations
@@ -0,0 +1,81 @@
+# modules/config_watcher.py
+import threading
+
+from modules.config_store import file_signature
+
+
+class ConfigWatcher:
+    def __init__(self, path, on_change, interval=2.0, logger=None):
+        """
+        Obserwuje plik konfiguracji i wywołuje on_change po jego zmianie.
+
+        Wątek w tle co interval sekund porównuje podpis pliku (czas
+        modyfikacji, rozmiar, i-węzeł) - sprawdzenie to jedno wywołanie stat,
+        więc działa także na systemach i dyskach bez inotify.
+
+        Args:
+            path (str): Ścieżka pliku konfiguracji
+            on_change (function): Funkcja wywoływana po zmianie pliku,
+                zwracająca listę zastosowanych zmian
+            interval (float): Odstęp między sprawdzeniami w sekundach
+            logger: Logger
+        """
+        self.path = path
+        self.on_change = on_change
+        self.interval = interval
+        self.logger = logger
+        self._signature = file_signature(path)
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """
+        Uruchamia wątek obserwacji.
+        """
+        if self._thread is None:
+            self._signature = file_signature(self.path)
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="config-watcher", daemon=True)
+            self._thread.start()
+
+    def close(self):
+        """
+        Zatrzymuje wątek obserwacji.
+        """
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+
+    def check(self):
+        """
+        Sprawdza plik i wywołuje on_change, jeśli się zmienił.
+
+        Returns:
+            bool: Czy plik zmienił się od poprzedniego sprawdzenia
+        """
+        signature = file_signature(self.path)
+        if signature is None or signature == self._signature:
+            return False
+        # Podpis jest zapamiętywany także po błędzie (np. niepoprawny JSON),
+        # więc ten sam błąd nie jest zgłaszany co interval sekund
+        self._signature = signature
+        try:
+            mutations = self.on_change()
+        except Exception as e:
+            self._log_error(f"Błąd przeładowania konfiguracji: {str(e)}")
+            return True
+        if mutations and self.logger:
+            self.logger.info(f"Przeładowano konfigurację z {self.path}: {len(mutations)} zmian")
+        return True
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self.check()
+
+    def _log_error(self, message):
+        if self.logger:
+            self.logger.error(message)
+        else:
+            print(message)
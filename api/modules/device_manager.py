@@ -2,6 +2,35 @@
 import os
 import json
 import time
+import threading
+from collections import OrderedDict
+
+from modules.device_registry import DeviceRegistry, validate_device
+from modules.config_store import ConfigStore, diff_configuration
+from modules.liveness import LivenessMonitor
+from modules.status_snapshot import StatusSnapshot
+from modules.status_store import EMPTY_STATUS, DeviceStatus, StatusStore
+from modules.payload_decoder import DEFAULT_SPEC, payload_specs
+from modules.outbox import QUEUED
+from modules.metrics import registry
+
+CONFIG_SAVE = registry.histogram(
+    "config_save_duration_seconds", "Czas zapisu zmiany konfiguracji urządzeń"
+)
+CONFIG_RELOAD = registry.histogram(
+    "config_reload_duration_seconds", "Czas przeładowania zmienionego pliku konfiguracji"
+)
+SUPPRESSED = registry.counter(
+    "device_updates_suppressed_total", "Wiadomości bez zmiany wartości (w tym w strefie nieczułości)"
+)
+
+# Treści oznaczające rozłączenie urządzenia (np. Last Will na temacie statusu)
+OFFLINE_PAYLOADS = ("offline", "disconnected", "lost")
+# Status urządzenia po takiej wiadomości na temacie statusu
+OFFLINE_STATUS = "offline"
+
+# Klucze określające cel komendy zbiorczej
+COMMAND_TARGETS = ("device_id", "device_ids", "room", "type")
 
 
 class DeviceManager:
@@ -10,281 +39,817 @@ class DeviceManager:
         Inicjalizacja menedżera urządzeń.
         """
         self.config = config
-        self.devices_file = os.path.join(
+        self.devices_file = config.get("DEVICES_FILE") or os.path.join(
             config.get("STATIC_DIR", "static"), "config", "devices.json"
         )
-        self.devices = []
-        self.rooms = []
-        self.devices_status = {}
+        self.devices = DeviceRegistry()
+        self.rooms = {}  # room_id -> pomieszczenie (w kolejności dodania)
+        self.scenes = {}  # scene_id -> scena (w kolejności dodania)
+        # Statusy urządzeń - niezmienne rekordy z odczytem bez blokad
+        # (patrz modules/status_store.py)
+        self.devices_status = StatusStore()
+        self._payload_specs = {}  # device_id -> {nazwa: PayloadSpec}
+        self._status_listeners = []
+        self._message_listeners = []
+        self._registry_listeners = []
+
+        # Funkcja przekazująca zmiany konfiguracji do procesu-właściciela
+        # (tryb wielu workerów, patrz modules/worker_sync.py)
+        self.mutation_forwarder = None
+
+        # Wersjonowanie statusu - globalna wersja startuje od znacznika czasu
+        # w ms, dzięki czemu kursory klientów rosną również między restartami
+        self.status_version = int(time.time() * 1000)
+        self._status_versions = OrderedDict()  # device_id -> wersja, od najstarszej
+        self._status_lock = threading.Lock()
+
+        # Trwały zapis konfiguracji (dziennik zmian + atomowy zapis pliku)
+        self.store = ConfigStore(
+            self.devices_file,
+            snapshot_provider=self._configuration_snapshot,
+            compact_after=config.get("CONFIG_COMPACT_AFTER", 500),
+            flush_delay=config.get("CONFIG_FLUSH_DELAY", 2.0),
+            fsync=config.get("CONFIG_FSYNC", True),
+        )
+        # Wykrywanie urządzeń, które przestały wysyłać wiadomości
+        self.liveness = LivenessMonitor(
+            self._on_liveness_expired, tick=config.get("LIVENESS_TICK", 1.0)
+        )
+        # Ostatni znany stan urządzeń odtwarzany po restarcie
+        self.status_snapshot = None
+        if config.get("STATUS_SNAPSHOT_FILE"):
+            self.status_snapshot = StatusSnapshot(
+                config["STATUS_SNAPSHOT_FILE"],
+                self._status_snapshot,
+                interval=config.get("STATUS_SNAPSHOT_INTERVAL", 30.0),
+                fsync=config.get("CONFIG_FSYNC", True),
+            )
         self._load_configuration()
 
-    def _load_configuration(self):
+    def start_liveness(self):
         """
-        Ładuje konfigurację urządzeń z pliku.
+        Uruchamia wykrywanie urządzeń offline (tylko w procesie, który
+        odbiera wiadomości z brokera).
+
+        Urządzenia online bez terminu wygaśnięcia (np. stan przejęty od
+        poprzedniego właściciela połączenia) dostają termin liczony od
+        last_seen - bez tego nigdy nie zostałyby oznaczone jako offline.
         """
-        try:
-            # Upewnij się, że katalog istnieje
-            os.makedirs(os.path.dirname(self.devices_file), exist_ok=True)
+        now = time.time()
+        for device_id, status in self.devices_status.items():
+            if not status.online or device_id in self.liveness:
+                continue
+            device = self.devices.get(device_id)
+            timeout = self._liveness_timeout(device) if device is not None else 0
+            if timeout:
+                elapsed = now - status.last_seen if status.last_seen else 0
+                self.liveness.touch(device_id, max(timeout - elapsed, self.liveness.tick))
+        self.liveness.start()
+
+    def start_persistence(self):
+        """
+        Uruchamia zapis konfiguracji i stanu urządzeń w tle (tylko w procesie,
+        który jest właścicielem plików).
+        """
+        self.store.start()
+        if self.status_snapshot:
+            self.status_snapshot.start()
+
+    def add_status_listener(self, callback):
+        """
+        Rejestruje funkcję wywoływaną przy każdej zmianie statusu urządzenia.
+
+        Args:
+            callback (function): Funkcja przyjmująca (device_id, changes),
+                gdzie changes to słownik zmienionych pól lub None po usunięciu
+        """
+        self._status_listeners.append(callback)
+
+    def add_message_listener(self, callback):
+        """
+        Rejestruje funkcję wywoływaną dla każdej bieżącej (nie retained)
+        wiadomości urządzenia, także gdy wartość się nie zmieniła.
+
+        Args:
+            callback (function): Funkcja przyjmująca (device_id, kind), gdzie
+                kind to "status", "value" lub "availability"
+        """
+        self._message_listeners.append(callback)
+
+    def add_registry_listener(self, callback):
+        """
+        Rejestruje funkcję wywoływaną po każdej zastosowanej zmianie
+        konfiguracji (urządzenia, pomieszczenia).
+
+        Args:
+            callback (function): Funkcja przyjmująca słownik zmiany,
+                np. {"op": "put_device", "data": {...}}
+        """
+        self._registry_listeners.append(callback)
 
-            # Jeśli plik nie istnieje, utwórz go z pustą konfiguracją
-            if not os.path.exists(self.devices_file):
-                default_config = {"devices": [], "rooms": []}
-                with open(self.devices_file, "w", encoding="utf-8") as f:
-                    json.dump(default_config, f, indent=2, ensure_ascii=False)
+    def _notify_status(self, device_id, changes, version=None):
+        """
+        Podbija wersję statusu urządzenia i powiadamia słuchaczy o zmianie.
+
+        Wywoływana pod blokadą fragmentu StatusStore, w tej samej sekcji
+        krytycznej co zapis rekordu (argument notify StatusStore.update) -
+        wersje i powiadomienia o zmianach urządzenia (strumień, historia,
+        inne workery) mają kolejność zapisów, także gdy wygaśnięcie terminu
+        i wiadomość z brokera przychodzą jednocześnie.
+
+        Args:
+            version (int, optional): Wersja nadana przez proces-właściciela
+                (tryb wielu workerów) - zamiast lokalnego podbicia
+        """
+        with self._status_lock:
+            if version is None:
+                self.status_version += 1
+                version = self.status_version
+            else:
+                self.status_version = max(self.status_version, version)
+            self._status_versions[device_id] = version
+            self._status_versions.move_to_end(device_id)
 
-            # Załaduj konfigurację
-            with open(self.devices_file, "r", encoding="utf-8") as f:
-                config = json.load(f)
-                self.devices = config.get("devices", [])
-                self.rooms = config.get("rooms", [])
+        for callback in self._status_listeners:
+            try:
+                callback(device_id, changes)
+            except Exception as e:
+                print(f"Błąd powiadamiania o zmianie statusu: {str(e)}")
+
+    def _load_configuration(self):
+        """
+        Ładuje konfigurację urządzeń z pliku (wraz z dziennikiem zmian).
+
+        Po błędzie wczytywania aplikacja działa z pustą konfiguracją, ale
+        niczego nie zapisuje - pusty stan nie może nadpisać devices.json,
+        dziennika zmian ani pliku stanu urządzeń.
+        """
+        try:
+            config = self.store.load()
+            self.devices = DeviceRegistry(config.get("devices", []))
+            self.rooms = {room["id"]: room for room in config.get("rooms", [])}
+            self.scenes = {scene["id"]: scene for scene in config.get("scenes", [])}
 
             # Inicjalizuj status urządzeń
+            self.devices_status.replace_all({device["id"]: EMPTY_STATUS for device in self.devices})
             for device in self.devices:
-                self.devices_status[device["id"]] = {
-                    "online": False,
-                    "last_seen": None,
-                    "status": None,
-                    "values": {},
-                }
+                self._status_versions[device["id"]] = self.status_version
         except Exception as e:
-            print(f"Błąd ładowania konfiguracji: {str(e)}")
+            print(f"Błąd ładowania konfiguracji: {str(e)} - zapis wyłączony do czasu restartu")
             # Inicjalizuj z pustymi listami w przypadku błędu
-            self.devices = []
-            self.rooms = []
+            self.devices = DeviceRegistry()
+            self.rooms = {}
+            self.scenes = {}
+            self.devices_status.replace_all({})
+            self.store.read_only = True
+            self.status_snapshot = None
+        self._restore_status()
+
+    def _restore_status(self):
+        """
+        Odtwarza ostatni zapisany stan urządzeń (status, wartości, last_seen).
+
+        Urządzenie zapisane jako online pozostaje online tylko przez resztę
+        swojego terminu wygaśnięcia liczonego od last_seen - jeśli nie odezwie
+        się po restarcie, zostanie oznaczone jako offline.
+
+        Błędne wpisy pliku stanu są pomijane - urządzenie zaczyna wtedy
+        z pustym statusem.
+        """
+        if not self.status_snapshot:
+            return
+        _, saved = self.status_snapshot.load()
+        if not isinstance(saved, dict):
+            print("Błąd odczytu stanu urządzeń: pole devices nie jest obiektem")
+            return
+        now = time.time()
+        for device_id, saved_status in saved.items():
+            device = self.devices.get(device_id)
+            if device is None or device_id not in self.devices_status:
+                continue
+            error = self._validate_saved_status(saved_status)
+            if error:
+                print(f"Błąd odczytu stanu urządzenia {device_id}: {error} - pominięto")
+                continue
+            status = DeviceStatus.from_dict(saved_status)._replace(online=False)
+            if saved_status.get("online"):
+                timeout = self._liveness_timeout(device)
+                if not timeout:
+                    status = status._replace(online=True)
+                elif status.last_seen and now - status.last_seen < timeout:
+                    status = status._replace(online=True)
+                    self.liveness.touch(device_id, timeout - (now - status.last_seen))
+            self.devices_status.put(device_id, status)
+
+    def _validate_saved_status(self, saved_status):
+        """
+        Sprawdza wpis pliku stanu urządzeń przed odtworzeniem.
+
+        Returns:
+            str or None: Opis błędu lub None, jeśli wpis jest poprawny
+        """
+        if not isinstance(saved_status, dict):
+            return "wpis nie jest obiektem"
+        last_seen = saved_status.get("last_seen")
+        if last_seen is not None and (isinstance(last_seen, bool) or not isinstance(last_seen, (int, float))):
+            return "nieprawidłowe pole last_seen"
+        values = saved_status.get("values")
+        if values is not None and not isinstance(values, dict):
+            return "pole values nie jest obiektem"
+        if isinstance(saved_status.get("status"), (dict, list)):
+            return "nieprawidłowe pole status"
+        return None
+
+    def _status_snapshot(self):
+        """
+        Zwraca kopię statusów wszystkich urządzeń.
+        """
+        return {device_id: status.as_dict() for device_id, status in self.devices_status.items()}
+
+    def _configuration_snapshot(self):
+        """
+        Zwraca bieżącą konfigurację do zapisu w pliku.
+        """
+        return {
+            "devices": self.devices.all(),
+            "rooms": list(self.rooms.values()),
+            "scenes": list(self.scenes.values()),
+        }
 
-    def _save_configuration(self):
+    def _save_configuration(self, mutation):
         """
-        Zapisuje konfigurację urządzeń do pliku.
+        Zapisuje zmianę konfiguracji w dzienniku i stosuje ją w pamięci.
+
+        Koszt zapisu nie zależy od liczby urządzeń - pełny plik devices.json
+        jest odświeżany w tle przez ConfigStore.
         """
+        started = time.perf_counter()
         try:
-            config = {"devices": self.devices, "rooms": self.rooms}
-            with open(self.devices_file, "w", encoding="utf-8") as f:
-                json.dump(config, f, indent=2, ensure_ascii=False)
-            return True
-        except Exception as e:
-            print(f"Błąd zapisywania konfiguracji: {str(e)}")
-            return False
+            if self.mutation_forwarder is not None:
+                return self.mutation_forwarder(mutation)
+            return self.store.append(mutation, apply=self._apply_mutation)
+        finally:
+            CONFIG_SAVE.observe(time.perf_counter() - started)
+
+    def _apply_mutation(self, mutation):
+        """
+        Stosuje zmianę konfiguracji w pamięci.
+        """
+        op = mutation["op"]
+        if op == "put_device":
+            device_data = mutation["data"]
+            self._payload_specs.pop(device_data["id"], None)
+            is_new = self.devices.put(device_data) is None
+            if is_new or device_data["id"] not in self.devices_status:
+                # Inicjalizuj status urządzenia
+                self.devices_status.update(
+                    device_data["id"],
+                    lambda status: EMPTY_STATUS,
+                    lambda previous, status: self._notify_status(device_data["id"], EMPTY_STATUS.as_dict()),
+                )
+        elif op == "delete_device":
+            self.devices.remove(mutation["id"])
+            self.liveness.remove(mutation["id"])
+            self._payload_specs.pop(mutation["id"], None)
+            self.devices_status.update(
+                mutation["id"],
+                lambda status: None,
+                lambda previous, status: self._notify_status(mutation["id"], None),
+            )
+        elif op == "put_room":
+            self.rooms[mutation["data"]["id"]] = mutation["data"]
+        elif op == "delete_room":
+            self.rooms.pop(mutation["id"], None)
+        elif op == "put_scene":
+            self.scenes[mutation["data"]["id"]] = mutation["data"]
+        elif op == "delete_scene":
+            self.scenes.pop(mutation["id"], None)
+
+        for callback in self._registry_listeners:
+            try:
+                callback(mutation)
+            except Exception as e:
+                print(f"Błąd powiadamiania o zmianie konfiguracji: {str(e)}")
+
+    def reload_configuration(self):
+        """
+        Przeładowuje konfigurację po edycji pliku devices.json z zewnątrz.
+
+        Nowa konfiguracja jest porównywana z bieżącą po ID i stosowane są
+        tylko różnice (put/delete jak przy zmianach przez API): słuchacze
+        rejestru aktualizują subskrypcje MQTT i pamięć odpowiedzi, a status
+        niezmienionych urządzeń zostaje zachowany. Wiadomości są w tym czasie
+        przetwarzane bez przerwy.
+
+        Returns:
+            list: Zastosowane zmiany
+        """
+        started = time.perf_counter()
+        try:
+            return self.store.reload(self._apply_reloaded_configuration) or []
+        finally:
+            CONFIG_RELOAD.observe(time.perf_counter() - started)
+
+    def _apply_reloaded_configuration(self, config):
+        for device in config.get("devices") or []:
+            error = self._validate_device(device)
+            if error:
+                # Plik jest w trakcie edycji lub błędny - zostaw bieżący stan
+                # (i dziennik zmian, patrz ConfigStore.reload)
+                print(f"Pominięto przeładowanie konfiguracji: {error}")
+                return None
+        mutations = diff_configuration(self._configuration_snapshot(), config)
+        for mutation in mutations:
+            self._apply_mutation(mutation)
+        return mutations
+
+    def commit_mutation(self, mutation):
+        """
+        Zapisuje i stosuje zmianę konfiguracji (np. przekazaną przez inny worker).
+
+        Returns:
+            bool: Status operacji
+        """
+        return self._save_configuration(mutation)
+
+    def apply_remote_mutation(self, mutation):
+        """
+        Stosuje zmianę konfiguracji zapisaną przez inny proces.
+        """
+        self._apply_mutation(mutation)
+
+    def apply_remote_status(self, device_id, changes, version=None):
+        """
+        Stosuje zmianę statusu odebraną od procesu-właściciela.
+
+        Args:
+            device_id (str): ID urządzenia
+            changes (dict or None): Zmienione pola (None - urządzenie usunięte)
+            version (int, optional): Wersja statusu nadana przez właściciela
+        """
+        def apply(status):
+            if changes is None:
+                return None
+            return (status or EMPTY_STATUS).with_changes(changes)
+
+        self.devices_status.update(
+            device_id, apply, lambda previous, status: self._notify_status(device_id, changes, version)
+        )
+
+    def export_state(self):
+        """
+        Zwraca pełny stan (konfiguracja, statusy, wersje) do przekazania
+        innemu procesowi.
+        """
+        with self._status_lock:
+            versions = dict(self._status_versions)
+            version = self.status_version
+        return {
+            "config": self._configuration_snapshot(),
+            "status": self._status_snapshot(),
+            "versions": versions,
+            "version": version,
+        }
+
+    def import_state(self, state):
+        """
+        Zastępuje lokalny stan stanem wyeksportowanym przez proces-właściciela.
+        """
+        config = state["config"]
+        self.devices = DeviceRegistry(config.get("devices", []))
+        self.rooms = {room["id"]: room for room in config.get("rooms", [])}
+        self.scenes = {scene["id"]: scene for scene in config.get("scenes", [])}
+        self._payload_specs = {}
+        self.devices_status.replace_all({
+            device_id: DeviceStatus.from_dict(status)
+            for device_id, status in state["status"].items()
+        })
+        with self._status_lock:
+            self.status_version = state["version"]
+            self._status_versions = OrderedDict(
+                sorted(state["versions"].items(), key=lambda item: item[1])
+            )
+
+        for callback in self._registry_listeners:
+            try:
+                callback({"op": "reload"})
+            except Exception as e:
+                print(f"Błąd powiadamiania o zmianie konfiguracji: {str(e)}")
+        for device_id, status in self.devices_status.items():
+            for callback in self._status_listeners:
+                try:
+                    callback(device_id, status.as_dict())
+                except Exception as e:
+                    print(f"Błąd powiadamiania o zmianie statusu: {str(e)}")
+
+    def close(self):
+        """
+        Zapisuje pełną konfigurację i stan urządzeń oraz zatrzymuje wątki w tle.
+        """
+        self.store.close()
+        if self.status_snapshot:
+            self.status_snapshot.close()
 
     def get_all_devices(self):
         """
         Zwraca listę wszystkich urządzeń.
         """
-        return self.devices
+        return self.devices.all()
 
     def get_all_rooms(self):
         """
         Zwraca listę wszystkich pomieszczeń.
         """
-        return self.rooms
+        return list(self.rooms.values())
+
+    def get_all_scenes(self):
+        """
+        Zwraca listę wszystkich scen.
+        """
+        return list(self.scenes.values())
+
+    def get_scene(self, scene_id):
+        """
+        Zwraca scenę o podanym ID.
+        """
+        return self.scenes.get(scene_id)
 
     def get_device(self, device_id):
         """
         Zwraca dane urządzenia o podanym ID.
         """
-        for device in self.devices:
-            if device["id"] == device_id:
-                return device
-        return None
+        return self.devices.get(device_id)
+
+    def get_topic_filters(self):
+        """
+        Zwraca filtry MQTT obejmujące tematy wszystkich urządzeń.
+        """
+        return self.devices.topic_filters()
+
+    def get_devices_in_room(self, room_id):
+        """
+        Zwraca listę urządzeń w podanym pomieszczeniu.
+        """
+        return self.devices.by_room(room_id)
+
+    def get_devices_by_type(self, device_type):
+        """
+        Zwraca listę urządzeń podanego typu.
+        """
+        return self.devices.by_type(device_type)
 
     def get_device_status(self, device_id):
         """
         Zwraca status urządzenia o podanym ID.
         """
-        if device_id in self.devices_status:
-            return self.devices_status[device_id]
-        return None
+        status = self.devices_status.get(device_id)
+        return status.as_dict() if status is not None else None
 
     def get_all_devices_status(self):
         """
         Zwraca status wszystkich urządzeń.
         """
-        return self.devices_status
+        return self._status_snapshot()
+
+    def get_device_version(self, device_id):
+        """
+        Zwraca wersję statusu urządzenia.
+        """
+        return self._status_versions.get(device_id)
+
+    def get_devices_status_since(self, since):
+        """
+        Zwraca status urządzeń zmienionych po podanej wersji.
+
+        Args:
+            since (int): Wersja znana klientowi
+
+        Returns:
+            tuple: (aktualna wersja, słownik zmienionych statusów, lista usuniętych ID)
+        """
+        changed = {}
+        removed = []
+        with self._status_lock:
+            version = self.status_version
+            if since > version:
+                # Kursor spoza historii serwera - zwróć pełny stan
+                return version, self._status_snapshot(), removed
+            # Wersje są uporządkowane rosnąco, więc czytamy tylko od końca
+            for device_id in reversed(self._status_versions):
+                if self._status_versions[device_id] <= since:
+                    break
+                status = self.devices_status.get(device_id)
+                if status is None:
+                    removed.append(device_id)
+                else:
+                    changed[device_id] = status.as_dict()
+        return version, changed, removed
 
     def add_device(self, device_data):
         """
         Dodaje nowe urządzenie.
         """
+        error = self._validate_device(device_data)
+        if error:
+            return False, error
+
         # Sprawdź, czy urządzenie o takim ID już istnieje
-        for device in self.devices:
-            if device["id"] == device_data["id"]:
-                return False, "Urządzenie o takim ID już istnieje"
-
-        # Dodaj urządzenie
-        self.devices.append(device_data)
-
-        # Inicjalizuj status urządzenia
-        self.devices_status[device_data["id"]] = {
-            "online": False,
-            "last_seen": None,
-            "status": None,
-            "values": {},
-        }
+        if device_data["id"] in self.devices:
+            return False, "Urządzenie o takim ID już istnieje"
 
-        # Zapisz konfigurację
-        if self._save_configuration():
+        # Zapisz i dodaj urządzenie
+        if self._save_configuration({"op": "put_device", "data": device_data}):
             return True, "Urządzenie dodane pomyślnie"
-        else:
-            # Usuń urządzenie, jeśli zapis się nie powiedzie
-            self.devices.pop()
-            if device_data["id"] in self.devices_status:
-                del self.devices_status[device_data["id"]]
-            return False, "Błąd zapisywania konfiguracji"
+        return False, "Błąd zapisywania konfiguracji"
 
     def update_device(self, device_id, device_data):
         """
         Aktualizuje istniejące urządzenie.
         """
         # Znajdź urządzenie o podanym ID
-        for i, device in enumerate(self.devices):
-            if device["id"] == device_id:
-                # Zaktualizuj urządzenie
-                self.devices[i] = device_data
-
-                # Zapisz konfigurację
-                if self._save_configuration():
-                    return True, "Urządzenie zaktualizowane pomyślnie"
-                else:
-                    # Przywróć poprzednie dane, jeśli zapis się nie powiedzie
-                    self.devices[i] = device
-                    return False, "Błąd zapisywania konfiguracji"
+        if device_id not in self.devices:
+            return False, "Urządzenie o podanym ID nie istnieje"
+
+        error = self._validate_device(device_data)
+        if error:
+            return False, error
 
-        return False, "Urządzenie o podanym ID nie istnieje"
+        # Zapisz i zaktualizuj urządzenie
+        if self._save_configuration({"op": "put_device", "data": device_data}):
+            return True, "Urządzenie zaktualizowane pomyślnie"
+        return False, "Błąd zapisywania konfiguracji"
 
     def delete_device(self, device_id):
         """
         Usuwa urządzenie.
         """
         # Znajdź urządzenie o podanym ID
-        for i, device in enumerate(self.devices):
-            if device["id"] == device_id:
-                # Usuń urządzenie
-                removed_device = self.devices.pop(i)
-
-                # Usuń status urządzenia
-                if device_id in self.devices_status:
-                    del self.devices_status[device_id]
-
-                # Zapisz konfigurację
-                if self._save_configuration():
-                    return True, "Urządzenie usunięte pomyślnie"
-                else:
-                    # Przywróć urządzenie, jeśli zapis się nie powiedzie
-                    self.devices.insert(i, removed_device)
-                    self.devices_status[device_id] = {
-                        "online": False,
-                        "last_seen": None,
-                        "status": None,
-                        "values": {},
-                    }
-                    return False, "Błąd zapisywania konfiguracji"
-
-        return False, "Urządzenie o podanym ID nie istnieje"
+        if device_id not in self.devices:
+            return False, "Urządzenie o podanym ID nie istnieje"
+
+        # Zapisz i usuń urządzenie
+        if self._save_configuration({"op": "delete_device", "id": device_id}):
+            return True, "Urządzenie usunięte pomyślnie"
+        return False, "Błąd zapisywania konfiguracji"
 
     def add_room(self, room_data):
         """
         Dodaje nowe pomieszczenie.
         """
         # Sprawdź, czy pomieszczenie o takim ID już istnieje
-        for room in self.rooms:
-            if room["id"] == room_data["id"]:
-                return False, "Pomieszczenie o takim ID już istnieje"
+        if room_data["id"] in self.rooms:
+            return False, "Pomieszczenie o takim ID już istnieje"
 
-        # Dodaj pomieszczenie
-        self.rooms.append(room_data)
-
-        # Zapisz konfigurację
-        if self._save_configuration():
+        # Zapisz i dodaj pomieszczenie
+        if self._save_configuration({"op": "put_room", "data": room_data}):
             return True, "Pomieszczenie dodane pomyślnie"
-        else:
-            # Usuń pomieszczenie, jeśli zapis się nie powiedzie
-            self.rooms.pop()
-            return False, "Błąd zapisywania konfiguracji"
+        return False, "Błąd zapisywania konfiguracji"
 
     def update_room(self, room_id, room_data):
         """
         Aktualizuje istniejące pomieszczenie.
         """
         # Znajdź pomieszczenie o podanym ID
-        for i, room in enumerate(self.rooms):
-            if room["id"] == room_id:
-                # Zaktualizuj pomieszczenie
-                self.rooms[i] = room_data
-
-                # Zapisz konfigurację
-                if self._save_configuration():
-                    return True, "Pomieszczenie zaktualizowane pomyślnie"
-                else:
-                    # Przywróć poprzednie dane, jeśli zapis się nie powiedzie
-                    self.rooms[i] = room
-                    return False, "Błąd zapisywania konfiguracji"
+        if room_id not in self.rooms:
+            return False, "Pomieszczenie o podanym ID nie istnieje"
 
-        return False, "Pomieszczenie o podanym ID nie istnieje"
+        # Zapisz i zaktualizuj pomieszczenie
+        if self._save_configuration({"op": "put_room", "data": room_data}):
+            return True, "Pomieszczenie zaktualizowane pomyślnie"
+        return False, "Błąd zapisywania konfiguracji"
 
     def delete_room(self, room_id):
         """
         Usuwa pomieszczenie.
         """
         # Znajdź pomieszczenie o podanym ID
-        for i, room in enumerate(self.rooms):
-            if room["id"] == room_id:
-                # Usuń pomieszczenie
-                removed_room = self.rooms.pop(i)
-
-                # Zapisz konfigurację
-                if self._save_configuration():
-                    return True, "Pomieszczenie usunięte pomyślnie"
-                else:
-                    # Przywróć pomieszczenie, jeśli zapis się nie powiedzie
-                    self.rooms.insert(i, removed_room)
-                    return False, "Błąd zapisywania konfiguracji"
+        if room_id not in self.rooms:
+            return False, "Pomieszczenie o podanym ID nie istnieje"
+
+        # Zapisz i usuń pomieszczenie
+        if self._save_configuration({"op": "delete_room", "id": room_id}):
+            return True, "Pomieszczenie usunięte pomyślnie"
+        return False, "Błąd zapisywania konfiguracji"
+
+    def add_scene(self, scene_data):
+        """
+        Dodaje nową scenę.
+        """
+        # Sprawdź, czy scena o takim ID już istnieje
+        if scene_data["id"] in self.scenes:
+            return False, "Scena o takim ID już istnieje"
+
+        error = self._validate_commands(scene_data.get("commands"))
+        if error:
+            return False, error
+
+        # Zapisz i dodaj scenę
+        if self._save_configuration({"op": "put_scene", "data": scene_data}):
+            return True, "Scena dodana pomyślnie"
+        return False, "Błąd zapisywania konfiguracji"
+
+    def update_scene(self, scene_id, scene_data):
+        """
+        Aktualizuje istniejącą scenę.
+        """
+        # Znajdź scenę o podanym ID
+        if scene_id not in self.scenes:
+            return False, "Scena o podanym ID nie istnieje"
+
+        error = self._validate_commands(scene_data.get("commands"))
+        if error:
+            return False, error
+
+        # Zapisz i zaktualizuj scenę
+        if self._save_configuration({"op": "put_scene", "data": scene_data}):
+            return True, "Scena zaktualizowana pomyślnie"
+        return False, "Błąd zapisywania konfiguracji"
+
+    def delete_scene(self, scene_id):
+        """
+        Usuwa scenę.
+        """
+        # Znajdź scenę o podanym ID
+        if scene_id not in self.scenes:
+            return False, "Scena o podanym ID nie istnieje"
+
+        # Zapisz i usuń scenę
+        if self._save_configuration({"op": "delete_scene", "id": scene_id}):
+            return True, "Scena usunięta pomyślnie"
+        return False, "Błąd zapisywania konfiguracji"
+
+    def _validate_device(self, device_data):
+        """
+        Sprawdza definicję urządzenia przed zapisem w dzienniku - błędna
+        definicja nie może trafić do devices.json.
+
+        Returns:
+            str or None: Opis błędu lub None, jeśli definicja jest poprawna
+        """
+        error = validate_device(device_data)
+        if error:
+            return error
+        payloads = device_data.get("payloads")
+        if payloads is not None and not isinstance(payloads, dict):
+            return "Pole payloads musi być obiektem"
+        try:
+            payload_specs(device_data)
+        except (AttributeError, TypeError, ValueError):
+            return "Nieprawidłowy opis treści wiadomości w payloads"
+        return None
 
-        return False, "Pomieszczenie o podanym ID nie istnieje"
+    def _validate_commands(self, commands):
+        """
+        Sprawdza listę komend zbiorczych (np. komendy sceny).
+
+        Returns:
+            str or None: Opis błędu lub None, jeśli lista jest poprawna
+        """
+        if not isinstance(commands, list) or not commands:
+            return "Brak listy komend"
+        for index, item in enumerate(commands):
+            if not isinstance(item, dict) or item.get("command") in (None, ""):
+                return f"Brak komendy w pozycji {index}"
+            if not any(key in item for key in COMMAND_TARGETS):
+                return f"Brak celu komendy w pozycji {index} ({', '.join(COMMAND_TARGETS)})"
+        return None
 
-    def update_device_status_from_mqtt(self, topic, payload):
+    def update_device_status_from_mqtt(self, topic, payload, retained=False):
         """
         Aktualizuje status urządzenia na podstawie wiadomości MQTT.
+
+        Każda bieżąca wiadomość odświeża termin wygaśnięcia urządzenia
+        (patrz _liveness_timeout). Wiadomość "offline" na temacie statusu
+        lub availability (np. Last Will) od razu oznacza urządzenie jako
+        offline - na temacie statusu zmienia też pole status na "offline".
+        Wiadomość zachowana (retained, np. po subskrypcji) aktualizuje stan,
+        ale nie świadczy o tym, że urządzenie jest teraz połączone, i nie
+        zmienia last_seen - jej wiek jest nieznany.
+
+        Treść jest dekodowana raz, według pola "payloads" urządzenia
+        (patrz modules/payload_decoder.py). Jeśli wartość się nie zmieniła
+        (lub zmieniła o mniej niż deadband), słuchacze nie są powiadamiani -
+        nie rośnie wersja statusu, nic nie trafia do strumienia ani historii.
+
+        Pole "online" pojawia się w zmianach tylko przy przejściu
+        online/offline, więc słuchacze dostają je jako osobne zdarzenia.
+
+        Nowy rekord statusu jest budowany z poprzedniego i podmieniany
+        atomowo (StatusStore.update) - czytelnicy nie widzą stanu pośredniego.
         """
         # Przykład tematu: iot/device/kitchen_light/status
         # lub: iot/device/living_room_temp/value/temperature
-        parts = topic.split("/")
-
-        if len(parts) < 3:
+        resolved = self.devices.resolve_topic(topic)
+        if resolved is None:
             return False
 
-        # Sprawdź format tematu
-        if parts[0] == "iot" and parts[1] == "device":
-            device_id = parts[2]
+        device, kind, value_name = resolved
+        device_id = device["id"]
 
-            # Znajdź urządzenie o podanym ID
-            device = self.get_device(device_id)
-            if not device:
-                return False
+        if kind == "availability" or (kind == "status" and payload.lower() in OFFLINE_PAYLOADS):
+            # Jawna informacja o połączeniu urządzenia
+            explicit_online = payload.lower() not in OFFLINE_PAYLOADS
+            spec = value = None
+        else:
+            explicit_online = None
+            spec = self._payload_spec(device, "status" if kind == "status" else value_name)
+            value = spec.decode(payload)
 
-            # Aktualizuj status urządzenia
-            if device_id not in self.devices_status:
-                self.devices_status[device_id] = {
-                    "online": True,
-                    "last_seen": time.time(),
-                    "status": None,
-                    "values": {},
-                }
-
-            # Oznacz urządzenie jako online i zaktualizuj czas ostatniego kontaktu
-            self.devices_status[device_id]["online"] = True
-            self.devices_status[device_id]["last_seen"] = time.time()
-
-            # Jeśli to wiadomość statusu
-            if len(parts) >= 4 and parts[3] == "status":
-                self.devices_status[device_id]["status"] = payload
-
-            # Jeśli to wiadomość wartości
-            elif len(parts) >= 5 and parts[3] == "value":
-                value_name = parts[4]
-                self.devices_status[device_id]["values"][value_name] = payload
+        now = time.time()
+        changes = {}
 
-            return True
+        def apply(status):
+            # Wywoływana pod blokadą fragmentu - tylko obliczenie nowego rekordu
+            status = status or EMPTY_STATUS
+            changes.clear()
+            if not retained:
+                changes["last_seen"] = now
+
+            if explicit_online is not None:
+                online = explicit_online
+                if kind == "status" and status.status != OFFLINE_STATUS:
+                    changes["status"] = OFFLINE_STATUS
+            else:
+                online = True if not retained else status.online
+
+                # Jeśli to wiadomość statusu
+                if kind == "status":
+                    if spec.is_change(status.status, value):
+                        changes["status"] = value
+
+                # Jeśli to wiadomość wartości
+                elif kind == "value":
+                    if spec.is_change(status.value(value_name), value):
+                        changes["values"] = {value_name: value}
+
+            if online != status.online:
+                changes["online"] = online
+            return status.with_changes(changes)
+
+        def notify(previous, status):
+            if not changes.keys() <= {"last_seen"}:
+                self._notify_status(device_id, changes)
+
+        # Aktualizuj status urządzenia i powiadom słuchaczy
+        _, status = self.devices_status.update(device_id, apply, notify)
+        online = status.online
+        if self.status_snapshot:
+            self.status_snapshot.mark_dirty()
+
+        if not retained:
+            for callback in self._message_listeners:
+                try:
+                    callback(device_id, kind)
+                except Exception as e:
+                    print(f"Błąd powiadamiania o wiadomości urządzenia: {str(e)}")
+
+        if online and not retained:
+            self.liveness.touch(device_id, self._liveness_timeout(device))
+        elif not online:
+            self.liveness.remove(device_id)
+
+        if changes.keys() <= {"last_seen"}:
+            # Zmienił się tylko last_seen - słuchacze nie zostali powiadomieni
+            SUPPRESSED.inc()
+        return True
+
+    def _payload_spec(self, device, name):
+        """
+        Zwraca opis treści wiadomości (status lub wartość) urządzenia.
+        """
+        specs = self._payload_specs.get(device["id"])
+        if specs is None:
+            specs = self._payload_specs[device["id"]] = payload_specs(device)
+        return specs.get(name, DEFAULT_SPEC)
+
+    def _liveness_timeout(self, device):
+        """
+        Zwraca czas bez wiadomości, po którym urządzenie jest offline:
+        pole "heartbeat_timeout" urządzenia, LIVENESS_TYPE_TIMEOUTS dla typu
+        lub LIVENESS_TIMEOUT (0 - bez wykrywania).
+        """
+        timeout = device.get("heartbeat_timeout")
+        if timeout is None:
+            timeout = self.config.get("LIVENESS_TYPE_TIMEOUTS", {}).get(device.get("type"))
+        if timeout is None:
+            timeout = self.config.get("LIVENESS_TIMEOUT", 0)
+        return timeout
+
+    def _on_liveness_expired(self, device_id):
+        """
+        Oznacza urządzenie jako offline po upływie terminu (wątek LivenessMonitor).
+        """
+        def notify(previous, status):
+            if status is not previous:
+                self._notify_status(device_id, {"online": False})
 
-        return False
+        previous, status = self.devices_status.update(
+            device_id,
+            lambda status: status._replace(online=False) if status is not None and status.online else status,
+            notify,
+        )
+        if status is not previous and self.status_snapshot:
+            self.status_snapshot.mark_dirty()
 
     def send_command(self, device_id, command, mqtt_client):
         """
@@ -293,27 +858,130 @@ class DeviceManager:
         Args:
             device_id (str): ID urządzenia
             command (str or dict): Komenda do wysłania - może być stringiem lub słownikiem dla złożonych komend
-            mqtt_client: Klient MQTT
+            mqtt_client: Klient MQTT lub CommandScheduler
 
         Returns:
-            bool: Status operacji
+            tuple: (status operacji, "delivered" - przekazana do brokera,
+                "queued" - czeka na wysłanie lub None przy błędzie)
         """
         # Znajdź urządzenie o podanym ID
         device = self.get_device(device_id)
         if not device:
-            return False
+            return False, None
 
-        # Ustaw temat komendy
-        command_topic = f"{device['topic']}/command"
-        
+        # Wyślij komendę
+        delivery = _delivery(mqtt_client.publish_many(
+            [self._command_message(device, command)], [device_id]
+        )[0])
+        if delivery == "failed":
+            return False, None
+        return True, delivery
+
+    def send_commands(self, commands, mqtt_client):
+        """
+        Wysyła komendy do wielu urządzeń w jednym przebiegu publikacji.
+
+        Każda pozycja zawiera komendę i cel: device_id, device_ids (lista),
+        room lub type (room i type można łączyć). Cele wszystkich pozycji są
+        rozwiązywane z indeksów rejestru, a wiadomości publikowane razem
+        przez MQTTClient.publish_many.
+
+        Args:
+            commands (list): Lista pozycji, np. {"room": "kuchnia", "command": "off"}
+            mqtt_client: Klient MQTT
+
+        Returns:
+            list: Wynik dla każdej pozycji: {"index", "success", "devices"}
+                (devices: device_id -> "delivered", "queued" lub "failed")
+                lub {"index", "success", "error"}
+        """
+        results = []
+        messages = []
+        targets = []  # (wynik pozycji, device_id) dla kolejnych wiadomości
+        for index, item in enumerate(commands):
+            result = {"index": index, "success": False}
+            results.append(result)
+            if not isinstance(item, dict) or item.get("command") in (None, ""):
+                result["error"] = "Brak komendy"
+                continue
+
+            devices, error = self._resolve_command_targets(item)
+            if error:
+                result["error"] = error
+                continue
+
+            result["devices"] = {}
+            for device in devices:
+                messages.append(self._command_message(device, item["command"]))
+                targets.append((result, device["id"]))
+
+        if messages:
+            device_ids = [device_id for _, device_id in targets]
+            for (result, device_id), success in zip(
+                targets, mqtt_client.publish_many(messages, device_ids)
+            ):
+                result["devices"][device_id] = _delivery(success)
+
+        for result in results:
+            if "devices" in result:
+                result["success"] = "failed" not in result["devices"].values()
+        return results
+
+    def activate_scene(self, scene_id, mqtt_client):
+        """
+        Wysyła komendy sceny.
+
+        Returns:
+            list or None: Wyniki jak w send_commands lub None, jeśli scena nie istnieje
+        """
+        scene = self.scenes.get(scene_id)
+        if scene is None:
+            return None
+        return self.send_commands(scene.get("commands", []), mqtt_client)
+
+    def _resolve_command_targets(self, item):
+        """
+        Zwraca urządzenia, do których kierowana jest pozycja komendy zbiorczej.
+
+        Returns:
+            tuple: (lista urządzeń, opis błędu lub None)
+        """
+        if "device_id" in item or "device_ids" in item:
+            device_ids = item.get("device_ids") or [item.get("device_id")]
+            if not isinstance(device_ids, list):
+                return [], "Pole device_ids musi być listą"
+            devices = [self.devices.get(device_id) for device_id in device_ids]
+            missing = [device_id for device_id, device in zip(device_ids, devices) if device is None]
+            if missing:
+                return [], f"Nieznane urządzenia: {', '.join(map(str, missing))}"
+            return devices, None
+
+        if "room" in item:
+            devices = self.devices.by_room(item["room"])
+            if "type" in item:
+                devices = [device for device in devices if device.get("type") == item["type"]]
+        elif "type" in item:
+            devices = self.devices.by_type(item["type"])
+        else:
+            return [], f"Brak celu komendy ({', '.join(COMMAND_TARGETS)})"
+
+        if not devices:
+            return [], "Brak urządzeń pasujących do celu komendy"
+        return devices, None
+
+    def _command_message(self, device, command):
+        """
+        Zwraca (temat, treść, qos, ttl) wiadomości z komendą dla urządzenia.
+
+        QoS można ustawić w definicji urządzenia (pole "qos"), w przeciwnym
+        razie używany jest MQTT_QOS z konfiguracji. Pole "command_ttl" określa,
+        jak długo komenda może czekać w skrzynce nadawczej (domyślnie OUTBOX_TTL).
+        """
         # Konwertuj komendę do JSON jeśli to słownik
-        command_str = command
         if isinstance(command, dict):
-            import json
-            command_str = json.dumps(command)
-        
-        # Wyślij komendę
-        return mqtt_client.publish(command_topic, command_str)
+            command = json.dumps(command)
+        qos = device.get("qos", self.config.get("MQTT_QOS", 0))
+        return f"{device['topic']}/command", command, qos, device.get("command_ttl")
 
     def handle_toggle_slider_command(self, device_id, command_str, mqtt_client):
         """
@@ -353,3 +1021,12 @@ class DeviceManager:
             return True
         except (ValueError, TypeError):
             return False
+
+
+def _delivery(status):
+    """
+    Zamienia wynik publikacji na opis dostarczenia komendy.
+    """
+    if status == QUEUED:
+        return "queued"
+    return "delivered" if status else "failed"
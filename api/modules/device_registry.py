@@ -0,0 +1,263 @@
+# modules/device_registry.py
+import threading
+
+from modules.status_store import compact
+
+
+def compact_device(device):
+    """
+    Zwraca kopię definicji urządzenia z internowanymi kluczami i krótkimi
+    napisami (typ, pomieszczenie, nazwy wartości) - definicje tysięcy
+    urządzeń współdzielą te same obiekty napisów.
+    """
+    if isinstance(device, dict):
+        return {compact(key): compact_device(value) for key, value in device.items()}
+    if isinstance(device, list):
+        return [compact_device(item) for item in device]
+    return compact(device)
+
+
+def validate_device(device):
+    """
+    Sprawdza pola definicji urządzenia używane przez indeksy rejestru.
+
+    Returns:
+        str or None: Opis błędu lub None, jeśli definicja jest poprawna
+    """
+    if not isinstance(device, dict):
+        return "Definicja urządzenia musi być obiektem"
+    if not isinstance(device.get("id"), str) or not device["id"]:
+        return "Pole id musi być niepustym tekstem"
+    for key in ("topic", "room", "type"):
+        if device.get(key) is not None and not isinstance(device[key], str):
+            return f"Pole {key} musi być tekstem"
+    value_topics = device.get("valueTopics")
+    if value_topics is not None:
+        if not isinstance(value_topics, dict):
+            return "Pole valueTopics musi być obiektem"
+        for value_name, topic_suffix in value_topics.items():
+            if not isinstance(topic_suffix, str) or not topic_suffix:
+                return f"Nieprawidłowy temat wartości {value_name} w valueTopics"
+    return None
+
+
+class DeviceRegistry:
+    def __init__(self, devices=None):
+        """
+        Inicjalizacja rejestru urządzeń z indeksami po ID, temacie,
+        pomieszczeniu i typie.
+
+        Zmiany (put, remove) i odczyty zwracające listy są wykonywane pod
+        blokadą - konfiguracja może się zmieniać w innym wątku (API,
+        przeładowanie pliku, zmiany od innego workera). Wyszukiwanie po
+        temacie (resolve_topic) działa bez blokady.
+
+        Args:
+            devices (list, optional): Początkowa lista urządzeń
+        """
+        self._by_id = {}  # device_id -> urządzenie (w kolejności dodania)
+        self._by_topic = {}  # temat z valueTopics -> (device_id, rodzaj, nazwa)
+        self._by_base_topic = {}  # temat bazowy urządzenia -> device_id
+        self._by_room = {}  # room -> {device_id: None}
+        self._by_type = {}  # type -> {device_id: None}
+        self._topic_filters = {}  # filtr subskrypcji -> liczba urządzeń
+        self._lock = threading.Lock()
+
+        for device in devices or []:
+            self.put(device)
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __contains__(self, device_id):
+        return device_id in self._by_id
+
+    def __iter__(self):
+        return iter(self.all())
+
+    def all(self):
+        """
+        Zwraca listę wszystkich urządzeń.
+        """
+        with self._lock:
+            return list(self._by_id.values())
+
+    def get(self, device_id):
+        """
+        Zwraca urządzenie o podanym ID lub None.
+        """
+        return self._by_id.get(device_id)
+
+    def by_room(self, room_id):
+        """
+        Zwraca listę urządzeń w podanym pomieszczeniu.
+        """
+        with self._lock:
+            return [self._by_id[device_id] for device_id in self._by_room.get(room_id, ())]
+
+    def by_type(self, device_type):
+        """
+        Zwraca listę urządzeń podanego typu.
+        """
+        with self._lock:
+            return [self._by_id[device_id] for device_id in self._by_type.get(device_type, ())]
+
+    def put(self, device):
+        """
+        Dodaje urządzenie lub zastępuje istniejące o tym samym ID.
+
+        Returns:
+            dict or None: Poprzednia definicja urządzenia
+
+        Raises:
+            ValueError: Nieprawidłowa definicja (rejestr pozostaje bez zmian)
+        """
+        error = validate_device(device)
+        if error:
+            raise ValueError(error)
+        device = compact_device(device)
+        device_id = device["id"]
+        with self._lock:
+            previous = self._by_id.get(device_id)
+            if previous is not None:
+                self._unindex(previous)
+            self._by_id[device_id] = device
+            self._index(device)
+        return previous
+
+    def remove(self, device_id):
+        """
+        Usuwa urządzenie z rejestru.
+
+        Returns:
+            dict or None: Usunięte urządzenie
+        """
+        with self._lock:
+            device = self._by_id.get(device_id)
+            if device is not None:
+                # Najpierw indeksy - resolve_topic (bez blokady) nie znajdzie
+                # tematu urządzenia, którego nie ma już w _by_id
+                self._unindex(device)
+                del self._by_id[device_id]
+        return device
+
+    def topic_filters(self):
+        """
+        Zwraca minimalny zestaw filtrów MQTT obejmujący wszystkie urządzenia.
+
+        Urządzenia o tematach <prefiks>/<id> dzielą filtry <prefiks>/+/status,
+        <prefiks>/+/availability i <prefiks>/+/value/#, więc dla standardowego
+        układu iot/device/<id> wystarczają trzy subskrypcje niezależnie od
+        liczby urządzeń.
+        """
+        with self._lock:
+            return list(self._topic_filters)
+
+    @staticmethod
+    def topic_filters_for(device):
+        """
+        Zwraca filtry subskrypcji obejmujące tematy, na które urządzenie
+        publikuje (status, availability, wartości).
+
+        Filtr <prefiks>/+/# obejmowałby też tematy <urządzenie>/command -
+        każda komenda wysłana przez aplikację wracałaby do niej jako wiadomość.
+        """
+        base = device.get("topic")
+        if not base:
+            return []
+        parent, _, _ = base.rpartition("/")
+        prefix = f"{parent}/+" if parent else base
+        filters = [f"{prefix}/status", f"{prefix}/availability", f"{prefix}/value/#"]
+        for topic_suffix in (device.get("valueTopics") or {}).values():
+            if not topic_suffix.startswith("value/"):
+                filters.append(f"{prefix}/{topic_suffix}")
+        return list(dict.fromkeys(filters))
+
+    def resolve_topic(self, topic):
+        """
+        Wyszukuje urządzenie, którego dotyczy wiadomość MQTT.
+
+        Args:
+            topic (str): Temat wiadomości
+
+        Returns:
+            tuple or None: (urządzenie, rodzaj, nazwa), gdzie rodzaj to "status",
+                "availability" (online/offline, np. LWT) lub "value", a nazwa to
+                nazwa wartości (dla pozostałych rodzajów None)
+        """
+        # Tematy wartości zadeklarowane w konfiguracji urządzeń (valueTopics)
+        entry = self._by_topic.get(topic)
+        if entry is not None:
+            device_id, kind, name = entry
+            return self._by_id[device_id], kind, name
+
+        # <temat urządzenia>/status i <temat urządzenia>/availability
+        base, _, suffix = topic.rpartition("/")
+        if suffix in ("status", "availability"):
+            device_id = self._by_base_topic.get(base)
+            if device_id is not None:
+                return self._by_id[device_id], suffix, None
+
+        # Niezadeklarowane wartości: <temat urządzenia>/value/<nazwa>
+        parts = topic.rsplit("/", 2)
+        if len(parts) == 3 and parts[1] == "value":
+            device_id = self._by_base_topic.get(parts[0])
+            if device_id is not None:
+                return self._by_id[device_id], "value", parts[2]
+
+        # Zgodność wsteczna: iot/device/<id>/... dla urządzeń o innym temacie
+        parts = topic.split("/")
+        if len(parts) >= 4 and parts[0] == "iot" and parts[1] == "device":
+            device = self._by_id.get(parts[2])
+            if device is not None:
+                if parts[3] in ("status", "availability"):
+                    return device, parts[3], None
+                if len(parts) >= 5 and parts[3] == "value":
+                    return device, "value", parts[4]
+
+        return None
+
+    def _device_topics(self, device):
+        """
+        Zwraca pełne tematy wartości zadeklarowanych w valueTopics urządzenia.
+
+        Tematy status i availability nie są indeksowane osobno - wynikają
+        z tematu bazowego (_by_base_topic), co oszczędza dwa wpisy na urządzenie.
+        """
+        base = device.get("topic")
+        if not base:
+            return []
+        return [
+            (f"{base}/{topic_suffix}", "value", value_name)
+            for value_name, topic_suffix in (device.get("valueTopics") or {}).items()
+        ]
+
+    def _index(self, device):
+        device_id = device["id"]
+        for topic, kind, name in self._device_topics(device):
+            self._by_topic[topic] = (device_id, kind, name)
+        if device.get("topic"):
+            self._by_base_topic[device["topic"]] = device_id
+        for topic_filter in self.topic_filters_for(device):
+            self._topic_filters[topic_filter] = self._topic_filters.get(topic_filter, 0) + 1
+        self._by_room.setdefault(device.get("room"), {})[device_id] = None
+        self._by_type.setdefault(device.get("type"), {})[device_id] = None
+
+    def _unindex(self, device):
+        device_id = device["id"]
+        for topic, _, _ in self._device_topics(device):
+            if self._by_topic.get(topic, (None,))[0] == device_id:
+                del self._by_topic[topic]
+        if self._by_base_topic.get(device.get("topic")) == device_id:
+            del self._by_base_topic[device["topic"]]
+        for topic_filter in self.topic_filters_for(device):
+            if topic_filter in self._topic_filters:
+                self._topic_filters[topic_filter] -= 1
+                if not self._topic_filters[topic_filter]:
+                    del self._topic_filters[topic_filter]
+        for index, key in ((self._by_room, device.get("room")), (self._by_type, device.get("type"))):
+            members = index.get(key)
+            if members is not None:
+                members.pop(device_id, None)
+                if not members:
+                    del index[key]
@@ -0,0 +1,168 @@
+# modules/ingest_queue.py
+import threading
+from collections import deque
+
+# Polityki przepełnienia kolejki
+DROP_OLDEST = "drop-oldest"  # Usuń najstarszą wiadomość
+COALESCE = "coalesce"  # Zastąp oczekującą wiadomość z tego samego tematu, inaczej usuń najstarszą
+BLOCK = "block"  # Wstrzymaj producenta do zwolnienia miejsca (z limitem czasu)
+
+POLICIES = (DROP_OLDEST, COALESCE, BLOCK)
+
+
+class IngestQueue:
+    def __init__(self, handler, maxsize=10000, policy=DROP_OLDEST, batch_size=100,
+                 block_timeout=1.0, logger=None):
+        """
+        Inicjalizacja ograniczonej kolejki wiadomości przychodzących.
+
+        Wątek sieciowy tylko dodaje wiadomości do kolejki, a osobny wątek
+        roboczy przekazuje je partiami do funkcji obsługi.
+
+        Args:
+            handler (function): Funkcja przyjmująca listę wiadomości
+                [topic, payload, retain, timestamp]
+            maxsize (int): Maksymalna liczba oczekujących wiadomości
+            policy (str): Polityka przepełnienia (drop-oldest, coalesce, block)
+            batch_size (int): Maksymalna liczba wiadomości w jednej partii
+            block_timeout (float): Maksymalny czas oczekiwania dla polityki block
+            logger: Logger do raportowania błędów
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Nieznana polityka kolejki: {policy}")
+
+        self._handler = handler
+        self.maxsize = maxsize
+        self.policy = policy
+        self.batch_size = batch_size
+        self.block_timeout = block_timeout
+        self.logger = logger
+
+        self._items = deque()
+        self._by_topic = {}  # topic -> najnowszy oczekujący wpis (polityka coalesce)
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._thread = None
+        self._running = False
+
+        # Liczniki
+        self.received = 0
+        self.processed = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.batches = 0
+        self.max_depth = 0
+
+    def start(self):
+        """
+        Uruchamia wątek roboczy (wywołanie wielokrotne jest bezpieczne).
+        """
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name="mqtt-ingest", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """
+        Zatrzymuje wątek roboczy po opróżnieniu kolejki.
+        """
+        with self._lock:
+            self._running = False
+            self._not_empty.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def put(self, topic, payload, retain=False, timestamp=None):
+        """
+        Dodaje wiadomość do kolejki zgodnie z polityką przepełnienia.
+
+        Returns:
+            bool: False, jeśli wiadomość została odrzucona
+        """
+        with self._lock:
+            self.received += 1
+
+            if self.policy == COALESCE and len(self._items) >= self.maxsize:
+                # Tylko przy pełnej kolejce - poniżej limitu każda wiadomość
+                # jest przekazywana (np. kolejne zmiany stanu urządzenia)
+                entry = self._by_topic.get(topic)
+                if entry is not None:
+                    # Najnowsza wartość zastępuje oczekującą (kolejność bez zmian)
+                    entry[1] = payload
+                    entry[2] = retain
+                    entry[3] = timestamp
+                    self.coalesced += 1
+                    return True
+
+            if len(self._items) >= self.maxsize:
+                if self.policy == BLOCK:
+                    self._not_full.wait_for(
+                        lambda: len(self._items) < self.maxsize, self.block_timeout
+                    )
+                    if len(self._items) >= self.maxsize:
+                        self.dropped += 1
+                        return False
+                else:
+                    self._forget(self._items.popleft())
+                    self.dropped += 1
+
+            entry = [topic, payload, retain, timestamp]
+            self._items.append(entry)
+            if self.policy == COALESCE:
+                self._by_topic[topic] = entry
+            if len(self._items) > self.max_depth:
+                self.max_depth = len(self._items)
+            self._not_empty.notify()
+            return True
+
+    def stats(self):
+        """
+        Zwraca statystyki kolejki.
+        """
+        with self._lock:
+            return {
+                "policy": self.policy,
+                "depth": len(self._items),
+                "max_depth": self.max_depth,
+                "capacity": self.maxsize,
+                "received": self.received,
+                "processed": self.processed,
+                "dropped": self.dropped,
+                "coalesced": self.coalesced,
+                "batches": self.batches,
+            }
+
+    def _forget(self, entry):
+        if self._by_topic.get(entry[0]) is entry:
+            del self._by_topic[entry[0]]
+
+    def _take_batch(self):
+        with self._lock:
+            self._not_empty.wait_for(lambda: self._items or not self._running)
+            batch = []
+            while self._items and len(batch) < self.batch_size:
+                entry = self._items.popleft()
+                self._forget(entry)
+                batch.append(entry)
+            if batch:
+                self._not_full.notify_all()
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                # Kolejka pusta i zatrzymana
+                return
+            try:
+                self._handler(batch)
+            except Exception as e:
+                if self.logger:
+                    self.logger.error(f"Błąd przetwarzania partii wiadomości MQTT: {str(e)}")
+            with self._lock:
+                self.processed += len(batch)
+                self.batches += 1
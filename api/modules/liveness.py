@@ -0,0 +1,130 @@
+# modules/liveness.py
+import math
+import threading
+import time
+
+
+class LivenessMonitor:
+    def __init__(self, on_expire, tick=1.0, slots=512, logger=None):
+        """
+        Wykrywanie urządzeń, które przestały wysyłać wiadomości (koło czasowe).
+
+        Każde urządzenie ma termin wygaśnięcia zaokrąglony do pełnego tiku
+        i trafia do kubełka (termin % slots). Odświeżenie to przeniesienie
+        między dwoma kubełkami - O(1), a wątek w tle co tik przegląda tylko
+        jeden kubełek, czyli urządzenia wygasające w tej chwili (oraz te, których
+        termin przypada na kolejny obrót koła).
+
+        Args:
+            on_expire (function): Funkcja wywoływana z device_id po upływie terminu
+            tick (float): Rozdzielczość koła w sekundach
+            slots (int): Liczba kubełków (jeden obrót = slots * tick sekund)
+            logger: Logger do raportowania błędów
+        """
+        self.on_expire = on_expire
+        self.tick = tick
+        self.slots = slots
+        self.logger = logger
+        self._buckets = [set() for _ in range(slots)]
+        self._deadlines = {}  # device_id -> numer tiku wygaśnięcia
+        self._lock = threading.Lock()
+        self._current = self._tick_at(time.monotonic())
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def _tick_at(self, timestamp):
+        return int(timestamp // self.tick)
+
+    def start(self):
+        """
+        Uruchamia wątek sprawdzający terminy.
+        """
+        if self._thread is None:
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="liveness", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """
+        Zatrzymuje wątek sprawdzający terminy.
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def touch(self, device_id, timeout):
+        """
+        Przesuwa termin wygaśnięcia urządzenia na teraz + timeout.
+
+        Args:
+            device_id (str): ID urządzenia
+            timeout (float): Czas bez wiadomości, po którym urządzenie jest offline
+                (None lub 0 - urządzenie nie wygasa)
+        """
+        if not timeout:
+            self.remove(device_id)
+            return
+        deadline = self._tick_at(time.monotonic() + timeout) + 1
+        with self._lock:
+            previous = self._deadlines.get(device_id)
+            if previous == deadline:
+                return
+            if previous is not None:
+                self._buckets[previous % self.slots].discard(device_id)
+            self._deadlines[device_id] = deadline
+            self._buckets[deadline % self.slots].add(device_id)
+
+    def remove(self, device_id):
+        """
+        Przestaje śledzić urządzenie (np. po usunięciu lub wiadomości "offline").
+        """
+        with self._lock:
+            deadline = self._deadlines.pop(device_id, None)
+            if deadline is not None:
+                self._buckets[deadline % self.slots].discard(device_id)
+
+    def __contains__(self, device_id):
+        return device_id in self._deadlines
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def advance(self, now=None):
+        """
+        Przetwarza kubełki do bieżącego tiku.
+
+        Returns:
+            list: ID urządzeń, których termin upłynął
+        """
+        target = self._tick_at(time.monotonic() if now is None else now)
+        expired = []
+        with self._lock:
+            # Po dłuższej przerwie wystarczy jeden pełny obrót koła
+            first = max(self._current + 1, target - self.slots + 1)
+            for current in range(first, target + 1):
+                bucket = self._buckets[current % self.slots]
+                if not bucket:
+                    continue
+                for device_id in [d for d in bucket if self._deadlines[d] <= target]:
+                    bucket.discard(device_id)
+                    del self._deadlines[device_id]
+                    expired.append(device_id)
+            self._current = max(self._current, target)
+
+        for device_id in expired:
+            try:
+                self.on_expire(device_id)
+            except Exception as e:
+                if self.logger:
+                    self.logger.error(f"Błąd obsługi wygaśnięcia urządzenia {device_id}: {str(e)}")
+        return expired
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            # Czekaj do początku następnego tiku
+            now = time.monotonic()
+            next_tick = (math.floor(now / self.tick) + 1) * self.tick
+            if self._stop_event.wait(next_tick - now):
+                return
+            self.advance()
@@ -0,0 +1,119 @@
+# modules/log_sampler.py
+import threading
+import time
+
+
+class MessageLogSampler:
+    def __init__(self, logger, max_per_interval=5, interval=60.0, level_name="info"):
+        """
+        Inicjalizacja próbkowania logów wiadomości MQTT.
+
+        Dla każdego tematu loguje co najwyżej max_per_interval wiadomości
+        w oknie interval sekund. Pozostałe są tylko zliczane, a po zakończeniu
+        okna zapisywana jest jedna linia podsumowania - przez następną
+        wiadomość lub wątek uruchomiony przez start(), jeśli ruch ustał.
+
+        Args:
+            logger: Logger aplikacji
+            max_per_interval (int): Limit linii na temat w oknie (0 - brak limitu)
+            interval (float): Długość okna w sekundach
+            level_name (str): Poziom logowania wiadomości
+        """
+        self.logger = logger
+        self.max_per_interval = max_per_interval
+        self.interval = interval
+        self._log = getattr(logger, level_name)
+        self._lock = threading.Lock()
+        self._window_start = time.monotonic()
+        self._logged = {}  # topic -> liczba zalogowanych linii w oknie
+        self._suppressed = {}  # topic -> liczba pominiętych linii w oknie
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """
+        Uruchamia wątek zapisujący podsumowanie po zakończeniu każdego okna.
+        """
+        if self.max_per_interval and self._thread is None:
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="mqtt-log-summary", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """
+        Zatrzymuje wątek podsumowań i zapisuje podsumowanie bieżącego okna.
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def log(self, direction, topic, payload):
+        """
+        Loguje wiadomość, jeśli nie przekroczono limitu dla tematu.
+
+        Args:
+            direction (str): Opis kierunku, np. "Otrzymano wiadomość z"
+            topic (str): Temat wiadomości
+            payload (str): Treść wiadomości
+        """
+        if not self.max_per_interval:
+            self._log(f"{direction} {topic}: {payload}", stacklevel=2)
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            summary = self._end_window(now)
+            count = self._logged.get(topic, 0)
+            if count < self.max_per_interval:
+                self._logged[topic] = count + 1
+                allowed = True
+            else:
+                self._suppressed[topic] = self._suppressed.get(topic, 0) + 1
+                allowed = False
+
+        if summary:
+            self._log_summary(summary)
+        if allowed:
+            self._log(f"{direction} {topic}: {payload}", stacklevel=2)
+
+    def flush(self):
+        """
+        Zapisuje podsumowanie bieżącego okna.
+        """
+        with self._lock:
+            summary = self._end_window(time.monotonic(), force=True)
+        if summary:
+            self._log_summary(summary)
+
+    def _end_window(self, now, force=False):
+        # Wywoływana pod blokadą - zamyka okno, jeśli minęło, i zwraca
+        # liczniki pominiętych wiadomości
+        if not force and now - self._window_start < self.interval:
+            return None
+        summary = self._suppressed
+        self._suppressed = {}
+        self._logged = {}
+        self._window_start = now
+        return summary
+
+    def _run(self):
+        while True:
+            with self._lock:
+                remaining = self._window_start + self.interval - time.monotonic()
+            if self._stop_event.wait(max(remaining, 0)):
+                return
+            with self._lock:
+                summary = self._end_window(time.monotonic())
+            if summary:
+                self._log_summary(summary)
+
+    def _log_summary(self, summary):
+        total = sum(summary.values())
+        top = sorted(summary.items(), key=lambda item: item[1], reverse=True)[:10]
+        details = ", ".join(f"{topic}: {count}" for topic, count in top)
+        self._log(
+            f"Pominięto {total} wiadomości z {len(summary)} tematów "
+            f"w ciągu {self.interval:.0f} s ({details})"
+        )
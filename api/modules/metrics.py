@@ -0,0 +1,265 @@
+# modules/metrics.py
+import bisect
+import os
+import threading
+import weakref
+
+# Domyślne przedziały histogramów czasu w sekundach
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        """
+        Metryka agregowana per wątek.
+
+        Każdy wątek zapisuje do własnego słownika (bez blokad na ścieżce
+        zapisu), a wartości są sumowane dopiero przy odczycie /metrics.
+        Dane zakończonych wątków są przenoszone do wspólnej sumy.
+        """
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._cells = []  # Słowniki wszystkich żywych wątków
+        self._retired = {}  # Suma z zakończonych wątków
+        self._lock = threading.Lock()
+
+    def _thread_cells(self):
+        cells = {}
+        self._local.cells = cells
+        with self._lock:
+            self._cells.append(cells)
+        weakref.finalize(threading.current_thread(), self._retire, cells)
+        return cells
+
+    def _retire(self, cells):
+        with self._lock:
+            self._cells = [item for item in self._cells if item is not cells]
+            for labels, value in cells.items():
+                self._retired[labels] = self._combine(self._retired.get(labels), value)
+
+    def collect(self):
+        """
+        Zwraca zsumowane wartości: etykiety -> wartość.
+        """
+        with self._lock:
+            snapshots = [dict(cells) for cells in self._cells]
+            total = dict(self._retired)
+        for snapshot in snapshots:
+            for labels, value in snapshot.items():
+                total[labels] = self._combine(total.get(labels), value)
+        if not total and not self.labelnames:
+            # Metryka bez etykiet jest eksportowana także przed pierwszym zapisem
+            total[()] = self._empty()
+        return total
+
+    def _empty(self):
+        return 0
+
+    @staticmethod
+    def _combine(current, value):
+        raise NotImplementedError
+
+    def _label_text(self, labels, extra=()):
+        pairs = list(zip(self.labelnames, labels)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, labels=()):
+        """
+        Zwiększa licznik (labels - krotka wartości etykiet w kolejności labelnames).
+        """
+        cells = getattr(self._local, "cells", None)
+        if cells is None:
+            cells = self._thread_cells()
+        cells[labels] = cells.get(labels, 0) + amount
+
+    @staticmethod
+    def _combine(current, value):
+        return value if current is None else current + value
+
+    def render(self):
+        lines = []
+        for labels, value in sorted(self.collect().items()):
+            lines.append(f"{self.name}{self._label_text(labels)} {_format(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, labels=()):
+        """
+        Dodaje pomiar (labels - krotka wartości etykiet w kolejności labelnames).
+        """
+        cells = getattr(self._local, "cells", None)
+        if cells is None:
+            cells = self._thread_cells()
+        cell = cells.get(labels)
+        if cell is None:
+            # Liczniki przedziałów (ostatni to +Inf), suma, liczba
+            cell = cells[labels] = self._empty()
+        cell[bisect.bisect_left(self.buckets, value)] += 1
+        cell[-2] += value
+        cell[-1] += 1
+
+    def collect(self):
+        # Kopie list - wątki mogą je modyfikować w trakcie sumowania
+        with self._lock:
+            snapshots = [{labels: list(cell) for labels, cell in list(cells.items())} for cells in self._cells]
+            total = {labels: list(cell) for labels, cell in self._retired.items()}
+        for snapshot in snapshots:
+            for labels, cell in snapshot.items():
+                total[labels] = self._combine(total.get(labels), cell)
+        if not total and not self.labelnames:
+            total[()] = self._empty()
+        return total
+
+    def _empty(self):
+        return [0] * (len(self.buckets) + 1) + [0.0, 0]
+
+    @staticmethod
+    def _combine(current, value):
+        if current is None:
+            return list(value)
+        return [a + b for a, b in zip(current, value)]
+
+    def render(self):
+        lines = []
+        for labels, cell in sorted(self.collect().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), cell):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format(bound)
+                lines.append(f"{self.name}_bucket{self._label_text(labels, [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{self._label_text(labels)} {_format(cell[-2])}")
+            lines.append(f"{self.name}_count{self._label_text(labels)} {cell[-1]}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name, help_text, function, labelnames=(), kind="gauge"):
+        """
+        Metryka odczytywana w chwili pobrania /metrics.
+
+        Args:
+            function (function): Zwraca wartość lub słownik etykiety -> wartość
+                (None - metryka niedostępna)
+            kind (str): Typ metryki - "gauge" lub "counter" dla liczników
+                prowadzonych poza rejestrem (np. statystyki kolejki)
+        """
+        self.kind = kind
+        self.name = name
+        self.help = help_text
+        self.function = function
+        self.labelnames = tuple(labelnames)
+
+    def render(self):
+        value = self.function()
+        if value is None:
+            return []
+        if not isinstance(value, dict):
+            value = {(): value}
+        lines = []
+        for labels, item in sorted(value.items()):
+            pairs = zip(self.labelnames, labels)
+            label_text = ",".join(f'{name}="{_escape(label)}"' for name, label in pairs)
+            label_text = "{" + label_text + "}" if label_text else ""
+            lines.append(f"{self.name}{label_text} {_format(item)}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        """
+        Rejestr metryk eksportowanych w formacie tekstowym Prometheusa.
+        """
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        """
+        Rejestruje licznik (lub zwraca istniejący o tej nazwie).
+        """
+        return self._register(Counter(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """
+        Rejestruje histogram (lub zwraca istniejący o tej nazwie).
+        """
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def gauge(self, name, help_text, function, labelnames=(), kind="gauge"):
+        """
+        Rejestruje metrykę odczytywaną funkcją przy każdym pobraniu
+        (zastępuje wcześniejszą o tej nazwie).
+        """
+        with self._lock:
+            gauge = self._metrics[name] = Gauge(name, help_text, function, labelnames, kind)
+        return gauge
+
+    def render(self):
+        """
+        Zwraca wszystkie metryki w formacie tekstowym Prometheusa (0.0.4).
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        output = []
+        for metric in metrics:
+            try:
+                lines = metric.render()
+            except Exception:
+                # Błąd odczytu jednej metryki nie psuje całego eksportu
+                continue
+            output.append(f"# HELP {metric.name} {metric.help}")
+            output.append(f"# TYPE {metric.name} {metric.kind}")
+            output.extend(lines)
+        return "\n".join(output) + "\n"
+
+
+def process_rss_bytes():
+    """
+    Zwraca bieżącą pamięć rezydentną procesu (RSS) w bajtach lub None.
+    """
+    try:
+        with open("/proc/self/statm", "r") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format(value):
+    if isinstance(value, float):
+        if value == float("inf"):
+            return "+Inf"
+        return repr(value)
+    return str(value)
+
+
+# Wspólny rejestr procesu - moduły definiują w nim swoje metryki
+registry = MetricsRegistry()
@@ -1,14 +1,62 @@
 # modules/mqtt_client.py
 import paho.mqtt.client as mqtt
 import json
+import random
 import time
 import threading
 
+from modules.topic_router import TopicRouter
+from modules.ingest_queue import IngestQueue, DROP_OLDEST
+from modules.log_sampler import MessageLogSampler
+from modules.outbox import QUEUED
+from modules.metrics import registry
+
+MESSAGES_RECEIVED = registry.counter(
+    "mqtt_messages_received_total", "Wiadomości MQTT odebrane z brokera"
+)
+MESSAGES_PUBLISHED = registry.counter(
+    "mqtt_messages_published_total", "Wiadomości MQTT przekazane do wysłania"
+)
+PUBLISH_FAILURES = registry.counter(
+    "mqtt_publish_failures_total", "Publikacje MQTT odrzucone przez klienta"
+)
+MESSAGE_PROCESSING = registry.histogram(
+    "mqtt_message_processing_seconds", "Czas obsługi pojedynczej wiadomości MQTT"
+)
+RECONNECTS = registry.counter(
+    "mqtt_reconnects_total", "Ponowne połączenia z brokerem MQTT"
+)
+CONNECT_ATTEMPTS = registry.counter(
+    "mqtt_connect_attempts_total", "Próby połączenia z brokerem MQTT"
+)
+
+# Połączenie trwające dłużej zeruje licznik prób (opóźnienie wraca do minimum)
+STABLE_CONNECTION = 30.0
+
 
 class MQTTClient:
-    def __init__(self, broker, port, username, password, keepalive, logger):
+    def __init__(self, broker, port, username, password, keepalive, logger,
+                 ingest_queue_size=10000, ingest_policy=DROP_OLDEST, ingest_batch_size=100,
+                 message_log_limit=5, message_log_interval=60.0, qos=0,
+                 command_tracker=None, reconnect_min_delay=0.5, reconnect_max_delay=60.0,
+                 outbox=None):
         """
         Inicjalizacja klienta MQTT.
+
+        Wiadomości przychodzące są przetwarzane poza wątkiem sieciowym paho,
+        przez ograniczoną kolejkę (ingest_queue_size, ingest_policy,
+        ingest_batch_size - patrz modules/ingest_queue.py). Logi pojedynczych
+        wiadomości są próbkowane per temat (message_log_limit linii na
+        message_log_interval sekund, 0 - loguj wszystkie).
+
+        Komendy są publikowane z QoS qos (lub QoS urządzenia), a ich
+        potwierdzenia i odpowiedzi mierzy command_tracker
+        (patrz modules/command_tracker.py).
+
+        Połączeniem zarządza jeden wątek nadzorcy - po utracie połączenia
+        ponawia próby co reconnect_min_delay..reconnect_max_delay sekund
+        (wykładniczo, z losowym rozrzutem). Komendy wydane bez połączenia
+        trafiają do outbox (patrz modules/outbox.py) i są wysyłane po połączeniu.
         """
         self.broker = broker
         self.port = port
@@ -21,52 +69,76 @@ class MQTTClient:
         self.client.on_connect = self._on_connect
         self.client.on_message = self._on_message
         self.client.on_disconnect = self._on_disconnect
+        self.client.on_publish = self._on_publish
+        self.client.on_subscribe = self._on_subscribe
+        self.reconnect_min_delay = reconnect_min_delay
+        self.reconnect_max_delay = reconnect_max_delay
+        self.qos = qos
+        self.command_tracker = command_tracker
+        self.outbox = outbox
         self._connected = False
+        self._ever_connected = False
+        self._connected_at = None
+        self._subscribed = False
+        self._subscribe_mid = None
+        self._supervisor = None
+        self._stopping = threading.Event()
+        self._publish_forwarder = None
         self.device_manager = None
-        self.topics = {}  # Słownik tematów i ich callbacków
+        self.topics = set()  # Filtry zasubskrybowane w brokerze
+        self._device_filters = set()  # Filtry wynikające z tematów urządzeń
+        self._device_filters_lock = threading.Lock()
+        self.router = TopicRouter()  # Filtry tematów i ich callbacki
+        self.message_log = MessageLogSampler(
+            logger, max_per_interval=message_log_limit, interval=message_log_interval
+        )
+        self.ingest = IngestQueue(
+            self._process_messages,
+            maxsize=ingest_queue_size,
+            policy=ingest_policy,
+            batch_size=ingest_batch_size,
+            logger=logger,
+        )
 
     def set_device_manager(self, device_manager):
         """
         Ustawia referencję do menedżera urządzeń.
+
+        Subskrypcje są uzgadniane po każdej zmianie urządzeń (API, inny
+        worker, przeładowanie pliku konfiguracji).
         """
         self.device_manager = device_manager
+        device_manager.add_registry_listener(self._on_registry_change)
 
     def connect(self):
         """
-        Nawiązuje połączenie z brokerem MQTT.
+        Uruchamia połączenie z brokerem MQTT w tle i wraca od razu.
+
+        Tematy wszystkich urządzeń są subskrybowane po każdym nawiązaniu
+        połączenia (jednym żądaniem SUBSCRIBE w _on_connect).
         """
-        try:
-            self.client.connect(self.broker, self.port, self.keepalive)
-            self.client.loop_start()
-            self.logger.info("Próba połączenia z brokerem MQTT")
-
-            # Poczekaj na połączenie
-            timeout = 5  # sekundy
-            start_time = time.time()
-            while not self._connected and time.time() - start_time < timeout:
-                time.sleep(0.1)
-
-            if self._connected:
-                self.logger.info("Połączono z brokerem MQTT")
-                # Subskrybuj tematy dla wszystkich urządzeń
-                if self.device_manager:
-                    self._subscribe_to_all_devices()
-                return True
-            else:
-                self.logger.error(
-                    "Nie udało się połączyć z brokerem MQTT w określonym czasie"
-                )
-                return False
-        except Exception as e:
-            self.logger.error(f"Błąd połączenia MQTT: {str(e)}")
-            return False
+        self.ingest.start()
+        self.message_log.start()
+        if self.device_manager:
+            self.sync_device_subscriptions()
+        if self._supervisor is None:
+            self._stopping.clear()
+            self._supervisor = threading.Thread(
+                target=self._supervise, name="mqtt-supervisor", daemon=True
+            )
+            self._supervisor.start()
 
     def disconnect(self):
         """
-        Zamyka połączenie z brokerem MQTT.
+        Zamyka połączenie z brokerem MQTT i zatrzymuje wątek nadzorcy.
         """
-        self.client.loop_stop()
+        self._stopping.set()
         self.client.disconnect()
+        if self._supervisor is not None:
+            self._supervisor.join(timeout=5.0)
+            self._supervisor = None
+        self.ingest.stop()
+        self.message_log.stop()
         self._connected = False
         self.logger.info("Rozłączono z brokerem MQTT")
 
@@ -76,24 +148,174 @@ class MQTTClient:
         """
         return self._connected
 
-    def publish(self, topic, message):
+    def is_ready(self):
+        """
+        Sprawdza, czy klient jest połączony i broker potwierdził subskrypcje.
+        """
+        return self._connected and self._subscribed
+
+    def _supervise(self):
+        """
+        Wątek nadzorcy: łączy się z brokerem, obsługuje pętlę sieciową paho
+        i po utracie połączenia czeka z wykładniczym opóźnieniem.
+        """
+        attempt = 0
+        while not self._stopping.is_set():
+            CONNECT_ATTEMPTS.inc()
+            try:
+                self.logger.info("Próba połączenia z brokerem MQTT")
+                self.client.connect(self.broker, self.port, self.keepalive)
+            except Exception as e:
+                self.logger.error(f"Błąd połączenia MQTT: {str(e)}")
+            else:
+                rc = mqtt.MQTT_ERR_SUCCESS
+                while rc == mqtt.MQTT_ERR_SUCCESS and not self._stopping.is_set():
+                    rc = self.client.loop(timeout=1.0)
+            self._connected = False
+            self._subscribed = False
+            if self._stopping.is_set():
+                return
+
+            connected_at, self._connected_at = self._connected_at, None
+            if connected_at is not None and time.monotonic() - connected_at >= STABLE_CONNECTION:
+                attempt = 0
+            delay = self._reconnect_delay(attempt)
+            attempt += 1
+            self.logger.warning(f"Ponowna próba połączenia MQTT za {delay:.1f} s")
+            self._stopping.wait(delay)
+
+    def _reconnect_delay(self, attempt):
+        """
+        Zwraca opóźnienie kolejnej próby połączenia: wykładnicze z rozrzutem
+        w przedziale [połowa, całość], by workery i instalacje nie łączyły się
+        jednocześnie po awarii brokera.
+        """
+        delay = min(self.reconnect_max_delay, self.reconnect_min_delay * 2 ** min(attempt, 16))
+        return random.uniform(delay / 2, delay)
+
+    def get_ingest_stats(self):
+        """
+        Zwraca statystyki kolejki wiadomości przychodzących.
+        """
+        return self.ingest.stats()
+
+    def set_publish_forwarder(self, forwarder):
+        """
+        Ustawia funkcję przekazującą publikacje do innego procesu
+        (worker bez własnego połączenia z brokerem). None - publikuj lokalnie.
+
+        Funkcja przyjmuje argumenty publish_many i zwraca listę statusów.
+        """
+        self._publish_forwarder = forwarder
+
+    def publish(self, topic, message, qos=None):
         """
         Publikuje wiadomość MQTT.
 
         Args:
             topic (str): Temat MQTT
             message (str): Wiadomość do wysłania
+            qos (int, optional): Poziom QoS (domyślnie qos klienta)
 
         Returns:
             bool: Status operacji
         """
+        return self.publish_many([(topic, message, qos)])[0]
+
+    def publish_many(self, messages, device_ids=None):
+        """
+        Publikuje wiele wiadomości MQTT w jednym przebiegu.
+
+        Wiadomości trafiają do kolejki wysyłkowej klienta jedna po drugiej,
+        bez oczekiwania na potwierdzenia, więc koszt partii to jedna pętla
+        zamiast osobnego żądania na każde urządzenie.
+
+        Args:
+            messages (list): Lista (temat, wiadomość), (temat, wiadomość, qos)
+                lub (temat, wiadomość, qos, ttl) - ttl to czas ważności komendy
+                w skrzynce nadawczej
+            device_ids (list, optional): ID urządzeń, do których kierowane są
+                kolejne wiadomości - komendy są wtedy śledzone przez command_tracker,
+                a bez połączenia z brokerem trafiają do skrzynki nadawczej
+
+        Returns:
+            list: Status operacji dla każdej wiadomości (w tej samej kolejności):
+                True - przekazana do brokera, QUEUED ("queued") - czeka
+                w skrzynce nadawczej, False - odrzucona (np. brak połączenia).
+        """
+        if self._publish_forwarder is not None:
+            return self._publish_forwarder(messages, device_ids)
+
+        results = []
+        queued = False
+        for i, (topic, message, *options) in enumerate(messages):
+            qos = options[0] if options and options[0] is not None else self.qos
+            device_id = device_ids[i] if device_ids else None
+            if device_id is not None and self.outbox is not None:
+                if not self._connected:
+                    ttl = options[1] if len(options) > 1 else None
+                    self.outbox.put(topic, message, qos, device_id, ttl)
+                    results.append(QUEUED)
+                    queued = True
+                else:
+                    # Nowsza komenda zastępuje komendę czekającą w skrzynce
+                    results.append(self.outbox.send_now(
+                        topic, self._publish_one, topic, message, qos, device_id
+                    ))
+                continue
+            results.append(self._publish_one(topic, message, qos, device_id))
+        if queued and self._connected:
+            # _on_connect mogło opróżnić skrzynkę między sprawdzeniem
+            # połączenia a put - bez tego komenda czekałaby do ponownego połączenia
+            self.outbox.drain(self._publish_one, self.is_connected)
+        return results
+
+    def _publish_one(self, topic, message, qos, device_id=None):
+        """
+        Publikuje jedną wiadomość (komendy - z device_id - są śledzone
+        przez command_tracker).
+
+        Returns:
+            bool: Czy klient przyjął wiadomość do wysłania
+        """
+        sent_at = time.monotonic()
         try:
-            self.client.publish(topic, message)
-            self.logger.info(f"Wysłano wiadomość do {topic}: {message}")
-            return True
+            info = self.client.publish(topic, message, qos)
+            success = info.rc == mqtt.MQTT_ERR_SUCCESS
+            if success:
+                self.message_log.log("Wysłano wiadomość do", topic, message)
+            else:
+                self.logger.error(
+                    f"Błąd publikacji MQTT do {topic}: {mqtt.error_string(info.rc)}"
+                )
         except Exception as e:
             self.logger.error(f"Błąd publikacji MQTT: {str(e)}")
-            return False
+            info = None
+            success = False
+        if success:
+            MESSAGES_PUBLISHED.inc()
+        else:
+            PUBLISH_FAILURES.inc()
+        if device_id is not None and self.command_tracker:
+            self.command_tracker.command_sent(
+                device_id, info.mid if success else None, sent_at, success
+            )
+        return success
+
+    def get_command_stats(self):
+        """
+        Zwraca statystyki opóźnień komend (lub None bez command_tracker).
+        """
+        if self.command_tracker is None:
+            return None
+        return self.command_tracker.stats()
+
+    def _on_publish(self, client, userdata, mid):
+        """
+        Callback wywoływany po wysłaniu (QoS 0) lub potwierdzeniu (QoS 1/2) publikacji.
+        """
+        if self.command_tracker:
+            self.command_tracker.publish_acked(mid)
 
     def subscribe(self, topic, callback=None):
         """
@@ -107,15 +329,34 @@ class MQTTClient:
             bool: Status operacji
         """
         try:
-            self.client.subscribe(topic)
+            if topic not in self.topics:
+                self.client.subscribe(topic)
+                self.topics.add(topic)
+                self.logger.info(f"Zasubskrybowano temat: {topic}")
             if callback:
-                self.topics[topic] = callback
-            self.logger.info(f"Zasubskrybowano temat: {topic}")
+                self.router.add(topic, callback)
             return True
         except Exception as e:
             self.logger.error(f"Błąd subskrypcji MQTT: {str(e)}")
             return False
 
+    def add_handler(self, topic_filter, callback):
+        """
+        Rejestruje lokalny callback dla filtra tematów bez nowej subskrypcji
+        w brokerze (temat musi być objęty istniejącym filtrem, np. iot/device/+/status).
+
+        Args:
+            topic_filter (str): Filtr tematów (obsługuje + i #)
+            callback (function): Funkcja wywoływana po otrzymaniu wiadomości
+        """
+        self.router.add(topic_filter, callback)
+
+    def remove_handler(self, topic_filter, callback=None):
+        """
+        Usuwa lokalny callback dla filtra tematów.
+        """
+        return self.router.remove(topic_filter, callback)
+
     def unsubscribe(self, topic):
         """
         Anuluje subskrypcję tematu MQTT.
@@ -128,8 +369,8 @@ class MQTTClient:
         """
         try:
             self.client.unsubscribe(topic)
-            if topic in self.topics:
-                del self.topics[topic]
+            self.topics.discard(topic)
+            self.router.remove(topic)
             self.logger.info(f"Anulowano subskrypcję tematu: {topic}")
             return True
         except Exception as e:
@@ -142,61 +383,101 @@ class MQTTClient:
         """
         if rc == 0:
             self._connected = True
+            self._connected_at = time.monotonic()
+            if self._ever_connected:
+                RECONNECTS.inc()
+            self._ever_connected = True
             self.logger.info("Połączono z brokerem MQTT")
-            # Subskrybuj wszystkie tematy
-            for topic in self.topics:
-                client.subscribe(topic)
-                self.logger.info(f"Ponownie zasubskrybowano temat: {topic}")
+            # Subskrybuj wszystkie filtry jednym żądaniem SUBSCRIBE
+            topics = list(self.topics)
+            if topics:
+                self._subscribed = False
+                _, self._subscribe_mid = client.subscribe([(topic, 0) for topic in topics])
+                self.logger.info(
+                    f"Zasubskrybowano tematy: {', '.join(sorted(self.topics))}"
+                )
+            else:
+                self._subscribed = True
+            # Wyślij komendy zebrane podczas braku połączenia (w tle, z limitem tempa)
+            if self.outbox is not None:
+                self.outbox.drain(self._publish_one, self.is_connected)
         else:
             self._connected = False
             self.logger.error(f"Błąd połączenia MQTT, kod: {rc}")
 
+    def _on_subscribe(self, client, userdata, mid, granted_qos):
+        """
+        Callback wywoływany po potwierdzeniu subskrypcji przez broker.
+        """
+        if mid == self._subscribe_mid:
+            self._subscribed = True
+
     def _on_message(self, client, userdata, msg):
         """
         Callback wywoływany po otrzymaniu wiadomości.
+
+        Działa w wątku sieciowym paho, więc tylko dodaje surową wiadomość
+        do kolejki - dekodowanie i obsługa odbywają się w wątku roboczym.
         """
-        try:
-            topic = msg.topic
-            payload = msg.payload.decode("utf-8")
-            self.logger.info(f"Otrzymano wiadomość z {topic}: {payload}")
+        MESSAGES_RECEIVED.inc()
+        self.ingest.put(msg.topic, msg.payload, msg.retain, time.time())
+
+    def _process_messages(self, batch):
+        """
+        Przetwarza partię wiadomości z kolejki (wątek roboczy).
+        """
+        for topic, payload, retain, timestamp in batch:
+            started = time.perf_counter()
+            try:
+                payload = payload.decode("utf-8")
+                self.message_log.log("Otrzymano wiadomość z", topic, payload)
 
-            # Wywołaj callback dla tego tematu jeśli istnieje
-            if topic in self.topics and self.topics[topic]:
-                self.topics[topic](payload, topic)
+                # Wywołaj callbacki filtrów pasujących do tematu
+                for callback in self.router.match(topic):
+                    callback(payload, topic)
 
-            # Aktualizuj stan urządzenia w menedżerze urządzeń
-            if self.device_manager:
-                self.device_manager.update_device_status_from_mqtt(topic, payload)
-        except Exception as e:
-            self.logger.error(f"Błąd przetwarzania wiadomości MQTT: {str(e)}")
+                # Aktualizuj stan urządzenia w menedżerze urządzeń
+                if self.device_manager:
+                    self.device_manager.update_device_status_from_mqtt(topic, payload, retain)
+            except Exception as e:
+                self.logger.error(f"Błąd przetwarzania wiadomości MQTT: {str(e)}")
+            MESSAGE_PROCESSING.observe(time.perf_counter() - started)
 
     def _on_disconnect(self, client, userdata, rc):
         """
         Callback wywoływany po rozłączeniu.
         """
         self._connected = False
+        self._subscribed = False
         if rc != 0:
+            # Ponowne połączenie nawiąże wątek nadzorcy
             self.logger.warning(f"Nieoczekiwane rozłączenie MQTT, kod: {rc}")
-            # Próba ponownego połączenia
-            threading.Timer(5.0, self.connect).start()
         else:
             self.logger.info("Rozłączono z brokerem MQTT")
 
-    def _subscribe_to_all_devices(self):
+    def sync_device_subscriptions(self):
         """
-        Subskrybuje tematy dla wszystkich urządzeń.
+        Uzgadnia subskrypcje z tematami urządzeń: subskrybuje nowe filtry
+        i anuluje filtry, których nie używa już żadne urządzenie.
+
+        Zamiast osobnych subskrypcji statusu i wartości każdego urządzenia
+        używa filtrów wieloznacznych (np. iot/device/+/status), a wiadomości są
+        rozdzielane lokalnie przez menedżer urządzeń i router tematów.
+        Pozostałe subskrypcje nie są przerywane.
         """
         if not self.device_manager:
             return
 
-        devices = self.device_manager.get_all_devices()
-        for device in devices:
-            # Subskrybuj status urządzenia
-            status_topic = f"{device['topic']}/status"
-            self.subscribe(status_topic)
-
-            # Subskrybuj tematy wartości jeśli są zdefiniowane
-            if "valueTopics" in device:
-                for value_name, topic_suffix in device["valueTopics"].items():
-                    value_topic = f"{device['topic']}/{topic_suffix}"
-                    self.subscribe(value_topic)
+        with self._device_filters_lock:
+            filters = set(self.device_manager.get_topic_filters())
+            for topic_filter in filters - self._device_filters:
+                self.subscribe(topic_filter)
+            for topic_filter in self._device_filters - filters:
+                # Filtr z lokalnymi callbackami (subscribe z callback) zostaje
+                if topic_filter not in self.router:
+                    self.unsubscribe(topic_filter)
+            self._device_filters = filters
+
+    def _on_registry_change(self, mutation):
+        if mutation.get("op") in ("put_device", "delete_device", "reload"):
+            self.sync_device_subscriptions()
@@ -0,0 +1,200 @@
+# modules/outbox.py
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from modules.metrics import registry
+
+# Wynik publikacji komendy, która czeka w skrzynce na połączenie z brokerem
+QUEUED = "queued"
+
+OUTBOX_DROPPED = registry.counter(
+    "mqtt_outbox_dropped_total", "Komendy usunięte ze skrzynki nadawczej", ("reason",)
+)
+
+
+class CommandOutbox:
+    def __init__(self, path, max_size=1000, ttl=300.0, drain_rate=50.0, fsync=True, logger=None):
+        """
+        Trwała skrzynka nadawcza komend wydanych bez połączenia z brokerem.
+
+        Na każdy temat przechowywana jest tylko najnowsza komenda (ustawia
+        stan urządzenia, więc starsze są nieaktualne). Skrzynka ma ograniczony
+        rozmiar (najstarsze wpisy są usuwane), każda komenda ma termin
+        ważności, a po połączeniu z brokerem wpisy są wysyłane w tle w tempie
+        drain_rate na sekundę - bez nagłej serii po awarii.
+
+        Args:
+            path (str): Ścieżka pliku skrzynki (None - tylko w pamięci)
+            max_size (int): Maksymalna liczba komend
+            ttl (float): Domyślny czas ważności komendy w sekundach
+            drain_rate (float): Liczba komend wysyłanych na sekundę po połączeniu
+            fsync (bool): Czy wywoływać fsync po zapisie
+            logger: Logger do raportowania błędów
+        """
+        self.path = path
+        self.max_size = max_size
+        self.ttl = ttl
+        self.drain_rate = drain_rate
+        self.fsync = fsync
+        self.logger = logger
+        self._entries = OrderedDict()  # temat -> wpis, od najstarszego
+        self._lock = threading.Lock()
+        # Wysyłka ze skrzynki i bezpośrednia (send_now) nie przeplatają się -
+        # starsza komenda nie może dotrzeć do brokera po nowszej
+        self._send_lock = threading.Lock()
+        self._drain_thread = None
+        self._load()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def put(self, topic, message, qos=None, device_id=None, ttl=None):
+        """
+        Dodaje komendę, zastępując wcześniejszą komendę na ten sam temat.
+        """
+        now = time.time()
+        entry = {
+            "topic": topic,
+            "message": message,
+            "qos": qos,
+            "device_id": device_id,
+            "created_at": now,
+            "expires_at": now + (self.ttl if ttl is None else ttl),
+        }
+        with self._lock:
+            if self._entries.pop(topic, None) is not None:
+                OUTBOX_DROPPED.inc(labels=("replaced",))
+            self._entries[topic] = entry
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                OUTBOX_DROPPED.inc(labels=("overflow",))
+            self._save()
+
+    def send_now(self, topic, publish, *args):
+        """
+        Wysyła komendę z pominięciem skrzynki (przy aktywnym połączeniu),
+        usuwając oczekującą w skrzynce starszą komendę na ten sam temat.
+
+        Args:
+            topic (str): Temat komendy
+            publish (function): Funkcja publikująca, wywoływana z args
+
+        Returns:
+            Wynik publish
+        """
+        if not self._entries and self._drain_thread is None:
+            return publish(*args)
+        with self._send_lock:
+            with self._lock:
+                if self._entries.pop(topic, None) is not None:
+                    OUTBOX_DROPPED.inc(labels=("replaced",))
+                    self._save()
+            return publish(*args)
+
+    def reload(self):
+        """
+        Zastępuje wpisy w pamięci zawartością pliku skrzynki - np. gdy worker
+        przejmuje połączenie z brokerem, a plik zmieniał poprzedni właściciel.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._load()
+
+    def drain(self, publish, is_connected):
+        """
+        Uruchamia wysyłanie oczekujących komend w tle (jeśli jeszcze nie trwa).
+
+        Args:
+            publish (function): Funkcja publikująca jedną komendę:
+                (temat, wiadomość, qos, device_id) -> bool
+            is_connected (function): Zwraca, czy połączenie nadal jest aktywne
+        """
+        with self._lock:
+            if not self._entries or self._drain_thread is not None:
+                return
+            self._drain_thread = threading.Thread(
+                target=self._drain, args=(publish, is_connected), name="mqtt-outbox", daemon=True
+            )
+            self._drain_thread.start()
+
+    def _drain(self, publish, is_connected):
+        interval = 1.0 / self.drain_rate if self.drain_rate else 0
+        try:
+            while is_connected():
+                with self._send_lock:
+                    with self._lock:
+                        entry = self._pop_valid()
+                        if entry is None:
+                            # Pod tą samą blokadą co put - komenda dodana
+                            # później uruchomi nowe opróżnianie
+                            self._drain_thread = None
+                            return
+                    if not publish(entry["topic"], entry["message"], entry["qos"], entry["device_id"]):
+                        # Brak połączenia - przywróć wpis, chyba że w międzyczasie
+                        # przyszła nowsza komenda na ten temat
+                        with self._lock:
+                            if entry["topic"] not in self._entries:
+                                self._entries[entry["topic"]] = entry
+                                self._entries.move_to_end(entry["topic"], last=False)
+                        return
+                if interval:
+                    time.sleep(interval)
+        finally:
+            with self._lock:
+                if self._drain_thread is threading.current_thread():
+                    self._drain_thread = None
+                self._save()
+
+    def _pop_valid(self):
+        # Wywoływana pod blokadą - zwraca najstarszy wpis, który nie wygasł
+        now = time.time()
+        while self._entries:
+            _, entry = self._entries.popitem(last=False)
+            if entry["expires_at"] > now:
+                return entry
+            OUTBOX_DROPPED.inc(labels=("expired",))
+        return None
+
+    def _load(self):
+        if not self.path:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f).get("entries", [])
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, AttributeError) as e:
+            self._log_error(f"Błąd odczytu skrzynki nadawczej: {str(e)}")
+            return
+        now = time.time()
+        for entry in entries:
+            if entry.get("expires_at", 0) > now:
+                self._entries[entry["topic"]] = entry
+
+    def _save(self):
+        # Wywoływana pod blokadą - zapis atomowy całej skrzynki (jest mała
+        # i zmienia się tylko przy braku połączenia i opróżnianiu)
+        if not self.path:
+            return
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"entries": list(self._entries.values())}, f, separators=(",", ":"))
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except (OSError, TypeError, ValueError) as e:
+            self._log_error(f"Błąd zapisu skrzynki nadawczej: {str(e)}")
+
+    def _log_error(self, message):
+        if self.logger:
+            self.logger.error(message)
+        else:
+            print(message)
@@ -0,0 +1,112 @@
+# modules/payload_decoder.py
+import json
+
+TRUE_PAYLOADS = ("1", "true", "on", "yes")
+FALSE_PAYLOADS = ("0", "false", "off", "no")
+
+
+def _decode_string(payload, spec):
+    return payload
+
+
+def _decode_number(payload, spec):
+    text = payload.strip()
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def _decode_boolean(payload, spec):
+    text = payload.strip().lower()
+    if text in TRUE_PAYLOADS:
+        return True
+    if text in FALSE_PAYLOADS:
+        return False
+    raise ValueError(f"Nieprawidłowa wartość logiczna: {payload}")
+
+
+def _decode_enum(payload, spec):
+    text = payload.strip()
+    if spec.options and text not in spec.options:
+        raise ValueError(f"Wartość spoza listy: {payload}")
+    return text
+
+
+def _decode_json(payload, spec):
+    return json.loads(payload)
+
+
+DECODERS = {
+    "string": _decode_string,
+    "number": _decode_number,
+    "boolean": _decode_boolean,
+    "enum": _decode_enum,
+    "json": _decode_json,
+}
+
+
+class PayloadSpec:
+    __slots__ = ("type", "deadband", "options", "_decoder")
+
+    def __init__(self, spec=None):
+        """
+        Opis treści wiadomości: typ (string, number, boolean, enum, json)
+        i strefa nieczułości dla wartości liczbowych.
+
+        Args:
+            spec (str or dict): Nazwa typu lub słownik
+                {"type": ..., "deadband": ..., "options": [...]}
+        """
+        if isinstance(spec, str):
+            spec = {"type": spec}
+        spec = spec or {}
+        self.type = spec.get("type", "string")
+        self.deadband = float(spec.get("deadband") or 0)
+        self.options = tuple(spec.get("options") or ())
+        self._decoder = DECODERS.get(self.type, _decode_string)
+
+    def decode(self, payload):
+        """
+        Zamienia treść wiadomości na wartość typowaną.
+
+        Returns:
+            Wartość typowana lub niezmieniona treść, jeśli nie pasuje do typu
+        """
+        try:
+            return self._decoder(payload, self)
+        except (ValueError, TypeError):
+            return payload
+
+    def is_change(self, previous, value):
+        """
+        Sprawdza, czy nowa wartość różni się od poprzedniej na tyle, by ją
+        przekazać dalej (dla liczb - o co najmniej deadband).
+        """
+        if previous is None or type(previous) is not type(value):
+            # Różne typy (np. int/float) porównujemy tylko dla liczb
+            if not (_is_number(previous) and _is_number(value)):
+                return True
+        if value == previous:
+            return False
+        if self.deadband and _is_number(value):
+            return abs(value - previous) >= self.deadband
+        return True
+
+
+DEFAULT_SPEC = PayloadSpec()
+
+
+def payload_specs(device):
+    """
+    Zwraca opisy treści wiadomości urządzenia z pola "payloads" definicji,
+    np. {"status": "boolean", "temperature": {"type": "number", "deadband": 0.2}}.
+
+    Returns:
+        dict: Nazwa ("status" lub nazwa wartości) -> PayloadSpec
+    """
+    return {name: PayloadSpec(spec) for name, spec in (device.get("payloads") or {}).items()}
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
@@ -0,0 +1,119 @@
+# modules/response_cache.py
+import gzip
+import hashlib
+import threading
+
+try:
+    import brotli
+except ImportError:  # Brotli jest opcjonalny - bez niego tylko gzip
+    brotli = None
+
+from modules.metrics import registry as metrics
+
+CACHE_BUILDS = metrics.counter(
+    "response_cache_builds_total",
+    "Liczba serializacji (i kompresji) odpowiedzi w pamięci podręcznej",
+    ("name",),
+)
+CACHE_HITS = metrics.counter(
+    "response_cache_hits_total",
+    "Liczba odpowiedzi wysłanych z pamięci podręcznej (z 304)",
+    ("name",),
+)
+
+
+class CachedBody:
+    __slots__ = ("body", "etag", "encodings")
+
+    def __init__(self, body, min_compress_size=512, compress_level=6):
+        """
+        Gotowa treść odpowiedzi: bajty JSON, silny ETag i warianty skompresowane.
+
+        Args:
+            body (bytes): Treść odpowiedzi
+            min_compress_size (int): Mniejsze treści nie są kompresowane
+            compress_level (int): Poziom kompresji gzip
+        """
+        self.body = body
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.encodings = {}
+        if len(body) >= min_compress_size:
+            if brotli is not None:
+                self.encodings["br"] = brotli.compress(body, quality=5)
+            self.encodings["gzip"] = gzip.compress(body, compress_level, mtime=0)
+
+    def select(self, accept_encodings):
+        """
+        Wybiera wariant treści zgodny z nagłówkiem Accept-Encoding.
+
+        Args:
+            accept_encodings: Obiekt Accept (request.accept_encodings)
+
+        Returns:
+            tuple: (treść, kodowanie lub None)
+        """
+        for encoding in ("br", "gzip"):
+            data = self.encodings.get(encoding)
+            if data is not None and accept_encodings[encoding]:
+                return data, encoding
+        return self.body, None
+
+
+class ResponseCache:
+    def __init__(self, min_compress_size=512, compress_level=6):
+        """
+        Pamięć podręczna zserializowanych odpowiedzi dla kolekcji zmienianych
+        tylko przez API konfiguracji (urządzenia, pomieszczenia, sceny).
+
+        Treść jest budowana przy pierwszym odczycie po unieważnieniu,
+        a kolejne odczyty zwracają gotowe bajty.
+        """
+        self.min_compress_size = min_compress_size
+        self.compress_level = compress_level
+        self._builders = {}
+        self._entries = {}
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, builder):
+        """
+        Rejestruje kolekcję.
+
+        Args:
+            name (str): Nazwa kolekcji
+            builder (function): Funkcja zwracająca treść odpowiedzi (bytes)
+        """
+        self._builders[name] = builder
+        self._generations[name] = 0
+
+    def invalidate(self, *names):
+        """
+        Unieważnia podane kolekcje (bez argumentów - wszystkie).
+        """
+        with self._lock:
+            for name in names or list(self._builders):
+                self._entries.pop(name, None)
+                self._generations[name] += 1
+
+    def get(self, name):
+        """
+        Zwraca aktualną treść kolekcji, budując ją w razie potrzeby.
+
+        Returns:
+            CachedBody: Treść odpowiedzi
+        """
+        entry = self._entries.get(name)
+        if entry is not None:
+            CACHE_HITS.inc(labels=(name,))
+            return entry
+
+        with self._lock:
+            generation = self._generations[name]
+        entry = CachedBody(self._builders[name](), self.min_compress_size, self.compress_level)
+        CACHE_BUILDS.inc(labels=(name,))
+        with self._lock:
+            # Zmiana w trakcie budowania - treść mogła być nieaktualna,
+            # więc nie zapisujemy jej (następny odczyt zbuduje ją ponownie)
+            if self._generations[name] == generation:
+                self._entries[name] = entry
+        return entry
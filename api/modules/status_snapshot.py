@@ -0,0 +1,119 @@
+# modules/status_snapshot.py
+import json
+import os
+import threading
+import time
+
+
+class StatusSnapshot:
+    def __init__(self, path, snapshot_provider, interval=30.0, fsync=True, logger=None):
+        """
+        Okresowy zapis ostatniego znanego stanu urządzeń (status, wartości,
+        last_seen) do odtworzenia po restarcie.
+
+        Wątek w tle co interval sekund zapisuje stan, jeśli od poprzedniego
+        zapisu przyszła jakakolwiek wiadomość - kompaktowy JSON, atomowo
+        (plik tymczasowy + rename). Ścieżka obsługi wiadomości tylko ustawia
+        flagę (mark_dirty).
+
+        Args:
+            path (str): Ścieżka pliku stanu
+            snapshot_provider (function): Funkcja zwracająca słownik
+                device_id -> status
+            interval (float): Odstęp między zapisami w sekundach
+            fsync (bool): Czy wywoływać fsync po zapisie
+            logger: Logger do raportowania błędów
+        """
+        self.path = path
+        self.snapshot_provider = snapshot_provider
+        self.interval = interval
+        self.fsync = fsync
+        self.logger = logger
+        self.dirty = False
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def load(self):
+        """
+        Wczytuje zapisany stan.
+
+        Returns:
+            tuple: (czas zapisu lub None, słownik device_id -> status)
+        """
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data.get("saved_at"), data.get("devices", {})
+        except FileNotFoundError:
+            return None, {}
+        except (OSError, ValueError, AttributeError) as e:
+            self._log_error(f"Błąd odczytu stanu urządzeń: {str(e)}")
+            return None, {}
+
+    def mark_dirty(self):
+        """
+        Oznacza stan jako zmieniony od ostatniego zapisu.
+        """
+        self.dirty = True
+
+    def start(self):
+        """
+        Uruchamia wątek zapisu.
+        """
+        if self._thread is None:
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="status-snapshot", daemon=True)
+            self._thread.start()
+
+    def close(self):
+        """
+        Zatrzymuje wątek i zapisuje bieżący stan.
+        """
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+        self.save()
+
+    def save(self):
+        """
+        Zapisuje bieżący stan, jeśli się zmienił.
+
+        Returns:
+            bool: Czy plik został zapisany
+        """
+        if not self.dirty:
+            return False
+        self.dirty = False
+        try:
+            data = json.dumps(
+                {"saved_at": time.time(), "devices": self.snapshot_provider()},
+                separators=(",", ":"),
+                ensure_ascii=False,
+            )
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(data)
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            return True
+        except (OSError, TypeError, ValueError) as e:
+            self.dirty = True
+            self._log_error(f"Błąd zapisu stanu urządzeń: {str(e)}")
+            return False
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self.save()
+
+    def _log_error(self, message):
+        if self.logger:
+            self.logger.error(message)
+        else:
+            print(message)
@@ -0,0 +1,220 @@
+# modules/status_store.py
+import sys
+import threading
+import zlib
+from collections import namedtuple
+
+# Krótkie napisy (statusy, odczyty typu "on", "21.5") są internowane -
+# tysiące urządzeń współdzieli jeden obiekt zamiast własnych kopii
+INTERN_MAX_LENGTH = 32
+
+# Kanoniczne krotki nazw wartości: urządzenia o tym samym zestawie wartości
+# (np. wszystkie czujniki danego typu) współdzielą jedną krotkę nazw.
+# Tablica ma ograniczony rozmiar - po zapełnieniu (np. nazwy wartości
+# z przypadkowych tematów, usunięte urządzenia) jest czyszczona; istniejące
+# rekordy zachowują swoje krotki, a kolejne zmiany znów je współdzielą
+VALUE_SCHEMAS_MAX = 1024
+_value_schemas = {}
+
+
+def compact(value):
+    """
+    Zwraca wartość w postaci współdzielonej (internowany krótki napis).
+    """
+    if type(value) is str and len(value) <= INTERN_MAX_LENGTH:
+        return sys.intern(value)
+    return value
+
+
+def _value_schema(names):
+    if not names:
+        return ()
+    schema = _value_schemas.get(names)
+    if schema is None:
+        if len(_value_schemas) >= VALUE_SCHEMAS_MAX:
+            _value_schemas.clear()
+        schema = _value_schemas.setdefault(names, tuple(sys.intern(name) for name in names))
+    return schema
+
+
+class DeviceStatus(namedtuple("DeviceStatus", ("online", "last_seen", "status", "value_names", "value_data"))):
+    """
+    Niezmienny status urządzenia. Zmiana tworzy nowy rekord (with_changes),
+    więc czytelnik nigdy nie widzi rekordu w połowie aktualizacji.
+
+    Wartości są przechowywane jako dwie krotki: współdzielona krotka nazw
+    (value_names) i krotka danych (value_data) w tej samej kolejności -
+    bez osobnego słownika na każde urządzenie.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Tworzy rekord ze słownika (np. z pliku stanu lub od innego procesu).
+        """
+        values = data.get("values") or {}
+        return cls(
+            bool(data.get("online")),
+            data.get("last_seen"),
+            compact(data.get("status")),
+            _value_schema(tuple(values)),
+            tuple(compact(value) for value in values.values()),
+        )
+
+    @property
+    def values(self):
+        """
+        Wartości urządzenia jako słownik nazwa -> wartość.
+        """
+        return dict(zip(self.value_names, self.value_data))
+
+    def value(self, name, default=None):
+        """
+        Zwraca wartość o podanej nazwie (bez budowania słownika).
+        """
+        try:
+            return self.value_data[self.value_names.index(name)]
+        except ValueError:
+            return default
+
+    def with_changes(self, changes):
+        """
+        Zwraca nowy rekord ze zmienionymi polami ("values" są scalane).
+        """
+        fields = dict(changes)
+        if "status" in fields:
+            fields["status"] = compact(fields["status"])
+        values = fields.pop("values", None)
+        if values:
+            names, data = self.value_names, list(self.value_data)
+            added = []
+            for name, value in values.items():
+                try:
+                    data[names.index(name)] = compact(value)
+                except ValueError:
+                    added.append(name)
+                    data.append(compact(value))
+            if added:
+                names = _value_schema(names + tuple(added))
+            fields["value_names"], fields["value_data"] = names, tuple(data)
+        return self._replace(**fields)
+
+    def as_dict(self):
+        """
+        Zwraca status jako zwykły słownik (np. do serializacji JSON).
+        """
+        return {
+            "online": self.online,
+            "last_seen": self.last_seen,
+            "status": self.status,
+            "values": dict(zip(self.value_names, self.value_data)),
+        }
+
+
+EMPTY_STATUS = DeviceStatus(False, None, None, (), ())
+
+
+class StatusStore:
+    def __init__(self, shards=16):
+        """
+        Statusy urządzeń z odczytem bez blokad.
+
+        Urządzenia są rozdzielone na shards fragmentów, a zapis odbywa się
+        pod blokadą fragmentu. Zmiana statusu istniejącego urządzenia
+        podmienia rekord w miejscu - rekordy są niezmienne (DeviceStatus),
+        a podmiana wartości pod istniejącym kluczem nie zmienia rozmiaru
+        słownika, więc czytelnik widzi stary albo nowy rekord, a trwająca
+        iteracja nie jest przerywana. Koszt zapisu nie zależy od liczby
+        urządzeń. Tylko dodanie i usunięcie urządzenia (rzadkie) tworzy
+        kopię fragmentu i podmienia referencję (kopiowanie przy zapisie).
+
+        Args:
+            shards (int): Liczba fragmentów
+        """
+        self._shards = [{} for _ in range(shards)]
+        self._locks = [threading.Lock() for _ in range(shards)]
+
+    def _index(self, device_id):
+        return zlib.crc32(device_id.encode("utf-8")) % len(self._shards)
+
+    def get(self, device_id, default=None):
+        """
+        Zwraca rekord urządzenia (bez blokady).
+        """
+        return self._shards[self._index(device_id)].get(device_id, default)
+
+    def __contains__(self, device_id):
+        return device_id in self._shards[self._index(device_id)]
+
+    def __len__(self):
+        return sum(len(shard) for shard in self._shards)
+
+    def items(self):
+        """
+        Zwraca listę (device_id, rekord) - bez blokad; każdy rekord jest
+        spójny, a zbiór urządzeń fragmentu odpowiada jednej jego wersji.
+        """
+        result = []
+        for shard in self._shards:
+            result.extend(shard.items())
+        return result
+
+    def update(self, device_id, function, notify=None):
+        """
+        Atomowo zastępuje rekord urządzenia wynikiem function(poprzedni rekord).
+
+        Args:
+            device_id (str): ID urządzenia
+            function (function): Przyjmuje poprzedni rekord (lub None)
+                i zwraca nowy rekord (None - usuń urządzenie)
+            notify (function, optional): Wywoływana po zapisie, jeszcze pod
+                blokadą fragmentu, z (poprzedni rekord, nowy rekord) -
+                powiadomienia o zmianach urządzenia mają kolejność zapisów
+
+        Returns:
+            tuple: (poprzedni rekord, nowy rekord)
+        """
+        index = self._index(device_id)
+        with self._locks[index]:
+            shard = self._shards[index]
+            previous = shard.get(device_id)
+            record = function(previous)
+            if record is not previous:
+                if previous is not None and record is not None:
+                    # Zmiana istniejącego urządzenia - podmiana w miejscu
+                    shard[device_id] = record
+                else:
+                    shard = dict(shard)
+                    if record is None:
+                        shard.pop(device_id, None)
+                    else:
+                        shard[device_id] = record
+                    self._shards[index] = shard
+            if notify is not None:
+                notify(previous, record)
+        return previous, record
+
+    def put(self, device_id, record):
+        """
+        Zapisuje rekord urządzenia.
+        """
+        self.update(device_id, lambda previous: record)
+
+    def remove(self, device_id):
+        """
+        Usuwa urządzenie.
+        """
+        self.update(device_id, lambda previous: None)
+
+    def replace_all(self, records):
+        """
+        Zastępuje wszystkie rekordy (słownik device_id -> DeviceStatus).
+        """
+        shards = [{} for _ in self._shards]
+        for device_id, record in records.items():
+            shards[self._index(device_id)][device_id] = record
+        for index, shard in enumerate(shards):
+            with self._locks[index]:
+                self._shards[index] = shard
@@ -0,0 +1,99 @@
+# modules/status_stream.py
+import os
+import threading
+from collections import deque
+
+
+class StatusStream:
+    def __init__(self, backlog=1000):
+        """
+        Inicjalizacja strumienia zmian stanu urządzeń.
+
+        Args:
+            backlog (int): Liczba ostatnich zdarzeń przechowywanych do wznowienia
+        """
+        # Identyfikator procesu w ID zdarzeń - kursor z innego workera
+        # lub sprzed restartu wymusza pełny stan zamiast błędnej powtórki
+        self.token = os.urandom(4).hex()
+        self._events = deque(maxlen=backlog)
+        self._seq = 0
+        self._condition = threading.Condition()
+
+    @property
+    def cursor(self):
+        """
+        Zwraca numer ostatniego opublikowanego zdarzenia.
+        """
+        return self._seq
+
+    def format_id(self, seq):
+        """
+        Zwraca ID zdarzenia SSE dla numeru zdarzenia.
+        """
+        return f"{self.token}-{seq}"
+
+    def parse_id(self, event_id):
+        """
+        Zwraca numer zdarzenia z ID zdarzenia SSE lub None,
+        jeśli ID pochodzi z innego procesu albo jest nieprawidłowe.
+        """
+        token, _, seq = (event_id or "").partition("-")
+        if token != self.token or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def publish(self, device_id, changes):
+        """
+        Publikuje zmianę stanu urządzenia do wszystkich subskrybentów.
+
+        Args:
+            device_id (str): ID urządzenia
+            changes (dict or None): Zmienione pola statusu (None - urządzenie usunięte)
+        """
+        with self._condition:
+            self._seq += 1
+            self._events.append((self._seq, device_id, changes))
+            self._condition.notify_all()
+
+    def events_since(self, cursor):
+        """
+        Zwraca zdarzenia opublikowane po podanym kursorze.
+
+        Args:
+            cursor (int): Numer ostatniego zdarzenia znanego klientowi
+
+        Returns:
+            list or None: Lista zdarzeń (seq, device_id, changes) lub None,
+                jeśli kursor jest spoza zakresu bufora i potrzebny jest pełny stan
+        """
+        with self._condition:
+            return self._events_since(cursor)
+
+    def wait_for_events(self, cursor, timeout):
+        """
+        Czeka na nowe zdarzenia po podanym kursorze.
+
+        Args:
+            cursor (int): Numer ostatniego zdarzenia znanego klientowi
+            timeout (float): Maksymalny czas oczekiwania w sekundach
+
+        Returns:
+            list or None: Lista zdarzeń (pusta po przekroczeniu czasu) lub None,
+                jeśli kursor jest spoza zakresu bufora
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._seq != cursor, timeout)
+            return self._events_since(cursor)
+
+    def _events_since(self, cursor):
+        if cursor > self._seq:
+            # Kursor z poprzedniego uruchomienia serwera
+            return None
+        if cursor == self._seq:
+            return []
+        if not self._events or self._events[0][0] > cursor + 1:
+            return None
+
+        # Zdarzenia mają kolejne numery, więc pozycję można wyliczyć
+        start = cursor + 1 - self._events[0][0]
+        return [self._events[i] for i in range(start, len(self._events))]
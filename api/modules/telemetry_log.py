@@ -0,0 +1,492 @@
+# modules/telemetry_log.py
+import bisect
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+
+# Rekord: czas (float64), ID serii (uint32), wartość (float64) - 20 bajtów
+RECORD = struct.Struct("<dId")
+# Wpis indeksu rzadkiego: czas (float64), przesunięcie w segmencie (uint64)
+INDEX_ENTRY = struct.Struct("<dQ")
+
+SEGMENT_SUFFIX = ".seg"
+INDEX_SUFFIX = ".idx"
+CATALOG_FILE = "series.jsonl"
+
+
+class _Segment:
+    __slots__ = ("seq", "path", "index_path", "size", "index_times", "index_offsets", "records")
+
+    def __init__(self, directory, seq):
+        self.seq = seq
+        self.path = os.path.join(directory, f"{seq:08d}{SEGMENT_SUFFIX}")
+        self.index_path = os.path.join(directory, f"{seq:08d}{INDEX_SUFFIX}")
+        self.size = 0
+        self.index_times = array("d")
+        self.index_offsets = array("Q")
+        self.records = 0
+
+    @property
+    def first_timestamp(self):
+        return self.index_times[0] if self.index_times else None
+
+
+class TelemetryLog:
+    def __init__(self, directory, segment_size=16 * 1024 * 1024, index_interval=256,
+                 flush_interval=1.0, fsync=True, retention_days=180, max_bytes=None,
+                 logger=None, read_only=False):
+        """
+        Inicjalizacja trwałego dziennika telemetrii (tylko dopisywanie).
+
+        Dane są zapisywane do plików segmentów o stałym formacie rekordu
+        (RECORD, 20 B). Każdy segment ma rzadki indeks czasu (co index_interval
+        rekordów). Zapisy są buforowane i utrwalane partiami przez wątek w tle
+        (jeden fsync na partię), a odczyty korzystają z mmap.
+
+        Args:
+            directory (str): Katalog danych
+            segment_size (int): Rozmiar, po którym zaczynany jest nowy segment
+            index_interval (int): Co ile rekordów dodawany jest wpis indeksu
+            flush_interval (float): Odstęp między zapisami partii w sekundach
+            fsync (bool): Czy wywoływać fsync po każdej partii
+            retention_days (float): Maksymalny wiek danych (None - bez limitu)
+            max_bytes (int): Maksymalny rozmiar wszystkich segmentów (None - bez limitu)
+            logger: Logger do raportowania błędów
+            read_only (bool): Tryb tylko do odczytu dla procesów, które nie są
+                właścicielem dziennika - lista segmentów jest odświeżana przy
+                każdym zapytaniu, a pliki nie są modyfikowane
+        """
+        self.directory = directory
+        self.segment_size = segment_size
+        self.index_interval = index_interval
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.retention_days = retention_days
+        self.max_bytes = max_bytes
+        self.logger = logger
+        self.read_only = read_only
+
+        self._series = {}  # (device_id, value_name) -> ID serii
+        self._series_names = {}  # ID serii -> (device_id, value_name)
+        self._segments = []
+        self._buffer = bytearray()
+        self._buffer_lock = threading.Lock()
+        self._write_lock = threading.Lock()  # Zapis do segmentów i zmiany ich listy
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._file = None
+        self._index_file = None
+
+        os.makedirs(directory, exist_ok=True)
+        self._load_catalog()
+        self._load_segments()
+
+    # ===================== Zapis =====================
+
+    def start(self):
+        """
+        Uruchamia wątek zapisujący partie.
+        """
+        if self._thread is None:
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="telemetry-writer", daemon=True)
+            self._thread.start()
+
+    def close(self):
+        """
+        Zatrzymuje wątek zapisujący i utrwala bufor.
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        with self._write_lock:
+            self._close_active()
+
+    def append(self, device_id, value_name, timestamp, value):
+        """
+        Dodaje rekord do bufora (bez operacji dyskowych).
+        """
+        series_id = self._series.get((device_id, value_name))
+        if series_id is None:
+            series_id = self._register_series(device_id, value_name)
+        with self._buffer_lock:
+            self._buffer += RECORD.pack(timestamp, series_id, value)
+
+    def on_status_change(self, device_id, changes):
+        """
+        Słuchacz zmian statusu z DeviceManager - zapisuje wartości liczbowe.
+        """
+        if not changes or not changes.get("values"):
+            return
+        # Wiadomości zachowane (retained) i odtworzony stan nie mają last_seen -
+        # wartość jest zapisywana z czasem odbioru
+        timestamp = changes.get("last_seen") or time.time()
+        for value_name, payload in changes["values"].items():
+            try:
+                value = float(payload)
+            except (TypeError, ValueError):
+                continue
+            if math.isfinite(value):
+                self.append(device_id, value_name, timestamp, value)
+
+    def flush(self):
+        """
+        Zapisuje zbuforowane rekordy do aktywnego segmentu.
+        """
+        with self._buffer_lock:
+            data = self._buffer
+            self._buffer = bytearray()
+        if not data:
+            return
+
+        with self._write_lock:
+            view = memoryview(data)
+            position = 0
+            while position < len(view):
+                segment = self._active_segment()
+                room = max(self.segment_size - segment.size, RECORD.size)
+                chunk = view[position:position + room - room % RECORD.size]
+                self._write_chunk(segment, chunk)
+                position += len(chunk)
+                if segment.size >= self.segment_size:
+                    self._close_active()
+
+            if self._file is not None:
+                self._sync_active()
+
+    def _write_chunk(self, segment, chunk):
+        # Wpisy indeksu dla rekordów o numerach podzielnych przez index_interval
+        index_entries = bytearray()
+        first = segment.records
+        count = len(chunk) // RECORD.size
+        start = -first % self.index_interval
+        for i in range(start, count, self.index_interval):
+            offset = i * RECORD.size
+            timestamp = RECORD.unpack_from(chunk, offset)[0]
+            segment.index_times.append(timestamp)
+            segment.index_offsets.append(segment.size + offset)
+            index_entries += INDEX_ENTRY.pack(timestamp, segment.size + offset)
+
+        self._file.write(chunk)
+        self._index_file.write(index_entries)
+        segment.size += len(chunk)
+        segment.records += count
+
+    def _active_segment(self):
+        if self._file is None:
+            seq = self._segments[-1].seq + 1 if self._segments else 1
+            segment = _Segment(self.directory, seq)
+            self._segments.append(segment)
+            self._file = open(segment.path, "ab")
+            self._index_file = open(segment.index_path, "ab")
+        return self._segments[-1]
+
+    def _sync_active(self):
+        self._file.flush()
+        self._index_file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+            os.fsync(self._index_file.fileno())
+
+    def _close_active(self):
+        if self._file is not None:
+            self._sync_active()
+            self._file.close()
+            self._index_file.close()
+            self._file = None
+            self._index_file = None
+
+    def _run(self):
+        last_retention = last_compaction = time.monotonic()
+        while not self._stop_event.wait(self.flush_interval):
+            try:
+                self.flush()
+                now = time.monotonic()
+                if now - last_retention >= 60:
+                    self.apply_retention()
+                    last_retention = now
+                if now - last_compaction >= 3600:
+                    self.compact()
+                    last_compaction = now
+            except Exception as e:
+                if self.logger:
+                    self.logger.error(f"Błąd zapisu telemetrii: {str(e)}")
+
+    # ===================== Katalog serii =====================
+
+    def _load_catalog(self):
+        path = os.path.join(self.directory, CATALOG_FILE)
+        if not os.path.exists(path):
+            return
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Niedokończona linia po awarii
+                    continue
+                key = (entry["device"], entry["value"])
+                self._series[key] = entry["id"]
+                self._series_names[entry["id"]] = key
+
+    def _register_series(self, device_id, value_name):
+        with self._write_lock:
+            key = (device_id, value_name)
+            if key in self._series:
+                return self._series[key]
+            series_id = len(self._series_names) + 1
+            path = os.path.join(self.directory, CATALOG_FILE)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"id": series_id, "device": device_id, "value": value_name}) + "\n")
+            self._series_names[series_id] = key
+            self._series[key] = series_id
+            return series_id
+
+    # ===================== Segmenty =====================
+
+    def refresh(self):
+        """
+        Wczytuje serie i segmenty dopisane przez proces-właściciela dziennika.
+        """
+        with self._write_lock:
+            self._load_catalog()
+            # Segmenty o niezmienionym rozmiarze nie są wczytywane ponownie
+            known = {segment.seq: segment for segment in self._segments}
+            self._segments = []
+            self._load_segments(known)
+
+    def _load_segments(self, known=None):
+        sequences = sorted(
+            int(name[:-len(SEGMENT_SUFFIX)])
+            for name in os.listdir(self.directory)
+            if name.endswith(SEGMENT_SUFFIX) and name[:-len(SEGMENT_SUFFIX)].isdigit()
+        )
+        for seq in sequences:
+            segment = _Segment(self.directory, seq)
+            try:
+                size = os.path.getsize(segment.path)
+            except FileNotFoundError:
+                # Segment usunięty przez retencję w innym procesie
+                continue
+            if self.read_only:
+                # Pomiń rekord, który właściciel właśnie zapisuje
+                size -= size % RECORD.size
+                if known and seq in known and known[seq].size == size:
+                    self._segments.append(known[seq])
+                    continue
+            elif size % RECORD.size:
+                # Obetnij niepełny rekord po awarii
+                size -= size % RECORD.size
+                os.truncate(segment.path, size)
+            segment.size = size
+            segment.records = size // RECORD.size
+            self._load_index(segment)
+            self._segments.append(segment)
+
+    def _load_index(self, segment):
+        expected = -(-segment.records // self.index_interval)
+        if os.path.exists(segment.index_path):
+            with open(segment.index_path, "rb") as f:
+                data = f.read()
+            entries = [
+                entry for entry in INDEX_ENTRY.iter_unpack(data[:len(data) - len(data) % INDEX_ENTRY.size])
+            ]
+            if len(entries) == expected or (self.read_only and len(entries) > expected):
+                for timestamp, offset in entries[:expected]:
+                    segment.index_times.append(timestamp)
+                    segment.index_offsets.append(offset)
+                return
+
+        # Indeks niekompletny - odbuduj go z danych segmentu
+        data = bytearray()
+        with open(segment.path, "rb") as f:
+            for i in range(expected):
+                offset = i * self.index_interval * RECORD.size
+                f.seek(offset)
+                timestamp = RECORD.unpack(f.read(RECORD.size))[0]
+                segment.index_times.append(timestamp)
+                segment.index_offsets.append(offset)
+                data += INDEX_ENTRY.pack(timestamp, offset)
+        if self.read_only:
+            return
+        with open(segment.index_path, "wb") as f:
+            f.write(data)
+
+    def _segment_end(self, position):
+        # Koniec zakresu czasu segmentu to początek następnego
+        if position + 1 < len(self._segments):
+            end = self._segments[position + 1].first_timestamp
+            if end is not None:
+                return end
+        return math.inf
+
+    def total_bytes(self):
+        """
+        Zwraca łączny rozmiar segmentów w bajtach.
+        """
+        return sum(segment.size for segment in self._segments)
+
+    def apply_retention(self):
+        """
+        Usuwa najstarsze zamknięte segmenty przekraczające limit wieku lub rozmiaru.
+
+        Returns:
+            int: Liczba usuniętych segmentów
+        """
+        removed = 0
+        with self._write_lock:
+            cutoff = time.time() - self.retention_days * 86400 if self.retention_days else None
+            total = self.total_bytes()
+            while len(self._segments) > 1:
+                too_old = cutoff is not None and self._segment_end(0) < cutoff
+                too_big = self.max_bytes is not None and total > self.max_bytes
+                if not (too_old or too_big):
+                    break
+                segment = self._segments.pop(0)
+                total -= segment.size
+                self._remove_files(segment)
+                removed += 1
+        return removed
+
+    def compact(self, keep_series=None, min_size=None):
+        """
+        Scala sąsiednie małe zamknięte segmenty w jeden plik.
+
+        Args:
+            keep_series (set, optional): Pary (device_id, value_name), których
+                rekordy mają zostać zachowane (pozostałe są usuwane)
+            min_size (int, optional): Segmenty mniejsze od tej wartości są
+                scalane (domyślnie 1/4 segment_size)
+
+        Returns:
+            int: Liczba scalonych segmentów źródłowych
+        """
+        min_size = min_size or self.segment_size // 4
+        keep_ids = None
+        if keep_series is not None:
+            keep_ids = {self._series[key] for key in keep_series if key in self._series}
+
+        with self._write_lock:
+            closed = self._segments[:-1] if self._file is not None else list(self._segments)
+
+            # Serie sąsiednich małych segmentów mieszczące się w segment_size
+            groups, group, group_size = [], [], 0
+            for segment in closed:
+                if segment.size < min_size and group_size + segment.size <= self.segment_size:
+                    group.append(segment)
+                    group_size += segment.size
+                    continue
+                if group:
+                    groups.append(group)
+                group, group_size = [], 0
+                if segment.size < min_size:
+                    group, group_size = [segment], segment.size
+                elif keep_ids is not None:
+                    # Filtrowanie serii wymaga przepisania również dużych segmentów
+                    groups.append([segment])
+            if group:
+                groups.append(group)
+
+            merged = 0
+            for group in groups:
+                if len(group) > 1 or keep_ids is not None:
+                    self._merge(group, keep_ids)
+                    merged += len(group)
+            return merged
+
+    def _merge(self, group, keep_ids):
+        target = _Segment(self.directory, group[0].seq)
+        tmp_path = target.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            for segment in group:
+                with open(segment.path, "rb") as source:
+                    data = source.read(segment.size)
+                if keep_ids is None:
+                    f.write(data)
+                    continue
+                for record in RECORD.iter_unpack(data):
+                    if record[1] in keep_ids:
+                        f.write(RECORD.pack(*record))
+            f.flush()
+            os.fsync(f.fileno())
+
+        # Podmień pierwszy segment grupy, pozostałe usuń
+        os.replace(tmp_path, target.path)
+        target.size = os.path.getsize(target.path)
+        target.records = target.size // RECORD.size
+        if os.path.exists(target.index_path):
+            os.remove(target.index_path)
+        self._load_index(target)
+        for segment in group[1:]:
+            self._remove_files(segment)
+
+        position = self._segments.index(group[0])
+        self._segments[position:position + len(group)] = [target]
+
+    @staticmethod
+    def _remove_files(segment):
+        for path in (segment.path, segment.index_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    # ===================== Odczyt =====================
+
+    def query(self, device_id, value_name, time_from, time_to):
+        """
+        Iteruje po rekordach serii z zakresu [time_from, time_to].
+
+        Segmenty są mapowane do pamięci (mmap), a rekordy dekodowane
+        bezpośrednio z mapowania, bez kopiowania danych.
+
+        Yields:
+            tuple: (czas, wartość)
+        """
+        if self.read_only:
+            self.refresh()
+        series_id = self._series.get((device_id, value_name))
+        if series_id is None:
+            return
+
+        with self._write_lock:
+            segments = [
+                (segment, segment.size)
+                for position, segment in enumerate(self._segments)
+                if segment.size
+                and segment.first_timestamp <= time_to
+                and self._segment_end(position) >= time_from
+            ]
+
+        for segment, size in segments:
+            # Przesunięcie startowe z rzadkiego indeksu
+            position = bisect.bisect_left(segment.index_times, time_from) - 1
+            start = segment.index_offsets[position] if position >= 0 else 0
+            try:
+                with open(segment.path, "rb") as f:
+                    mapping = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+            except (FileNotFoundError, ValueError):
+                # Segment usunięty przez retencję w trakcie odczytu
+                continue
+            base = memoryview(mapping)
+            view = base[start:size]
+            records = RECORD.iter_unpack(view)
+            try:
+                for timestamp, record_series, value in records:
+                    if timestamp > time_to:
+                        break
+                    if record_series == series_id and timestamp >= time_from:
+                        yield timestamp, value
+            finally:
+                # Zwolnij widoki przed zamknięciem mapowania
+                del records
+                view.release()
+                base.release()
+                mapping.close()
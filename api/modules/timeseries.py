@@ -0,0 +1,201 @@
+# modules/timeseries.py
+import math
+import threading
+import time
+from array import array
+
+
+class RingSeries:
+    __slots__ = ("capacity", "_timestamps", "_values", "_start", "_size")
+
+    def __init__(self, capacity):
+        """
+        Bufor cykliczny o stałej pojemności na pary (czas, wartość).
+
+        Dane są przechowywane w dwóch tablicach float64, więc seria zajmuje
+        stałe 16 bajtów na punkt (capacity * 16 B), niezależnie od liczby zapisów.
+        """
+        self.capacity = capacity
+        self._timestamps = array("d", bytes(8 * capacity))
+        self._values = array("d", bytes(8 * capacity))
+        self._start = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, timestamp, value):
+        """
+        Dodaje punkt, nadpisując najstarszy po zapełnieniu bufora.
+        """
+        index = (self._start + self._size) % self.capacity
+        self._timestamps[index] = timestamp
+        self._values[index] = value
+        if self._size < self.capacity:
+            self._size += 1
+        else:
+            self._start = (self._start + 1) % self.capacity
+
+    def first_timestamp(self):
+        """
+        Zwraca czas najstarszego punktu lub None.
+        """
+        return self._timestamps[self._start] if self._size else None
+
+    def last(self):
+        """
+        Zwraca najnowszy punkt (czas, wartość) lub None.
+        """
+        if not self._size:
+            return None
+        index = (self._start + self._size - 1) % self.capacity
+        return self._timestamps[index], self._values[index]
+
+    def _lower_bound(self, timestamp):
+        # Wyszukiwanie binarne po indeksach logicznych (od najstarszego)
+        low, high = 0, self._size
+        while low < high:
+            mid = (low + high) // 2
+            if self._timestamps[(self._start + mid) % self.capacity] < timestamp:
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+    def iter_range(self, time_from, time_to):
+        """
+        Iteruje po punktach z zakresu [time_from, time_to] bez kopiowania bufora.
+        """
+        timestamps, values, capacity = self._timestamps, self._values, self.capacity
+        for i in range(self._lower_bound(time_from), self._size):
+            index = (self._start + i) % capacity
+            timestamp = timestamps[index]
+            if timestamp > time_to:
+                break
+            yield timestamp, values[index]
+
+
+def downsample(points, time_from, time_to, step):
+    """
+    Agreguje punkty do przedziałów o długości step (min/max/avg/count).
+
+    Args:
+        points (iterable): Punkty (czas, wartość) uporządkowane rosnąco
+        time_from (float): Początek zakresu
+        time_to (float): Koniec zakresu
+        step (float): Długość przedziału w sekundach
+
+    Returns:
+        list: Lista przedziałów z co najmniej jednym punktem
+    """
+    buckets = []
+    current = None
+    for timestamp, value in points:
+        if timestamp < time_from or timestamp > time_to:
+            continue
+        bucket_start = time_from + math.floor((timestamp - time_from) / step) * step
+        if current is None or current["t"] != bucket_start:
+            if current is not None:
+                current["avg"] = current.pop("sum") / current["count"]
+                buckets.append(current)
+            current = {"t": bucket_start, "min": value, "max": value, "sum": 0.0, "count": 0}
+        if value < current["min"]:
+            current["min"] = value
+        if value > current["max"]:
+            current["max"] = value
+        current["sum"] += value
+        current["count"] += 1
+    if current is not None:
+        current["avg"] = current.pop("sum") / current["count"]
+        buckets.append(current)
+    return buckets
+
+
+class TimeSeriesStore:
+    def __init__(self, capacity=4096):
+        """
+        Inicjalizacja magazynu historii wartości urządzeń w pamięci.
+
+        Args:
+            capacity (int): Liczba punktów w buforze każdej serii (device, value)
+        """
+        self.capacity = capacity
+        self._series = {}  # device_id -> {value_name: RingSeries}
+        self._lock = threading.Lock()
+
+    def append(self, device_id, value_name, timestamp, value):
+        """
+        Dodaje punkt do serii, tworząc ją przy pierwszym zapisie.
+        """
+        with self._lock:
+            device_series = self._series.get(device_id)
+            if device_series is None:
+                device_series = self._series[device_id] = {}
+            series = device_series.get(value_name)
+            if series is None:
+                series = device_series[value_name] = RingSeries(self.capacity)
+            series.append(timestamp, value)
+
+    def get_series(self, device_id, value_name):
+        """
+        Zwraca serię lub None, jeśli nie ma jeszcze danych.
+        """
+        return self._series.get(device_id, {}).get(value_name)
+
+    def value_names(self, device_id):
+        """
+        Zwraca nazwy wartości, dla których istnieje historia urządzenia.
+        """
+        return sorted(self._series.get(device_id, {}))
+
+    def remove_device(self, device_id):
+        """
+        Usuwa historię urządzenia.
+        """
+        with self._lock:
+            self._series.pop(device_id, None)
+
+    def range(self, device_id, value_name, time_from, time_to):
+        """
+        Zwraca listę punktów (czas, wartość) z zakresu [time_from, time_to].
+
+        Kopia powstaje pod blokadą - bufor serii może być w tym czasie
+        nadpisywany przez nowe punkty.
+        """
+        series = self.get_series(device_id, value_name)
+        if series is None:
+            return []
+        with self._lock:
+            return list(series.iter_range(time_from, time_to))
+
+    def query(self, device_id, value_name, time_from, time_to, step):
+        """
+        Zwraca historię wartości zagregowaną do przedziałów o długości step.
+        """
+        series = self.get_series(device_id, value_name)
+        if series is None:
+            return []
+        with self._lock:
+            return downsample(series.iter_range(time_from, time_to), time_from, time_to, step)
+
+    def on_status_change(self, device_id, changes):
+        """
+        Słuchacz zmian statusu z DeviceManager - zapisuje wartości liczbowe.
+        """
+        if changes is None:
+            self.remove_device(device_id)
+            return
+
+        values = changes.get("values")
+        if not values:
+            return
+        # Wiadomości zachowane (retained) i odtworzony stan nie mają last_seen -
+        # wartość jest zapisywana z czasem odbioru
+        timestamp = changes.get("last_seen") or time.time()
+        for value_name, payload in values.items():
+            try:
+                value = float(payload)
+            except (TypeError, ValueError):
+                continue
+            if math.isfinite(value):
+                self.append(device_id, value_name, timestamp, value)
@@ -0,0 +1,133 @@
+# modules/topic_router.py
+
+
+class _TopicNode:
+    __slots__ = ("children", "handlers")
+
+    def __init__(self):
+        self.children = {}
+        self.handlers = []
+
+
+class TopicRouter:
+    def __init__(self):
+        """
+        Inicjalizacja routera tematów MQTT opartego na drzewie (trie).
+
+        Obsługuje filtry z symbolami wieloznacznymi "+" (jeden poziom)
+        i "#" (wszystkie pozostałe poziomy) oraz wiele funkcji na jeden filtr.
+        """
+        self._root = _TopicNode()
+        self._filters = {}  # filtr -> liczba zarejestrowanych funkcji
+
+    def __len__(self):
+        return len(self._filters)
+
+    def __contains__(self, topic_filter):
+        return topic_filter in self._filters
+
+    def filters(self):
+        """
+        Zwraca listę zarejestrowanych filtrów.
+        """
+        return list(self._filters)
+
+    def add(self, topic_filter, handler):
+        """
+        Rejestruje funkcję dla filtra tematów.
+
+        Args:
+            topic_filter (str): Filtr tematów, np. iot/device/+/status
+            handler (function): Funkcja wywoływana dla pasujących tematów
+        """
+        node = self._root
+        for level in topic_filter.split("/"):
+            child = node.children.get(level)
+            if child is None:
+                child = node.children[level] = _TopicNode()
+            node = child
+        node.handlers.append(handler)
+        self._filters[topic_filter] = self._filters.get(topic_filter, 0) + 1
+
+    def remove(self, topic_filter, handler=None):
+        """
+        Usuwa funkcję (lub wszystkie funkcje, gdy handler=None) dla filtra.
+
+        Returns:
+            bool: True, jeśli cokolwiek usunięto
+        """
+        path = [self._root]
+        for level in topic_filter.split("/"):
+            child = path[-1].children.get(level)
+            if child is None:
+                return False
+            path.append(child)
+
+        node = path[-1]
+        if handler is None:
+            removed = len(node.handlers)
+            node.handlers = []
+        else:
+            removed = len(node.handlers)
+            node.handlers = [h for h in node.handlers if h != handler]
+            removed -= len(node.handlers)
+        if not removed:
+            return False
+
+        remaining = self._filters[topic_filter] - removed
+        if remaining > 0:
+            self._filters[topic_filter] = remaining
+        else:
+            del self._filters[topic_filter]
+
+        # Usuń puste gałęzie drzewa
+        levels = topic_filter.split("/")
+        for i in range(len(levels), 0, -1):
+            node = path[i]
+            if node.handlers or node.children:
+                break
+            del path[i - 1].children[levels[i - 1]]
+        return True
+
+    def match(self, topic):
+        """
+        Zwraca funkcje zarejestrowane dla filtrów pasujących do tematu.
+
+        Koszt zależy od głębokości tematu, a nie od liczby filtrów.
+
+        Args:
+            topic (str): Temat wiadomości
+
+        Returns:
+            list: Lista pasujących funkcji
+        """
+        levels = topic.split("/")
+        handlers = []
+        # Tematy systemowe ($SYS/...) nie pasują do wieloznacznika na pierwszym poziomie
+        wildcards = not topic.startswith("$")
+        nodes = [self._root]
+        for depth, level in enumerate(levels):
+            next_nodes = []
+            for node in nodes:
+                children = node.children
+                if wildcards or depth > 0:
+                    multi = children.get("#")
+                    if multi is not None:
+                        handlers.extend(multi.handlers)
+                    single = children.get("+")
+                    if single is not None:
+                        next_nodes.append(single)
+                child = children.get(level)
+                if child is not None:
+                    next_nodes.append(child)
+            if not next_nodes:
+                return handlers
+            nodes = next_nodes
+
+        for node in nodes:
+            handlers.extend(node.handlers)
+            # "a/#" pasuje również do samego "a"
+            multi = node.children.get("#")
+            if multi is not None:
+                handlers.extend(multi.handlers)
+        return handlers
@@ -0,0 +1,408 @@
+# modules/worker_sync.py
+import fcntl
+import itertools
+import json
+import os
+import queue
+import socket
+import threading
+import time
+
+
+class _Peer:
+    def __init__(self, sock, logger, max_pending=10000):
+        """
+        Połączenie z procesem-obserwatorem z kolejką wiadomości wychodzących.
+
+        Wysyłanie odbywa się w osobnym wątku, więc wolny obserwator nie
+        blokuje wątku przetwarzania wiadomości MQTT. Po przepełnieniu kolejki
+        połączenie jest zamykane - obserwator połączy się ponownie i otrzyma
+        pełny stan.
+        """
+        self.sock = sock
+        self.logger = logger
+        self.outbox = queue.Queue(max_pending)
+        self.closed = False
+        threading.Thread(target=self._write_loop, name="worker-sync-peer", daemon=True).start()
+
+    def send(self, data):
+        """
+        Dodaje wiadomość do kolejki bez blokowania.
+
+        Returns:
+            bool: False, jeśli połączenie jest zamknięte lub kolejka pełna
+                (wywołujący powinien wtedy zamknąć połączenie)
+        """
+        if self.closed:
+            return False
+        try:
+            self.outbox.put_nowait(data)
+        except queue.Full:
+            return False
+        return True
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        # Najpierw gniazdo - przerywa sendall zablokowany w wątku zapisującym
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        # Obudź wątek zapisujący bez blokowania (kolejka może być pełna)
+        while True:
+            try:
+                self.outbox.get_nowait()
+            except queue.Empty:
+                break
+        try:
+            self.outbox.put_nowait(None)
+        except queue.Full:
+            pass
+
+    def _write_loop(self):
+        while True:
+            data = self.outbox.get()
+            if data is None or self.closed:
+                break
+            try:
+                self.sock.sendall(data)
+            except OSError:
+                self.close()
+                break
+        self.sock.close()
+
+
+class WorkerCoordinator:
+    def __init__(self, device_manager, mqtt_client, socket_path, lock_path, logger,
+                 request_timeout=5.0, retry_interval=1.0):
+        """
+        Koordynacja stanu między workerami gunicorna.
+
+        Dokładnie jeden proces (właściciel, wybrany blokadą pliku lock_path)
+        łączy się z brokerem MQTT i zapisuje konfigurację. Pozostałe procesy
+        (obserwatorzy) łączą się z nim przez gniazdo Unix socket_path, dostają
+        pełny stan, a następnie strumień zmian statusu i konfiguracji. Zmiany
+        konfiguracji i komendy z obserwatorów są przekazywane do właściciela.
+        Gdy właściciel zakończy działanie, blokadę przejmuje jeden z obserwatorów.
+
+        Args:
+            device_manager: Menedżer urządzeń
+            mqtt_client: Klient MQTT
+            socket_path (str): Ścieżka gniazda Unix
+            lock_path (str): Ścieżka pliku blokady wyboru właściciela
+            logger: Logger aplikacji
+            request_timeout (float): Czas oczekiwania na odpowiedź właściciela
+            retry_interval (float): Odstęp między próbami przejęcia roli/połączenia
+        """
+        self.device_manager = device_manager
+        self.mqtt_client = mqtt_client
+        self.socket_path = socket_path
+        self.lock_path = lock_path
+        self.logger = logger
+        self.request_timeout = request_timeout
+        self.retry_interval = retry_interval
+
+        self.is_owner = False
+        self.owner_mqtt_connected = False
+        self.synced = False
+        self._on_become_owner = None
+        self._lock_file = None
+        self._peers = []
+        self._peers_lock = threading.Lock()
+        self._sock = None
+        self._send_lock = threading.Lock()
+        self._pending = {}  # ID żądania -> [Event, wynik]
+        self._request_ids = itertools.count(1)
+
+    def start(self, on_become_owner):
+        """
+        Uruchamia wybór właściciela w tle.
+
+        Args:
+            on_become_owner (function): Funkcja wywoływana, gdy ten proces
+                zostanie właścicielem (np. połączenie z brokerem MQTT)
+        """
+        self._on_become_owner = on_become_owner
+        threading.Thread(target=self._run, name="worker-sync", daemon=True).start()
+
+    def is_mqtt_connected(self):
+        """
+        Zwraca stan połączenia z brokerem (lokalny lub właściciela).
+        """
+        if self.is_owner:
+            return self.mqtt_client.is_connected()
+        return self.owner_mqtt_connected
+
+    def is_mqtt_ready(self):
+        """
+        Zwraca gotowość połączenia z brokerem (lokalnego lub właściciela).
+        """
+        if self.is_owner:
+            return self.mqtt_client.is_ready()
+        return self.owner_mqtt_connected
+
+    def is_synced(self):
+        """
+        Sprawdza, czy proces ma aktualny stan (właściciel lub obserwator
+        połączony z właścicielem).
+        """
+        return self.is_owner or self.synced
+
+    def _run(self):
+        while True:
+            if self._try_acquire_lock():
+                self._become_owner()
+                return
+            self._follow()
+            time.sleep(self.retry_interval)
+
+    def _try_acquire_lock(self):
+        if self._lock_file is None:
+            self._lock_file = open(self.lock_path, "a")
+        return _try_flock(self._lock_file)
+
+    # ===================== Właściciel =====================
+
+    def _become_owner(self):
+        self.is_owner = True
+        self.device_manager.mutation_forwarder = None
+        self.mqtt_client.set_publish_forwarder(None)
+        self.logger.info(f"Worker {os.getpid()} przejmuje połączenie MQTT i zapis stanu")
+
+        # Blokada gwarantuje, że stare gniazdo nie należy do żywego procesu
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.socket_path)
+        server.listen(64)
+
+        self.device_manager.add_status_listener(self._broadcast_status)
+        self.device_manager.add_registry_listener(self._broadcast_mutation)
+        threading.Thread(target=self._watch_mqtt, name="worker-sync-mqtt", daemon=True).start()
+
+        if self._on_become_owner:
+            try:
+                self._on_become_owner()
+            except Exception as e:
+                self.logger.error(f"Błąd uruchamiania usług właściciela: {str(e)}")
+
+        while True:
+            conn, _ = server.accept()
+            threading.Thread(
+                target=self._serve_peer, args=(conn,), name="worker-sync-reader", daemon=True
+            ).start()
+
+    def _serve_peer(self, conn):
+        peer = _Peer(conn, self.logger)
+        # Pełny stan i rejestracja pod jedną blokadą - żadna zmiana nie zginie
+        with self._peers_lock:
+            state = self.device_manager.export_state()
+            peer.send(_encode({  # pusta kolejka - zawsze się mieści
+                "type": "state",
+                "state": state,
+                "mqtt_connected": self.mqtt_client.is_connected(),
+            }))
+            self._peers.append(peer)
+
+        try:
+            for message in _read_messages(conn):
+                self._handle_peer_request(peer, message)
+        except OSError:
+            pass
+        finally:
+            peer.close()
+            with self._peers_lock:
+                if peer in self._peers:
+                    self._peers.remove(peer)
+
+    def _handle_peer_request(self, peer, message):
+        ok = False
+        try:
+            if message["type"] == "mutation":
+                ok = self.device_manager.commit_mutation(message["mutation"])
+            elif message["type"] == "publish":
+                ok = self.mqtt_client.publish_many(message["messages"], message.get("device_ids"))
+            elif message["type"] == "command_stats":
+                ok = self.mqtt_client.get_command_stats()
+        except Exception as e:
+            self.logger.error(f"Błąd obsługi żądania workera: {str(e)}")
+        if not peer.send(_encode({"type": "ack", "id": message.get("id"), "ok": ok})):
+            self._drop_peers([peer])
+
+    def _broadcast(self, message):
+        # Wywoływana w wątku przetwarzania wiadomości MQTT - nie może blokować
+        data = _encode(message)
+        with self._peers_lock:
+            stalled = [peer for peer in self._peers if not peer.send(data)]
+        if stalled:
+            self._drop_peers(stalled)
+
+    def _drop_peers(self, peers):
+        """
+        Rozłącza obserwatorów z przepełnioną kolejką - połączą się ponownie
+        i otrzymają pełny stan.
+        """
+        for peer in peers:
+            if not peer.closed:
+                self.logger.warning("Przepełniona kolejka synchronizacji workera - rozłączanie")
+            peer.close()
+        with self._peers_lock:
+            self._peers = [peer for peer in self._peers if peer not in peers]
+
+    def _broadcast_status(self, device_id, changes):
+        self._broadcast({
+            "type": "status",
+            "device_id": device_id,
+            "changes": changes,
+            "version": self.device_manager.get_device_version(device_id),
+        })
+
+    def _broadcast_mutation(self, mutation):
+        self._broadcast({"type": "mutation", "mutation": mutation})
+
+    def _watch_mqtt(self):
+        # Rozgłaszaj zmiany stanu połączenia z brokerem
+        last = None
+        while True:
+            connected = self.mqtt_client.is_connected()
+            if connected != last:
+                self._broadcast({"type": "mqtt", "connected": connected})
+                last = connected
+            time.sleep(1.0)
+
+    # ===================== Obserwator =====================
+
+    def _follow(self):
+        try:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(self.socket_path)
+        except OSError:
+            return
+
+        self._sock = sock
+        self.device_manager.mutation_forwarder = self._forward_mutation
+        self.mqtt_client.set_publish_forwarder(self._forward_publish)
+        try:
+            for message in _read_messages(sock):
+                self._handle_owner_message(message)
+        except OSError:
+            pass
+        finally:
+            self._sock = None
+            sock.close()
+            self.synced = False
+            self.owner_mqtt_connected = False
+            # Zwolnij oczekujące żądania
+            for pending in list(self._pending.values()):
+                pending[0].set()
+            self.logger.warning("Utracono połączenie z workerem-właścicielem")
+
+    def _handle_owner_message(self, message):
+        kind = message["type"]
+        if kind == "status":
+            self.device_manager.apply_remote_status(
+                message["device_id"], message["changes"], message.get("version")
+            )
+        elif kind == "mutation":
+            self.device_manager.apply_remote_mutation(message["mutation"])
+        elif kind == "ack":
+            pending = self._pending.get(message["id"])
+            if pending is not None:
+                pending[1] = message["ok"]
+                pending[0].set()
+        elif kind == "mqtt":
+            self.owner_mqtt_connected = message["connected"]
+        elif kind == "state":
+            self.device_manager.import_state(message["state"])
+            self.owner_mqtt_connected = message["mqtt_connected"]
+            self.synced = True
+
+    def _request(self, message):
+        sock = self._sock
+        if sock is None:
+            return False
+        request_id = next(self._request_ids)
+        pending = self._pending[request_id] = [threading.Event(), False]
+        message["id"] = request_id
+        try:
+            with self._send_lock:
+                sock.sendall(_encode(message))
+            pending[0].wait(self.request_timeout)
+            return pending[1]
+        except OSError:
+            return False
+        finally:
+            self._pending.pop(request_id, None)
+
+    def _forward_mutation(self, mutation):
+        return self._request({"type": "mutation", "mutation": mutation})
+
+    def get_command_stats(self):
+        """
+        Zwraca statystyki komend z procesu, który publikuje wiadomości.
+        """
+        if self.is_owner:
+            return self.mqtt_client.get_command_stats()
+        return self._request({"type": "command_stats"}) or None
+
+    def _forward_publish(self, messages, device_ids=None):
+        results = self._request({"type": "publish", "messages": messages, "device_ids": device_ids})
+        return results if isinstance(results, list) else [False] * len(messages)
+
+
+def acquire_owner_lock(lock_path, timeout=0.0, retry_interval=0.5):
+    """
+    Zajmuje blokadę pliku wyboru właściciela bez koordynacji workerów -
+    drugi proces-właściciel łączyłby się z brokerem i zapisywał te same pliki.
+
+    Args:
+        lock_path (str): Ścieżka pliku blokady
+        timeout (float): Czas oczekiwania na zwolnienie blokady przez
+            poprzedni proces (np. kończący pracę po przeładowaniu gunicorna)
+
+    Returns:
+        file or None: Otwarty plik blokady (trzymany do końca procesu)
+            lub None, jeśli blokadę trzyma inny proces
+    """
+    lock_file = open(lock_path, "a")
+    deadline = time.monotonic() + timeout
+    while not _try_flock(lock_file):
+        if time.monotonic() >= deadline:
+            lock_file.close()
+            return None
+        time.sleep(retry_interval)
+    return lock_file
+
+
+def _try_flock(lock_file):
+    try:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+
+def _encode(message):
+    return (json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def _read_messages(sock):
+    # Pełny stan to jedna długa linia - fragmenty są dopisywane do bufora
+    # (bez kopiowania całości), a koniec linii jest szukany tylko w nowym fragmencie
+    buffer = bytearray()
+    while True:
+        chunk = sock.recv(65536)
+        if not chunk:
+            return
+        end = chunk.rfind(b"\n")
+        if end == -1:
+            buffer += chunk
+            continue
+        buffer += chunk[:end]
+        lines = buffer.split(b"\n")
+        buffer = bytearray(chunk[end + 1:])
+        for line in lines:
+            if line:
+                yield json.loads(line)
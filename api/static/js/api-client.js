@@ -94,6 +94,53 @@ class APIClient {
     }
   }
 
+  async controlDevices(commands) {
+    try {
+      const response = await fetch(`${this.baseUrl}/devices/commands`, {
+        method: "POST",
+        headers: {
+          "Content-Type": "application/json",
+        },
+        body: JSON.stringify({ commands }),
+      });
+      if (!response.ok) {
+        throw new Error(`Status HTTP: ${response.status}`);
+      }
+      return await response.json();
+    } catch (error) {
+      console.error("Błąd sterowania urządzeniami:", error);
+      throw error;
+    }
+  }
+
+  async getScenes() {
+    try {
+      const response = await fetch(`${this.baseUrl}/scenes`);
+      if (!response.ok) {
+        throw new Error(`Status HTTP: ${response.status}`);
+      }
+      return await response.json();
+    } catch (error) {
+      console.error("Błąd pobierania scen:", error);
+      throw error;
+    }
+  }
+
+  async activateScene(sceneId) {
+    try {
+      const response = await fetch(`${this.baseUrl}/scene/${sceneId}/activate`, {
+        method: "POST",
+      });
+      if (!response.ok) {
+        throw new Error(`Status HTTP: ${response.status}`);
+      }
+      return await response.json();
+    } catch (error) {
+      console.error(`Błąd uruchamiania sceny ${sceneId}:`, error);
+      throw error;
+    }
+  }
+
   async addDevice(deviceData) {
     try {
       const response = await fetch(`${this.baseUrl}/devices`, {
@@ -121,8 +121,10 @@ sendCommand(command) {
 
   // Aktualizacja stanu
   updateContent(data) {
-    if (data && typeof data === "string") {
-      const newState = data === "on";
+    // Status jako napis ("on"/"off") lub wartość typowana (boolean/liczba,
+    // gdy urządzenie ma opis treści w polu "payloads")
+    if (data !== null && data !== undefined && data !== "") {
+      const newState = typeof data === "string" ? data === "on" : Boolean(data);
       this.state = newState;
 
       if (this.panelType === "toggle" && this.controlElement) {
@@ -88,13 +88,19 @@ class IndicatorDisplay extends Panel {
   }
 
   // Aktualizacja wszystkich wskaźników
+  // Stan wskaźnika dla wartości z serwera (napis lub wartość typowana)
+  stateFor(data) {
+    if (typeof data === "boolean") {
+      return data;
+    }
+    return this.stateValues[data] !== undefined ? this.stateValues[data] : false;
+  }
+
   updateContent(data, topic) {
-    if (data) {
+    if (data !== null && data !== undefined) {
       if (topic === this.stateTopic) {
         // Aktualizacja głównego wskaźnika
-        const state =
-          this.stateValues[data] !== undefined ? this.stateValues[data] : false;
-        this.updateIndicator("main", state);
+        this.updateIndicator("main", this.stateFor(data));
       } else {
         // Sprawdź czy to temat szczegółowy dla konkretnego wskaźnika
         const topicParts = topic.split("/");
@@ -108,11 +114,7 @@ class IndicatorDisplay extends Panel {
         );
 
         if (matchingIndicator) {
-          const state =
-            this.stateValues[data] !== undefined
-              ? this.stateValues[data]
-              : false;
-          this.updateIndicator(matchingIndicator.id, state);
+          this.updateIndicator(matchingIndicator.id, this.stateFor(data));
         }
       }
     }
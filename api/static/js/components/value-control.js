@@ -250,16 +250,20 @@ sendCommand(command) {
 
   // Aktualizacja stanu
   updateContent(data, topic) {
-    if (data) {
-      // Obsługa danych przychodzących z MQTT
+    if (data !== null && data !== undefined && data !== "") {
+      // Obsługa danych przychodzących z MQTT (napis lub wartość typowana)
       let value;
-      try {
-        value = parseFloat(data);
-        if (isNaN(value)) {
-          value = data === "on" ? this.max : data === "off" ? 0 : this.value;
+      if (typeof data === "boolean") {
+        value = data ? this.max : 0;
+      } else {
+        try {
+          value = parseFloat(data);
+          if (isNaN(value)) {
+            value = data === "on" ? this.max : data === "off" ? 0 : this.value;
+          }
+        } catch (e) {
+          value = this.value;
         }
-      } catch (e) {
-        value = this.value;
       }
 
       this.value = value;
@@ -60,14 +60,7 @@ document.addEventListener("DOMContentLoaded", async () => {
           // if (!mqttClient.isConnected) {
           //   mqttClient.connect();
           // }
-            // Oznacz wszystkie urządzenia jako online
-          Object.values(appState.panels).forEach(panel => {
-          panel.updateConnectionStatus(true);
-          });
-
-
-
-
+          // Stan każdego panelu wynika ze stanu urządzenia (onDeviceOnline)
         } else {
           mqttStatusDot.classList.remove("status-connected");
           mqttStatusDot.classList.add("status-disconnected");
@@ -193,6 +186,7 @@ document.addEventListener("DOMContentLoaded", async () => {
 
         // Zapisz referencję do panelu
         appState.panels[device.id] = panel;
+        panel.updateConnectionStatus(mqttClient.deviceOnline[device.id] === true);
 
         // Subskrybuj tematy MQTT dla tego urządzenia
         if (mqttClient.isConnected) {
@@ -230,7 +224,6 @@ document.addEventListener("DOMContentLoaded", async () => {
     mqttClient.subscribe(statusTopic, (message) => {
       const panel = appState.panels[device.id];
       if (panel) {
-        panel.updateConnectionStatus(true);
         panel.updateContent(message);
       }
     });
@@ -242,7 +235,6 @@ document.addEventListener("DOMContentLoaded", async () => {
         mqttClient.subscribe(valueTopic, (message, topic) => {
           const panel = appState.panels[device.id];
           if (panel) {
-            panel.updateConnectionStatus(true);
             panel.updateContent(message, topic);
           }
         });
@@ -250,6 +242,31 @@ document.addEventListener("DOMContentLoaded", async () => {
     }
   }
 
+  // Stan online/offline paneli według stanu urządzeń z serwera
+  mqttClient.onDeviceOnline((deviceId, online) => {
+    const panel = appState.panels[deviceId];
+    if (panel) {
+      panel.updateConnectionStatus(online);
+    }
+  });
+
+  // Usunięcie urządzenia na serwerze - usuń jego panel i subskrypcje
+  mqttClient.onDeviceRemoved((deviceId) => {
+    const device = appState.devices.find((d) => d.id === deviceId);
+    if (device) {
+      mqttClient.unsubscribe(`${device.topic}/status`);
+      Object.values(device.valueTopics || {}).forEach((suffix) => {
+        mqttClient.unsubscribe(`${device.topic}/${suffix}`);
+      });
+      appState.devices = appState.devices.filter((d) => d.id !== deviceId);
+    }
+    const panel = appState.panels[deviceId];
+    if (panel) {
+      panel.element.remove();
+      delete appState.panels[deviceId];
+    }
+  });
+
   // Obsługa zdarzeń MQTT
   window.addEventListener("mqtt-connected", () => {
     console.log("Połączono z MQTT");
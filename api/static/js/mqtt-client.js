@@ -5,6 +5,10 @@ class MQTTClient {
   constructor() {
     this.isConnected = false;
     this.subscriptions = {};
+    this.lastMessages = {}; // Ostatnia wiadomość dla każdego tematu
+    this.deviceOnline = {}; // Stan połączenia każdego urządzenia (z serwera)
+    this.onlineCallbacks = [];
+    this.removeCallbacks = [];
     console.log("Inicjalizacja uproszczonego klienta MQTT (przez API)");
   }
 
@@ -29,8 +33,12 @@ class MQTTClient {
         window.dispatchEvent(new Event("mqtt-disconnected"));
       });
     
-    // Rozpocznij pobieranie statusów urządzeń co 5 sekund
-    this._startStatusPolling();
+    // Odbieraj zmiany statusów przez strumień SSE (lub polling, gdy brak wsparcia)
+    if (window.EventSource) {
+      this._startStatusStream();
+    } else {
+      this._startStatusPolling();
+    }
     
     return true;
   }
@@ -38,6 +46,7 @@ class MQTTClient {
   disconnect() {
     this.isConnected = false;
     console.log("Rozłączono z symulowanym MQTT");
+    this._stopStatusStream();
     this._stopStatusPolling();
     window.dispatchEvent(new Event("mqtt-disconnected"));
   }
@@ -45,6 +54,11 @@ class MQTTClient {
   subscribe(topic, callback) {
     console.log(`Symulacja subskrypcji tematu: ${topic}`);
     this.subscriptions[topic] = callback;
+
+    // Przekaż ostatni znany stan, jeśli dotarł przed subskrypcją
+    if (this.lastMessages[topic] !== undefined) {
+      callback(this.lastMessages[topic], topic);
+    }
   }
 
   unsubscribe(topic) {
@@ -85,17 +99,84 @@ class MQTTClient {
     return false;
   }
 
+  // Rejestruje funkcję wywoływaną przy zmianie stanu online/offline urządzenia
+  onDeviceOnline(callback) {
+    this.onlineCallbacks.push(callback);
+
+    // Przekaż znane stany urządzeń
+    Object.entries(this.deviceOnline).forEach(([deviceId, online]) => {
+      callback(deviceId, online);
+    });
+  }
+
+  // Rejestruje funkcję wywoływaną po usunięciu urządzenia na serwerze
+  onDeviceRemoved(callback) {
+    this.removeCallbacks.push(callback);
+  }
+
+  // Prywatne metody do odbierania zmian przez strumień SSE
+  _startStatusStream() {
+    this._stopStatusStream();
+
+    // EventSource sam wznawia połączenie, wysyłając Last-Event-ID
+    this._eventSource = new EventSource("/api/devices/stream");
+
+    this._eventSource.addEventListener("snapshot", (event) => {
+      const statuses = JSON.parse(event.data);
+      // Urządzenia usunięte, gdy strumień był rozłączony
+      Object.keys(this.deviceOnline)
+        .filter((deviceId) => !(deviceId in statuses))
+        .forEach((deviceId) => this._processDeviceRemoved(deviceId));
+      this._processDevicesStatus(statuses);
+    });
+
+    this._eventSource.addEventListener("update", (event) => {
+      const data = JSON.parse(event.data);
+      this._processDevicesStatus({ [data.device_id]: data.changes });
+    });
+
+    this._eventSource.addEventListener("remove", (event) => {
+      this._processDeviceRemoved(JSON.parse(event.data).device_id);
+    });
+
+    this._eventSource.onerror = (error) => {
+      console.error("Błąd strumienia statusów:", error);
+    };
+  }
+
+  _stopStatusStream() {
+    if (this._eventSource) {
+      this._eventSource.close();
+      this._eventSource = null;
+    }
+  }
+
   // Prywatne metody do symulacji zachowania MQTT przez polling API
   _startStatusPolling() {
     this._stopStatusPolling(); // Upewnij się, że nie mamy dwóch interwałów
     
     this._pollingInterval = setInterval(() => {
       if (this.isConnected) {
-        fetch("/api/devices/status")
-          .then(response => response.json())
-          .then(statuses => {
-            // Emuluj wiadomości MQTT dla wszystkich urządzeń
-            this._processDevicesStatus(statuses);
+        // Po pierwszym pobraniu pytaj tylko o zmiany od znanej wersji
+        const url = this._statusVersion
+          ? `/api/devices/status?since=${this._statusVersion}`
+          : "/api/devices/status";
+
+        fetch(url)
+          .then(response => {
+            if (response.status === 304) {
+              return null;
+            }
+            this._statusVersion = response.headers.get("X-Status-Version");
+            return response.json();
+          })
+          .then(data => {
+            if (!data) {
+              return;
+            }
+            // Emuluj wiadomości MQTT dla zmienionych urządzeń
+            this._processDevicesStatus(data.devices || data);
+            (data.removed || []).forEach((deviceId) => this._processDeviceRemoved(deviceId));
           })
           .catch(error => {
             console.error("Błąd pobierania statusów:", error);
@@ -111,13 +192,36 @@ class MQTTClient {
     }
   }
 
+  _processDeviceRemoved(deviceId) {
+    delete this.deviceOnline[deviceId];
+    const prefix = `iot/device/${deviceId}/`;
+    Object.keys(this.lastMessages)
+      .filter((topic) => topic.startsWith(prefix))
+      .forEach((topic) => delete this.lastMessages[topic]);
+    this.removeCallbacks.forEach((callback) => callback(deviceId));
+  }
+
   _processDevicesStatus(statuses) {
     // Dla każdego urządzenia, symuluj wiadomości MQTT dla subskrybowanych tematów
     Object.entries(statuses).forEach(([deviceId, status]) => {
+      // Stan połączenia urządzenia (wysyłany przy przejściu online/offline)
+      if (status.online !== undefined && status.online !== null) {
+        this.deviceOnline[deviceId] = status.online;
+        this.onlineCallbacks.forEach((callback) => callback(deviceId, status.online));
+      }
+
       // Podstawowy temat statusu
       const statusTopic = `iot/device/${deviceId}/status`;
-      
-      if (this.subscriptions[statusTopic] && status.status !== null) {
+
+      if (status.status !== null && status.status !== undefined) {
+        this.lastMessages[statusTopic] = status.status;
+      }
+
+      if (
+        this.subscriptions[statusTopic] &&
+        status.status !== null &&
+        status.status !== undefined
+      ) {
         this.subscriptions[statusTopic](status.status, statusTopic);
       }
       
@@ -125,6 +229,7 @@ class MQTTClient {
       if (status.values) {
         Object.entries(status.values).forEach(([valueName, value]) => {
           const valueTopic = `iot/device/${deviceId}/value/${valueName}`;
+          this.lastMessages[valueTopic] = value;
           if (this.subscriptions[valueTopic]) {
             this.subscriptions[valueTopic](value, valueTopic);
           }
@@ -0,0 +1,37 @@
+# tests/conftest.py - Wspólna konfiguracja testów (uruchamianie: python -m pytest z katalogu api)
+import os
+import shutil
+import sys
+
+import pytest
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Moduły aplikacji importowane jak w app.py (from modules...)
+sys.path.insert(0, API_DIR)
+
+
+@pytest.fixture(scope="session")
+def application(tmp_path_factory):
+    # Aplikacja czyta konfigurację przy imporcie - ścieżki tymczasowe
+    # muszą być ustawione wcześniej (połączenie MQTT nie jest uruchamiane)
+    workdir = tmp_path_factory.mktemp("app")
+    devices_file = str(workdir / "devices.json")
+    shutil.copy(os.path.join(API_DIR, "static", "config", "devices.json"), devices_file)
+    os.environ.update({
+        "DEVICES_FILE": devices_file,
+        "TELEMETRY_DIR": str(workdir / "telemetry"),
+        "LOG_FILE": str(workdir / "logs" / "api.log"),
+        "STATUS_SNAPSHOT_FILE": "",
+        "OUTBOX_FILE": "",
+        "MULTI_WORKER": "0",
+    })
+    os.makedirs(workdir / "logs", exist_ok=True)
+
+    import app
+    return app
+
+
+@pytest.fixture
+def client(application):
+    return application.app.test_client()
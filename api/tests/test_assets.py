@@ -0,0 +1,105 @@
+# tests/test_assets.py
+import gzip
+
+from modules.assets import AssetPipeline, minify_css, minify_js
+
+INDEX_HTML = """<html>
+  <head>
+    <link rel="stylesheet" href="/css/main.css" />
+  </head>
+  <body>
+    <script src="/js/a.js"></script>
+    <script src="/js/b.js"></script>
+  </body>
+</html>
+"""
+
+
+def make_static(tmp_path, a_source="var a = 1;\n"):
+    (tmp_path / "js").mkdir(exist_ok=True)
+    (tmp_path / "css").mkdir(exist_ok=True)
+    (tmp_path / "index.html").write_text(INDEX_HTML, encoding="utf-8")
+    (tmp_path / "js" / "a.js").write_text(a_source, encoding="utf-8")
+    (tmp_path / "js" / "b.js").write_text("// komentarz\nvar b = a + 1;\n", encoding="utf-8")
+    (tmp_path / "css" / "main.css").write_text("/* x */\nbody {\n  color: red;\n}\n", encoding="utf-8")
+    return AssetPipeline(str(tmp_path))
+
+
+class Accept(dict):
+    # Zamiennik request.accept_encodings - brak kodowania oznacza 0
+    def __getitem__(self, key):
+        return self.get(key, 0)
+
+
+def test_minify_js_keeps_strings_templates_and_regexes():
+    source = (
+        "// komentarz\n"
+        "function f(a, b) {\n"
+        "    /* blok */\n"
+        "    const s = \"a  // b\";\n"
+        "    const t = `x ${a + `y ${b}`}  z`;\n"
+        "    return /a\\/b  c/.test(s) ? a / b : a + +b;\n"
+        "}\n"
+    )
+
+    assert minify_js(source) == (
+        "function f(a,b){\n"
+        "const s=\"a  // b\";\n"
+        "const t=`x ${a+`y ${b}`}  z`;\n"
+        "return/a\\/b  c/.test(s)?a/b:a+ +b;\n"
+        "}\n"
+    )
+
+
+def test_minify_css_keeps_strings():
+    assert minify_css('/* x */ a > b {\n  content: "a  b";\n}\n') == 'a>b{content: "a  b"}\n'
+
+
+def test_build_bundles_scripts_in_order_and_rewrites_index(tmp_path):
+    pipeline = make_static(tmp_path)
+    manifest = pipeline.build()
+
+    bundle = manifest["/js/a.js"]
+    assert manifest["/js/b.js"] == bundle
+    assert bundle.startswith("/dist/app.") and manifest["/css/main.css"].startswith("/dist/main.")
+    html = pipeline.index_html.decode("utf-8")
+    assert html.count("<script") == 1 and f'src="{bundle}"' in html
+    assert f'href="{manifest["/css/main.css"]}"' in html
+
+    name = bundle.rsplit("/", 1)[1]
+    data = (tmp_path / "dist" / name).read_bytes()
+    assert data == b"var a=1;\n;\nvar b=a+1;\n"
+    assert gzip.decompress((tmp_path / "dist" / f"{name}.gz").read_bytes()) == data
+
+
+def test_bundle_name_changes_only_with_content(tmp_path):
+    first = make_static(tmp_path).build()["/js/a.js"]
+    assert make_static(tmp_path).build()["/js/a.js"] == first
+    assert make_static(tmp_path, "var a = 2;\n").build()["/js/a.js"] != first
+
+
+def test_find_selects_precompressed_variant(tmp_path):
+    pipeline = make_static(tmp_path)
+    name = pipeline.build()["/js/a.js"].rsplit("/", 1)[1]
+
+    assert pipeline.find(name, Accept(gzip=1)) == (f"{name}.gz", "gzip", "text/javascript")
+    assert pipeline.find(name, Accept()) == (name, None, "text/javascript")
+    assert pipeline.find("missing.js", Accept(gzip=1)) is None
+
+
+def test_dist_endpoint_serves_immutable_bundles(client, application, tmp_path, monkeypatch):
+    pipeline = make_static(tmp_path)
+    bundle = pipeline.build()["/js/a.js"]
+    monkeypatch.setattr(application, "assets", pipeline)
+
+    response = client.get(bundle, headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "immutable" in response.headers["Cache-Control"]
+    assert "Accept-Encoding" in response.headers["Vary"]
+    response.close()
+
+    index = client.get("/")
+    assert index.data == pipeline.index_html
+    assert client.get("/", headers={"If-None-Match": index.headers["ETag"]}).status_code == 304
+    assert client.get("/dist/missing.js").status_code == 404
@@ -0,0 +1,76 @@
+# tests/test_command_scheduler.py
+import threading
+import time
+
+from modules.command_scheduler import CommandScheduler
+from modules.outbox import QUEUED
+
+
+class RecordingClient:
+    def __init__(self):
+        self.sent = []
+        self.published = threading.Event()
+
+    def publish_many(self, messages, device_ids=None):
+        self.sent.extend((topic, message) for topic, message, _ in messages)
+        self.published.set()
+        return [True] * len(messages)
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_first_command_is_sent_and_later_ones_coalesce():
+    client = RecordingClient()
+    scheduler = CommandScheduler(client, min_interval=0.1)
+    try:
+        assert scheduler.publish("lamp/command", "10") is True
+        assert scheduler.publish("lamp/command", "20") == QUEUED
+        assert scheduler.publish("lamp/command", "30") == QUEUED
+        assert client.sent == [("lamp/command", "10")]
+
+        # Po upływie odstępu wysyłana jest tylko ostatnia wartość
+        assert wait_for(lambda: len(client.sent) == 2)
+        time.sleep(0.15)
+        assert client.sent == [("lamp/command", "10"), ("lamp/command", "30")]
+    finally:
+        scheduler.close()
+
+
+def test_rate_limit_is_per_topic():
+    client = RecordingClient()
+    scheduler = CommandScheduler(client, min_interval=10)
+    try:
+        results = scheduler.publish_many([("a", "1", None), ("b", "1", None), ("a", "2", None)])
+        assert results == [True, True, QUEUED]
+        assert client.sent == [("a", "1"), ("b", "1")]
+    finally:
+        scheduler.close()
+    # Zamknięcie wysyła oczekującą komendę od razu
+    assert client.sent[-1] == ("a", "2")
+
+
+def test_flush_sends_pending_commands_immediately():
+    client = RecordingClient()
+    scheduler = CommandScheduler(client, min_interval=10)
+    try:
+        scheduler.publish("a", "1")
+        scheduler.publish("a", "2")
+        scheduler.flush()
+        assert client.sent == [("a", "1"), ("a", "2")]
+    finally:
+        scheduler.close()
+    assert len(client.sent) == 2
+
+
+def test_zero_interval_passes_commands_through():
+    client = RecordingClient()
+    scheduler = CommandScheduler(client, min_interval=0)
+
+    assert scheduler.publish_many([("a", "1", None), ("a", "2", None)]) == [True, True]
+    assert client.sent == [("a", "1"), ("a", "2")]
+    scheduler.close()
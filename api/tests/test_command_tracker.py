@@ -0,0 +1,68 @@
+# tests/test_command_tracker.py
+import pytest
+
+from modules.command_tracker import CommandTracker, LatencyHistogram
+
+
+def test_histogram_percentiles_stay_within_observed_range():
+    histogram = LatencyHistogram()
+    for value in (0.002, 0.003, 0.004, 0.2):
+        histogram.observe(value)
+
+    assert histogram.percentile(50) == pytest.approx(0.003, abs=0.001)
+    assert 0.1 <= histogram.percentile(99) <= 0.2
+    summary = histogram.summary()
+    assert summary["count"] == 4 and summary["max_ms"] == 200.0
+    assert LatencyHistogram().summary()["p50_ms"] is None
+
+
+def test_round_trip_closes_pending_commands_on_device_message():
+    tracker = CommandTracker(timeout=10)
+    tracker.command_sent("lamp", mid=1)
+    tracker.command_sent("lamp", mid=2)
+
+    tracker.on_device_message("lamp", "availability")
+    assert tracker.stats()["devices"]["lamp"]["pending"] == 2
+    tracker.on_device_message("lamp", "status")
+
+    stats = tracker.stats()
+    assert stats["devices"]["lamp"]["pending"] == 0
+    assert stats["devices"]["lamp"]["round_trip"]["count"] == 2
+    assert stats["fleet"]["round_trip"]["count"] == 2
+
+
+def test_publish_ack_is_correlated_by_mid_in_either_order():
+    tracker = CommandTracker(timeout=1000)
+    tracker.command_sent("lamp", mid=1)
+    tracker.publish_acked(1)
+    # Potwierdzenie z wątku sieciowego przed rejestracją komendy
+    tracker.publish_acked(2)
+    tracker.command_sent("fan", mid=2)
+    tracker.publish_acked(3)  # publikacja, która nie jest komendą
+
+    stats = tracker.stats()
+    assert stats["devices"]["lamp"]["publish_ack"]["count"] == 1
+    assert stats["devices"]["fan"]["publish_ack"]["count"] == 1
+    assert stats["fleet"]["in_flight"] == 0
+
+
+def test_unanswered_commands_time_out_and_failures_are_counted():
+    tracker = CommandTracker(timeout=0.0, max_pending=2)
+    tracker.command_sent("lamp", sent_at=0.0)
+    tracker.command_sent("lamp", published=False)
+
+    stats = tracker.stats()["devices"]["lamp"]
+    assert stats["timeouts"] == 1 and stats["pending"] == 0
+    assert stats["publish_failures"] == 1
+
+    tracker.on_status_change("lamp", None)
+    assert "lamp" not in tracker.stats()["devices"]
+
+
+def test_pending_limit_counts_dropped_commands_as_timeouts():
+    tracker = CommandTracker(timeout=1000, max_pending=2)
+    for _ in range(3):
+        tracker.command_sent("lamp")
+
+    stats = tracker.stats()["devices"]["lamp"]
+    assert stats["pending"] == 2 and stats["timeouts"] == 1
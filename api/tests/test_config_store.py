@@ -0,0 +1,134 @@
+# tests/test_config_store.py
+import json
+import threading
+import time
+
+from modules.config_store import ConfigStore, apply_mutation, diff_configuration
+
+
+def make_store(tmp_path, state):
+    path = str(tmp_path / "devices.json")
+    store = ConfigStore(path, snapshot_provider=lambda: state, fsync=False)
+    return store, path
+
+
+def test_load_creates_empty_configuration(tmp_path):
+    store, path = make_store(tmp_path, {})
+
+    assert store.load() == {"devices": [], "rooms": []}
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f) == {"devices": [], "rooms": []}
+
+
+def test_journal_is_replayed_on_load(tmp_path):
+    state = {"devices": [], "rooms": []}
+    store, path = make_store(tmp_path, state)
+    store.load()
+
+    applied = []
+    store.append({"op": "put_device", "data": {"id": "lamp", "name": "Lampa"}}, applied.append)
+    store.append({"op": "put_room", "data": {"id": "kitchen"}})
+    store.append({"op": "put_device", "data": {"id": "lamp", "name": "Lampka"}})
+    store.append({"op": "delete_room", "id": "kitchen"})
+    assert len(applied) == 1
+
+    # Nowa instancja odtwarza stan z pliku JSON i dziennika
+    config = ConfigStore(path, fsync=False).load()
+    assert config["devices"] == [{"id": "lamp", "name": "Lampka"}]
+    assert config["rooms"] == []
+
+
+def test_compact_writes_snapshot_and_clears_journal(tmp_path):
+    state = {"devices": [{"id": "lamp"}], "rooms": []}
+    store, path = make_store(tmp_path, state)
+    store.load()
+    store.append({"op": "put_device", "data": {"id": "lamp"}})
+
+    assert store.compact()
+    assert not (tmp_path / "devices.json.journal").exists()
+    assert not (tmp_path / "devices.json.journal.1").exists()
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f) == state
+
+
+def test_append_during_compaction_waits_for_the_snapshot(tmp_path):
+    state = {"devices": [{"id": "lamp"}], "rooms": []}
+    store, path = make_store(tmp_path, state)
+    store.load()
+    store.append({"op": "put_device", "data": {"id": "lamp"}})
+
+    writing = threading.Event()
+    write_snapshot = store._write_snapshot
+    order = []
+
+    def slow_write(config):
+        writing.set()
+        time.sleep(0.1)
+        write_snapshot(config)
+        order.append("snapshot")
+
+    def append():
+        writing.wait(5)
+        store.append({"op": "put_device", "data": {"id": "fan"}})
+        order.append("append")
+
+    store._write_snapshot = slow_write
+    thread = threading.Thread(target=append)
+    thread.start()
+    assert store.compact()
+    thread.join(5)
+
+    assert order == ["snapshot", "append"]
+    assert store._journal_entries == 1
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f) == state
+    assert ConfigStore(path, fsync=False).load()["devices"] == [{"id": "lamp"}, {"id": "fan"}]
+
+
+def test_reload_skips_own_writes_and_applies_external_edits(tmp_path):
+    state = {"devices": [], "rooms": []}
+    store, path = make_store(tmp_path, state)
+    store.load()
+    store.compact()
+
+    assert store.reload(lambda config: "applied") is None
+
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"devices": [{"id": "fan"}], "rooms": []}, f)
+    assert store.reload(lambda config: config["devices"]) == [{"id": "fan"}]
+
+
+def test_apply_mutation_ignores_unknown_operations():
+    config = {"devices": [{"id": "a"}]}
+    apply_mutation(config, {"op": "rename_device", "id": "a"})
+    apply_mutation(config, {"id": "a"})
+    assert config == {"devices": [{"id": "a"}]}
+
+
+def test_diff_configuration_reports_added_changed_and_removed_items():
+    current = {
+        "devices": [{"id": "a", "name": "A"}, {"id": "b", "name": "B"}],
+        "rooms": [{"id": "kitchen"}],
+    }
+    config = {
+        "devices": [{"id": "b", "name": "B2"}, {"id": "c", "name": "C"}, {"id": "a", "name": "A"}],
+        "rooms": [{"id": "kitchen"}],
+        "scenes": [{"id": "night"}],
+    }
+
+    mutations = diff_configuration(current, config)
+
+    assert mutations == [
+        {"op": "put_device", "data": {"id": "b", "name": "B2"}},
+        {"op": "put_device", "data": {"id": "c", "name": "C"}},
+        {"op": "put_scene", "data": {"id": "night"}},
+    ]
+    assert diff_configuration(config, current) == [
+        {"op": "delete_device", "id": "c"},
+        {"op": "put_device", "data": {"id": "b", "name": "B"}},
+        {"op": "delete_scene", "id": "night"},
+    ]
+
+    for mutation in mutations:
+        apply_mutation(current, mutation)
+    assert diff_configuration(current, config) == []
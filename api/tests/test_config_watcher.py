@@ -0,0 +1,130 @@
+# tests/test_config_watcher.py
+import json
+import logging
+import os
+
+from modules.config_watcher import ConfigWatcher
+from modules.device_manager import DeviceManager
+from modules.mqtt_client import MQTTClient
+
+LAMP = {"id": "lamp", "name": "Lampa", "type": "switch", "room": "kitchen", "topic": "iot/device/lamp"}
+FAN = {"id": "fan", "name": "Wiatrak", "type": "fan", "room": "kitchen", "topic": "iot/device/fan"}
+
+
+def write_config(path, devices):
+    path.write_text(json.dumps({"devices": devices, "rooms": []}), encoding="utf-8")
+    # Ten sam czas modyfikacji przy szybkich zapisach - wymuś nowy podpis
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+class RecordingPahoClient:
+    def __init__(self):
+        self.calls = []
+
+    def subscribe(self, topic):
+        self.calls.append(("subscribe", topic))
+
+    def unsubscribe(self, topic):
+        self.calls.append(("unsubscribe", topic))
+
+
+def test_check_calls_on_change_once_per_file_change(tmp_path):
+    path = tmp_path / "devices.json"
+    write_config(path, [LAMP])
+    calls = []
+    watcher = ConfigWatcher(str(path), lambda: calls.append(1) or [])
+
+    assert watcher.check() is False
+    write_config(path, [LAMP, FAN])
+    assert watcher.check() is True
+    assert watcher.check() is False
+    assert calls == [1]
+
+
+def test_failed_reload_is_reported_once(tmp_path):
+    path = tmp_path / "devices.json"
+    write_config(path, [LAMP])
+    calls = []
+
+    def on_change():
+        calls.append(1)
+        raise ValueError("niepoprawny JSON")
+
+    watcher = ConfigWatcher(str(path), on_change)
+    write_config(path, [FAN])
+
+    assert watcher.check() is True
+    assert watcher.check() is False
+    assert calls == [1]
+
+
+def test_external_edit_applies_only_the_difference(tmp_path):
+    path = tmp_path / "devices.json"
+    other = {"id": "heater", "name": "Grzejnik", "type": "heater", "room": "hall", "topic": "home/heater"}
+    write_config(path, [LAMP, other])
+    manager = DeviceManager({"DEVICES_FILE": str(path), "CONFIG_FSYNC": False})
+    mqtt_client = MQTTClient("localhost", 1883, "", "", 60, logging.getLogger("tests.watcher"))
+    mqtt_client.client = RecordingPahoClient()
+    mqtt_client.set_device_manager(manager)
+    mqtt_client.sync_device_subscriptions()
+    mqtt_client.client.calls.clear()
+    manager.update_device_status_from_mqtt("iot/device/lamp/status", "on")
+    mutations = []
+    manager.add_registry_listener(mutations.append)
+    watcher = ConfigWatcher(str(path), manager.reload_configuration)
+
+    write_config(path, [dict(LAMP, name="Lampa sufitowa"), FAN])
+    assert watcher.check() is True
+
+    assert sorted((m["op"], m.get("id") or m["data"]["id"]) for m in mutations) == [
+        ("delete_device", "heater"), ("put_device", "fan"), ("put_device", "lamp"),
+    ]
+    assert manager.get_device("lamp")["name"] == "Lampa sufitowa"
+    assert manager.get_device_status("lamp")["status"] == "on"
+    assert manager.get_device("heater") is None
+    # Filtry iot/device/+/... są nadal używane - anulowane tylko home/+/...
+    assert sorted(mqtt_client.client.calls) == [
+        ("unsubscribe", "home/+/availability"),
+        ("unsubscribe", "home/+/status"),
+        ("unsubscribe", "home/+/value/#"),
+    ]
+    manager.close()
+
+
+def test_invalid_edit_keeps_current_configuration(tmp_path):
+    path = tmp_path / "devices.json"
+    write_config(path, [LAMP])
+    manager = DeviceManager({"DEVICES_FILE": str(path), "CONFIG_FSYNC": False})
+
+    write_config(path, [dict(LAMP, valueTopics=["x"]), FAN])
+
+    assert manager.reload_configuration() == []
+    assert manager.get_device("fan") is None
+    assert manager.get_device("lamp") == LAMP
+    manager.close()
+
+
+def test_external_edit_discards_the_pending_journal(tmp_path):
+    path = tmp_path / "devices.json"
+    journal = tmp_path / "devices.json.journal"
+    write_config(path, [LAMP])
+    manager = DeviceManager({"DEVICES_FILE": str(path), "CONFIG_FSYNC": False})
+    assert manager.add_device(FAN)[0]
+    assert journal.exists()
+
+    # Błędna edycja nie usuwa zmian czekających w dzienniku
+    write_config(path, [dict(LAMP, valueTopics=["x"])])
+    assert manager.reload_configuration() == []
+    assert journal.exists() and manager.get_device("fan") == FAN
+
+    # Plik bez wiatraka - usunięte urządzenie nie może wrócić z dziennika
+    write_config(path, [LAMP])
+    assert [m["op"] for m in manager.reload_configuration()] == ["delete_device"]
+    assert not journal.exists()
+    assert manager.get_device("fan") is None
+
+    restarted = DeviceManager({"DEVICES_FILE": str(path), "CONFIG_FSYNC": False})
+    assert restarted.get_all_devices() == [LAMP]
+    manager.close()
+    assert json.loads(path.read_text(encoding="utf-8"))["devices"] == [LAMP]
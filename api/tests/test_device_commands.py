@@ -0,0 +1,97 @@
+# tests/test_device_commands.py
+import json
+
+from modules.device_manager import DeviceManager
+
+DEVICES = [
+    {"id": "lamp", "name": "Lampa", "type": "switch", "room": "kitchen", "topic": "iot/device/lamp"},
+    {"id": "fan", "name": "Wiatrak", "type": "fan", "room": "kitchen", "topic": "iot/device/fan", "qos": 1},
+    {"id": "tv", "name": "TV", "type": "switch", "room": "living_room", "topic": "iot/device/tv"},
+]
+
+
+class RecordingClient:
+    def __init__(self, fail=()):
+        self.calls = []
+        self.fail = set(fail)
+
+    def publish_many(self, messages, device_ids=None):
+        self.calls.append((messages, device_ids))
+        return [device_id not in self.fail for device_id in device_ids]
+
+
+def make_manager(tmp_path):
+    path = tmp_path / "devices.json"
+    path.write_text(json.dumps({"devices": DEVICES, "rooms": []}), encoding="utf-8")
+    return DeviceManager({"DEVICES_FILE": str(path), "CONFIG_FSYNC": False, "MQTT_QOS": 0})
+
+
+def test_batch_resolves_targets_and_publishes_in_one_pass(tmp_path):
+    manager = make_manager(tmp_path)
+    client = RecordingClient()
+
+    results = manager.send_commands([
+        {"room": "kitchen", "command": "off"},
+        {"type": "switch", "room": "living_room", "command": {"power": True}},
+        {"device_ids": ["lamp", "missing"], "command": "on"},
+        {"device_id": "lamp"},
+    ], client)
+
+    assert len(client.calls) == 1
+    messages, device_ids = client.calls[0]
+    assert device_ids == ["lamp", "fan", "tv"]
+    assert messages[1] == ("iot/device/fan/command", "off", 1, None)
+    assert messages[2] == ("iot/device/tv/command", '{"power": true}', 0, None)
+    assert results[0] == {"index": 0, "success": True, "devices": {"lamp": "delivered", "fan": "delivered"}}
+    assert results[1]["devices"] == {"tv": "delivered"}
+    assert results[2] == {"index": 2, "success": False, "error": "Nieznane urządzenia: missing"}
+    assert results[3] == {"index": 3, "success": False, "error": "Brak komendy"}
+
+
+def test_failed_device_marks_only_its_item_as_failed(tmp_path):
+    manager = make_manager(tmp_path)
+
+    results = manager.send_commands([
+        {"room": "kitchen", "command": "off"},
+        {"device_id": "tv", "command": "off"},
+    ], RecordingClient(fail={"fan"}))
+
+    assert results[0]["success"] is False and results[0]["devices"]["fan"] == "failed"
+    assert results[1]["success"] is True
+
+
+def test_scenes_are_validated_stored_and_activated(tmp_path):
+    manager = make_manager(tmp_path)
+    client = RecordingClient()
+
+    success, message = manager.add_scene({"id": "night", "name": "Noc", "commands": [{"command": "off"}]})
+    assert not success and "Brak celu komendy" in message
+    assert manager.add_scene({"id": "night", "name": "Noc", "commands": []}) == (False, "Brak listy komend")
+
+    scene = {"id": "night", "name": "Noc", "commands": [{"type": "switch", "command": "off"}]}
+    assert manager.add_scene(scene)[0]
+    results = manager.activate_scene("night", client)
+
+    assert results == [{"index": 0, "success": True, "devices": {"lamp": "delivered", "tv": "delivered"}}]
+    assert manager.activate_scene("missing", client) is None
+    manager.close()
+    reloaded = DeviceManager({"DEVICES_FILE": str(tmp_path / "devices.json")})
+    assert reloaded.get_scene("night") == scene
+
+
+def test_batch_and_scene_endpoints(client):
+    response = client.post("/api/devices/commands", json={"commands": [
+        {"room": "living_room", "command": "off"},
+        {"device_id": "missing", "command": "off"},
+    ]})
+    data = response.get_json()
+    assert response.status_code == 200 and data["status"] == "partial"
+    assert not data["results"][1]["success"]
+    assert client.post("/api/devices/commands", json={"commands": []}).status_code == 400
+
+    scene = {"id": "all_off", "name": "Wszystko", "commands": [{"room": "living_room", "command": "off"}]}
+    assert client.post("/api/scenes", json=scene).status_code == 200
+    assert any(item["id"] == "all_off" for item in client.get("/api/scenes").get_json())
+    assert client.post("/api/scene/all_off/activate").get_json()["status"] == "ok"
+    assert client.post("/api/scene/missing/activate").status_code == 404
+    assert client.delete("/api/scene/all_off").status_code == 200
@@ -0,0 +1,45 @@
+# tests/test_device_history_api.py
+import pytest
+
+
+def record(application, device_id, value_name, points):
+    for timestamp, value in points:
+        application.history.on_status_change(device_id, {"last_seen": timestamp, "values": {value_name: value}})
+
+
+def test_history_is_downsampled_into_buckets(client, application):
+    record(application, "status_panel", "security", [(1000.0, 1), (1001.0, 3), (1010.0, 5)])
+
+    response = client.get("/api/device/status_panel/history?value=security&from=1000&to=1020&step=10")
+    data = response.get_json()
+
+    assert response.status_code == 200
+    assert data["step"] == 10
+    assert [(point["count"], point["min"], point["max"]) for point in data["points"][:2]] == [(2, 1, 3), (1, 5, 5)]
+
+
+@pytest.mark.parametrize("query", [
+    "from=nan", "to=nan", "step=nan", "step=inf", "from=-inf", "from=2000&to=1000",
+])
+def test_non_finite_or_inverted_range_is_rejected(client, query):
+    response = client.get(f"/api/device/status_panel/history?value=security&{query}")
+
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "Nieprawidłowy zakres czasu"
+
+
+def test_unknown_device_and_missing_value_name(client):
+    assert client.get("/api/device/unknown/history?value=x").status_code == 404
+    response = client.get("/api/device/status_panel/history")
+    assert response.status_code == 400 and "values" in response.get_json()
+
+
+def test_zero_timestamps_are_not_replaced_by_defaults(client, application):
+    record(application, "status_panel", "epoch", [(5.0, 2)])
+
+    data = client.get("/api/device/status_panel/history?value=epoch&from=0&to=20&step=10").get_json()
+    assert (data["from"], data["to"]) == (0, 20)
+    assert [(point["t"], point["count"]) for point in data["points"]] == [(0, 1)]
+
+    data = client.get("/api/device/status_panel/history?value=epoch&from=-100&to=0").get_json()
+    assert (data["from"], data["to"]) == (-100, 0)
@@ -0,0 +1,116 @@
+# tests/test_device_manager.py
+import json
+import threading
+import time
+
+from modules.device_manager import DeviceManager
+
+LAMP = {"id": "lamp", "name": "Lampa", "type": "switch", "room": "kitchen", "topic": "iot/device/lamp"}
+
+
+def make_manager(tmp_path, devices=(LAMP,)):
+    path = tmp_path / "devices.json"
+    if devices is not None:
+        path.write_text(json.dumps({"devices": list(devices), "rooms": []}), encoding="utf-8")
+    return DeviceManager({"DEVICES_FILE": str(path), "CONFIG_FSYNC": False}), path
+
+
+def test_invalid_device_is_rejected_before_it_reaches_the_journal(tmp_path):
+    manager, path = make_manager(tmp_path)
+
+    for bad in ({"valueTopics": ["x"]}, {"valueTopics": {"t": 5}}, {"room": ["a"]},
+                {"payloads": {"t": {"deadband": "x"}}}):
+        success, _ = manager.update_device("lamp", dict(LAMP, **bad))
+        assert not success
+    success, _ = manager.add_device({"id": "fan", "name": "Wiatrak", "type": "fan", "room": {}})
+    assert not success
+
+    assert manager.get_device("lamp")["room"] == "kitchen"
+    assert manager.get_devices_in_room("kitchen") == [manager.get_device("lamp")]
+    assert not (tmp_path / "devices.json.journal").exists()
+    manager.close()
+    assert DeviceManager({"DEVICES_FILE": str(path)}).get_all_devices() == [LAMP]
+
+
+def test_failed_apply_is_removed_from_the_journal(tmp_path):
+    manager, path = make_manager(tmp_path)
+
+    def fail(mutation):
+        raise ValueError("błąd")
+
+    assert manager.store.append({"op": "put_device", "data": dict(LAMP, name="X")}, apply=fail) is False
+    assert manager.store.append({"op": "put_room", "data": {"id": "kitchen"}}, apply=lambda m: None)
+    reloaded = DeviceManager({"DEVICES_FILE": str(path), "CONFIG_FSYNC": False})
+    assert reloaded.get_device("lamp")["name"] == "Lampa"
+
+
+def test_failed_load_never_overwrites_the_configuration(tmp_path):
+    path = tmp_path / "devices.json"
+    original = json.dumps({"devices": [dict(LAMP, valueTopics=["x"])], "rooms": []})
+    path.write_text(original, encoding="utf-8")
+
+    manager = DeviceManager({"DEVICES_FILE": str(path), "CONFIG_FSYNC": False})
+    assert manager.get_all_devices() == []
+    success, _ = manager.add_device({"id": "fan", "name": "Wiatrak", "type": "fan"})
+    assert not success
+    manager.close()
+
+    assert path.read_text(encoding="utf-8") == original
+    assert not (tmp_path / "devices.json.journal").exists()
+
+
+def test_offline_on_status_topic_updates_status_immediately(tmp_path):
+    manager, _ = make_manager(tmp_path)
+    changes = []
+    manager.add_status_listener(lambda device_id, change: changes.append(change))
+
+    manager.update_device_status_from_mqtt("iot/device/lamp/status", "on")
+    manager.update_device_status_from_mqtt("iot/device/lamp/status", "OFFLINE")
+
+    status = manager.get_device_status("lamp")
+    assert status["status"] == "offline" and status["online"] is False
+    assert changes[-1] == {"last_seen": status["last_seen"], "status": "offline", "online": False}
+    assert "lamp" not in manager.liveness
+
+
+def test_offline_on_availability_topic_keeps_last_status(tmp_path):
+    manager, _ = make_manager(tmp_path)
+
+    manager.update_device_status_from_mqtt("iot/device/lamp/status", "on")
+    manager.update_device_status_from_mqtt("iot/device/lamp/availability", "offline")
+
+    status = manager.get_device_status("lamp")
+    assert status["status"] == "on" and status["online"] is False
+
+
+def test_liveness_expiry_during_ingest_is_notified_after_it(tmp_path):
+    manager, _ = make_manager(tmp_path)
+    ingest_notified = threading.Event()
+    release = threading.Event()
+    events = []
+
+    def slow_listener(device_id, changes):
+        # Wiadomość z brokera: wstrzymaj powiadamianie, aż wygaśnie termin
+        if changes.get("online"):
+            ingest_notified.set()
+            release.wait(5)
+
+    manager.add_status_listener(slow_listener)
+    manager.add_status_listener(
+        lambda device_id, changes: events.append((changes.get("online"), manager.get_device_version(device_id)))
+    )
+
+    ingest = threading.Thread(target=manager.update_device_status_from_mqtt, args=("iot/device/lamp/status", "on"))
+    ingest.start()
+    assert ingest_notified.wait(5)
+    expiry = threading.Thread(target=manager._on_liveness_expired, args=("lamp",))
+    expiry.start()
+    time.sleep(0.1)
+    release.set()
+    ingest.join(5)
+    expiry.join(5)
+    manager.close()
+
+    assert [online for online, _ in events] == [True, False]
+    assert events[0][1] < events[1][1] == manager.get_device_version("lamp")
+    assert manager.get_device_status("lamp")["online"] is False
@@ -0,0 +1,104 @@
+# tests/test_device_registry.py
+import threading
+
+import pytest
+
+from modules.device_registry import DeviceRegistry
+
+LAMP = {
+    "id": "lamp",
+    "type": "switch",
+    "room": "kitchen",
+    "topic": "iot/device/lamp",
+}
+SENSOR = {
+    "id": "sensor",
+    "type": "sensor",
+    "room": "kitchen",
+    "topic": "home/garden/sensor",
+    "valueTopics": {"temperature": "temp", "humidity": "value/humidity"},
+}
+
+
+def test_indexes_by_id_room_and_type():
+    registry = DeviceRegistry([LAMP, SENSOR])
+
+    assert len(registry) == 2 and "lamp" in registry
+    assert registry.get("sensor")["topic"] == "home/garden/sensor"
+    assert [device["id"] for device in registry.by_room("kitchen")] == ["lamp", "sensor"]
+    assert [device["id"] for device in registry.by_type("sensor")] == ["sensor"]
+    assert registry.by_room("attic") == []
+
+
+def test_resolve_topic_for_status_values_and_legacy_topics():
+    registry = DeviceRegistry([LAMP, SENSOR])
+
+    def resolved(topic):
+        entry = registry.resolve_topic(topic)
+        return entry and (entry[0]["id"], entry[1], entry[2])
+
+    assert resolved("iot/device/lamp/status") == ("lamp", "status", None)
+    assert resolved("home/garden/sensor/availability") == ("sensor", "availability", None)
+    assert resolved("home/garden/sensor/temp") == ("sensor", "value", "temperature")
+    assert resolved("home/garden/sensor/value/humidity") == ("sensor", "value", "humidity")
+    assert resolved("home/garden/sensor/value/pressure") == ("sensor", "value", "pressure")
+    # Zgodność wsteczna: iot/device/<id>/... dla urządzenia o innym temacie
+    assert resolved("iot/device/sensor/status") == ("sensor", "status", None)
+    assert resolved("iot/device/unknown/status") is None
+    assert resolved("home/garden/sensor/command") is None
+
+
+def test_put_replaces_device_and_reindexes():
+    registry = DeviceRegistry([LAMP])
+    previous = registry.put(dict(LAMP, room="hall", topic="iot/device/lamp2"))
+
+    assert previous["room"] == "kitchen"
+    assert registry.by_room("kitchen") == []
+    assert [device["id"] for device in registry.by_room("hall")] == ["lamp"]
+    assert registry.resolve_topic("iot/device/lamp2/status")[0]["id"] == "lamp"
+
+
+def test_invalid_definition_is_rejected_without_changing_indexes():
+    registry = DeviceRegistry([LAMP])
+
+    for bad in ({"valueTopics": ["x"]}, {"valueTopics": {"t": None}}, {"room": ["a"]}, {"id": 7}):
+        with pytest.raises(ValueError):
+            registry.put(dict(LAMP, **bad))
+
+    assert registry.get("lamp") == LAMP
+    assert [device["id"] for device in registry.by_room("kitchen")] == ["lamp"]
+    assert registry.resolve_topic("iot/device/lamp/status")[0] == LAMP
+
+
+def test_remove_drops_all_indexes():
+    registry = DeviceRegistry([LAMP, SENSOR])
+
+    assert registry.remove("sensor")["id"] == "sensor"
+    assert registry.remove("sensor") is None
+    assert registry.resolve_topic("home/garden/sensor/temp") is None
+    assert registry.by_type("sensor") == []
+    assert [device["id"] for device in registry] == ["lamp"]
+
+
+def test_concurrent_changes_keep_indexes_consistent():
+    registry = DeviceRegistry()
+    errors = []
+
+    def churn(offset):
+        try:
+            for i in range(200):
+                device_id = f"dev_{offset}_{i % 10}"
+                registry.put({"id": device_id, "room": "r", "type": "t", "topic": f"iot/device/{device_id}"})
+                registry.by_room("r")
+                registry.remove(device_id)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=churn, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(registry) == 0 and registry.by_room("r") == []
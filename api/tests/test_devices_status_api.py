@@ -0,0 +1,73 @@
+# tests/test_devices_status_api.py
+import os
+import shutil
+
+import pytest
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="module")
+def application(tmp_path_factory):
+    # Aplikacja czyta konfigurację przy imporcie - ścieżki tymczasowe
+    # muszą być ustawione wcześniej (połączenie MQTT nie jest uruchamiane)
+    workdir = tmp_path_factory.mktemp("app")
+    devices_file = str(workdir / "devices.json")
+    shutil.copy(os.path.join(API_DIR, "static", "config", "devices.json"), devices_file)
+    os.environ.update({
+        "DEVICES_FILE": devices_file,
+        "TELEMETRY_DIR": str(workdir / "telemetry"),
+        "LOG_FILE": str(workdir / "logs" / "api.log"),
+        "STATUS_SNAPSHOT_FILE": "",
+        "OUTBOX_FILE": "",
+        "MULTI_WORKER": "0",
+    })
+    os.makedirs(workdir / "logs", exist_ok=True)
+
+    import app
+    return app
+
+
+@pytest.fixture
+def client(application):
+    return application.app.test_client()
+
+
+def first_device(application):
+    return application.device_manager.get_all_devices()[0]
+
+
+def test_full_state_carries_version_etag(client, application):
+    response = client.get("/api/devices/status")
+
+    version = response.headers["X-Status-Version"]
+    assert response.status_code == 200
+    assert response.headers["ETag"] == f'"{version}"'
+    assert int(version) == application.device_manager.status_version
+    assert first_device(application)["id"] in response.get_json()
+
+
+def test_matching_etag_or_current_version_returns_not_modified(client):
+    version = client.get("/api/devices/status").headers["X-Status-Version"]
+
+    response = client.get("/api/devices/status", headers={"If-None-Match": f'"{version}"'})
+    assert response.status_code == 304
+    assert response.headers["X-Status-Version"] == version
+
+    assert client.get(f"/api/devices/status?since={version}").status_code == 304
+
+
+def test_since_returns_only_devices_changed_after_version(client, application):
+    version = int(client.get("/api/devices/status").headers["X-Status-Version"])
+    device = first_device(application)
+    application.device_manager.update_device_status_from_mqtt(f"{device['topic']}/status", "on")
+
+    response = client.get(f"/api/devices/status?since={version}", headers={"If-None-Match": f'"{version}"'})
+    data = response.get_json()
+
+    assert response.status_code == 200
+    assert data["version"] > version
+    assert list(data["devices"]) == [device["id"]]
+    assert data["devices"][device["id"]]["status"] == "on"
+    assert data["removed"] == []
+    assert response.headers["X-Status-Version"] == str(data["version"])
@@ -0,0 +1,100 @@
+# tests/test_ingest_queue.py
+import time
+
+import pytest
+
+from modules.ingest_queue import BLOCK, COALESCE, DROP_OLDEST, IngestQueue
+
+
+def run_queue(queue):
+    # Wątek roboczy opróżnia kolejkę przed zatrzymaniem
+    queue.start()
+    queue.stop()
+
+
+def make_queue(policy, maxsize=2, **kwargs):
+    received = []
+    queue = IngestQueue(lambda batch: received.extend(batch), maxsize=maxsize, policy=policy, **kwargs)
+    return queue, received
+
+
+def test_drop_oldest_discards_oldest_message_when_full():
+    queue, received = make_queue(DROP_OLDEST)
+    for topic in ("a", "b", "c"):
+        assert queue.put(topic, topic.encode())
+
+    run_queue(queue)
+
+    assert [entry[0] for entry in received] == ["b", "c"]
+    assert queue.stats()["dropped"] == 1
+    assert queue.stats()["processed"] == 2
+
+
+def test_coalesce_replaces_pending_message_for_the_same_topic_when_full():
+    queue, received = make_queue(COALESCE)
+    queue.put("a", b"1", timestamp=1)
+    queue.put("b", b"1", timestamp=2)
+    queue.put("a", b"2", timestamp=3)
+
+    run_queue(queue)
+
+    assert [(entry[0], entry[1], entry[3]) for entry in received] == [("a", b"2", 3), ("b", b"1", 2)]
+    assert queue.stats()["coalesced"] == 1
+    assert queue.stats()["dropped"] == 0
+
+
+def test_coalesce_keeps_every_message_below_capacity():
+    queue, received = make_queue(COALESCE, maxsize=3)
+    queue.put("a", b"1")
+    queue.put("a", b"2")
+    queue.put("b", b"1")
+    # Kolejka pełna - zastąpiony zostaje najnowszy wpis tematu
+    queue.put("a", b"3")
+
+    run_queue(queue)
+
+    assert [(entry[0], entry[1]) for entry in received] == [("a", b"1"), ("a", b"3"), ("b", b"1")]
+    assert queue.stats()["coalesced"] == 1
+    assert queue.stats()["dropped"] == 0
+
+
+def test_coalesce_falls_back_to_dropping_oldest_for_new_topics():
+    queue, received = make_queue(COALESCE)
+    for topic in ("a", "b", "c"):
+        queue.put(topic, b"x")
+
+    run_queue(queue)
+
+    assert [entry[0] for entry in received] == ["b", "c"]
+    # Usunięty wpis nie może już przyjmować nowszych wartości
+    assert queue.stats()["dropped"] == 1
+
+
+def test_block_rejects_message_after_timeout_when_full():
+    queue, received = make_queue(BLOCK, maxsize=1, block_timeout=0.05)
+    assert queue.put("a", b"1")
+
+    started = time.monotonic()
+    assert not queue.put("b", b"2")
+    assert time.monotonic() - started >= 0.04
+
+    run_queue(queue)
+    assert [entry[0] for entry in received] == ["a"]
+    assert queue.stats()["dropped"] == 1
+
+
+def test_batches_are_limited_by_batch_size():
+    batches = []
+    queue = IngestQueue(lambda batch: batches.append(len(batch)), maxsize=100, batch_size=3)
+    for i in range(7):
+        queue.put(f"t{i}", b"x")
+
+    run_queue(queue)
+
+    assert sum(batches) == 7
+    assert max(batches) <= 3
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        IngestQueue(lambda batch: None, policy="newest")
@@ -0,0 +1,67 @@
+# tests/test_liveness.py
+import time
+
+from modules.liveness import LivenessMonitor
+
+
+def make_monitor(**kwargs):
+    expired = []
+    return LivenessMonitor(expired.append, tick=0.1, **kwargs), expired
+
+
+def test_device_expires_after_timeout_without_touch():
+    monitor, expired = make_monitor()
+    now = time.monotonic()
+    monitor.touch("lamp", 1.0)
+
+    assert monitor.advance(now + 0.5) == []
+    assert monitor.advance(now + 1.5) == ["lamp"]
+    assert expired == ["lamp"]
+    assert "lamp" not in monitor
+
+
+def test_touch_moves_deadline_forward():
+    monitor, expired = make_monitor()
+    monitor.touch("lamp", 1.0)
+    monitor.touch("lamp", 5.0)
+
+    assert monitor.advance(time.monotonic() + 2.0) == []
+    assert "lamp" in monitor
+    assert monitor.advance(time.monotonic() + 6.0) == ["lamp"]
+
+
+def test_remove_and_zero_timeout_stop_tracking():
+    monitor, expired = make_monitor()
+    monitor.touch("a", 1.0)
+    monitor.touch("b", 1.0)
+    monitor.remove("a")
+    monitor.touch("b", 0)
+
+    assert len(monitor) == 0
+    assert monitor.advance(time.monotonic() + 2.0) == []
+
+
+def test_deadline_beyond_one_wheel_rotation_waits_for_its_turn():
+    # 8 kubełków po 0,1 s - termin po 2 s przypada na trzeci obrót koła
+    monitor, expired = make_monitor(slots=8)
+    now = time.monotonic()
+    monitor.touch("sensor", 2.0)
+
+    for step in range(1, 19):
+        assert monitor.advance(now + step * 0.1) == []
+    assert monitor.advance(now + 2.3) == ["sensor"]
+
+
+def test_expiry_callback_errors_do_not_stop_other_devices():
+    calls = []
+
+    def on_expire(device_id):
+        calls.append(device_id)
+        raise RuntimeError("boom")
+
+    monitor = LivenessMonitor(on_expire, tick=0.1)
+    monitor.touch("a", 0.5)
+    monitor.touch("b", 0.5)
+
+    assert sorted(monitor.advance(time.monotonic() + 1.0)) == ["a", "b"]
+    assert sorted(calls) == ["a", "b"]
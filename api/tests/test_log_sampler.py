@@ -0,0 +1,65 @@
+# tests/test_log_sampler.py
+import time
+
+from modules.log_sampler import MessageLogSampler
+
+
+class RecordingLogger:
+    def __init__(self):
+        self.lines = []
+
+    def info(self, message, stacklevel=1):
+        self.lines.append(message)
+
+
+def test_lines_over_the_limit_are_counted_per_topic():
+    logger = RecordingLogger()
+    sampler = MessageLogSampler(logger, max_per_interval=2, interval=60)
+    for i in range(5):
+        sampler.log("Otrzymano wiadomość z", "a", i)
+    sampler.log("Otrzymano wiadomość z", "b", 0)
+
+    assert logger.lines == [
+        "Otrzymano wiadomość z a: 0", "Otrzymano wiadomość z a: 1", "Otrzymano wiadomość z b: 0"
+    ]
+    sampler.flush()
+    assert logger.lines[-1].startswith("Pominięto 3 wiadomości z 1 tematów") and "a: 3" in logger.lines[-1]
+
+
+def test_next_message_after_the_window_emits_the_summary():
+    logger = RecordingLogger()
+    sampler = MessageLogSampler(logger, max_per_interval=1, interval=0.05)
+    sampler.log("Wysłano wiadomość do", "a", 1)
+    sampler.log("Wysłano wiadomość do", "a", 2)
+    time.sleep(0.06)
+    sampler.log("Wysłano wiadomość do", "a", 3)
+
+    assert logger.lines[1].startswith("Pominięto 1 wiadomości")
+    assert logger.lines[2] == "Wysłano wiadomość do a: 3"
+
+
+def test_summary_is_written_when_traffic_stops():
+    logger = RecordingLogger()
+    sampler = MessageLogSampler(logger, max_per_interval=1, interval=0.05)
+    sampler.start()
+    try:
+        for i in range(4):
+            sampler.log("Otrzymano wiadomość z", "a", i)
+        deadline = time.monotonic() + 2
+        while len(logger.lines) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        sampler.stop()
+
+    assert logger.lines[1].startswith("Pominięto 3 wiadomości")
+    assert len(logger.lines) == 2
+
+
+def test_zero_limit_logs_every_message_without_a_thread():
+    logger = RecordingLogger()
+    sampler = MessageLogSampler(logger, max_per_interval=0)
+    sampler.start()
+    for i in range(3):
+        sampler.log("Otrzymano wiadomość z", "a", i)
+
+    assert len(logger.lines) == 3 and sampler._thread is None
@@ -0,0 +1,69 @@
+# tests/test_metrics.py
+import threading
+
+from modules.metrics import MetricsRegistry
+
+
+def test_counter_sums_threads_including_finished_ones():
+    registry = MetricsRegistry()
+    counter = registry.counter("messages_total", "Wiadomości", labelnames=("kind",))
+
+    def work():
+        for _ in range(1000):
+            counter.inc(labels=("status",))
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    del threads, thread
+    counter.inc(5, labels=("value",))
+
+    assert counter.collect() == {("status",): 4000, ("value",): 5}
+    assert registry.counter("messages_total", "inna") is counter
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("duration_seconds", "Czas", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        histogram.observe(value)
+
+    lines = registry.render().splitlines()
+    assert lines[:2] == ["# HELP duration_seconds Czas", "# TYPE duration_seconds histogram"]
+    assert 'duration_seconds_bucket{le="0.1"} 1' in lines
+    assert 'duration_seconds_bucket{le="1.0"} 3' in lines
+    assert 'duration_seconds_bucket{le="+Inf"} 4' in lines
+    assert "duration_seconds_sum 4.25" in lines
+    assert "duration_seconds_count 4" in lines
+
+
+def test_unlabelled_metrics_are_exported_before_first_write():
+    registry = MetricsRegistry()
+    registry.counter("errors_total", "Błędy")
+
+    assert "errors_total 0" in registry.render().splitlines()
+
+
+def test_gauges_escape_labels_and_failing_gauge_is_skipped():
+    registry = MetricsRegistry()
+    registry.gauge("devices", "Urządzenia", lambda: {('on"line',): 2}, labelnames=("state",))
+    registry.gauge("broken", "Błąd", lambda: 1 / 0)
+    registry.gauge("unavailable", "Brak", lambda: None)
+
+    text = registry.render()
+    assert 'devices{state="on\\"line"} 2' in text
+    assert "broken" not in text
+    assert "# TYPE unavailable gauge" in text
+
+
+def test_metrics_endpoint_exposes_request_durations(client):
+    client.get("/api/status")
+    response = client.get("/metrics")
+    text = response.get_data(as_text=True)
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    assert 'http_request_duration_seconds_count{method="GET",endpoint="/api/status",status="200"}' in text
+    assert "mqtt_connected 0" in text
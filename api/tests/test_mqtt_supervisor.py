@@ -0,0 +1,111 @@
+# tests/test_mqtt_supervisor.py
+import logging
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+
+from modules.mqtt_client import MQTTClient
+
+
+class FlakyPahoClient:
+    # Broker odrzuca pierwsze `failures` połączeń, potem przyjmuje
+    def __init__(self, owner, failures):
+        self.owner = owner
+        self.failures = failures
+        self.attempts = []
+        self.subscribed = []
+        self.closed = threading.Event()
+
+    def connect(self, host, port, keepalive):
+        self.attempts.append(time.monotonic())
+        if len(self.attempts) <= self.failures:
+            raise ConnectionRefusedError("broker niedostępny")
+        self.owner._on_connect(self, None, {}, 0)
+
+    def loop(self, timeout=1.0):
+        if self.closed.wait(0.01):
+            return mqtt.MQTT_ERR_NO_CONN
+        return mqtt.MQTT_ERR_SUCCESS
+
+    def subscribe(self, topics):
+        self.subscribed.append(topics)
+        return mqtt.MQTT_ERR_SUCCESS, 7
+
+    def disconnect(self):
+        self.closed.set()
+
+
+def make_client(failures=0, topics=()):
+    client = MQTTClient(
+        "localhost", 1883, "", "", 60, logging.getLogger("tests.supervisor"),
+        reconnect_min_delay=0.02, reconnect_max_delay=0.05,
+    )
+    client.client = FlakyPahoClient(client, failures)
+    client.topics = set(topics)
+    return client
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_reconnect_delay_is_exponential_with_jitter_and_capped():
+    client = MQTTClient("localhost", 1883, "", "", 60, logging.getLogger("tests.supervisor"),
+                        reconnect_min_delay=0.5, reconnect_max_delay=60.0)
+
+    for attempt, full in ((0, 0.5), (1, 1.0), (3, 4.0), (7, 60.0), (1000, 60.0)):
+        for _ in range(20):
+            assert full / 2 <= client._reconnect_delay(attempt) <= full
+
+
+def test_connect_returns_immediately_and_retries_with_backoff():
+    client = make_client(failures=3)
+
+    started = time.monotonic()
+    client.connect()
+    assert time.monotonic() - started < 0.5
+    try:
+        wait_for(client.is_connected)
+        attempts = client.client.attempts
+        assert len(attempts) == 4
+        gaps = [b - a for a, b in zip(attempts, attempts[1:])]
+        assert all(gap >= 0.009 for gap in gaps)
+        assert client.is_ready()
+    finally:
+        client.disconnect()
+    assert client._supervisor is None
+    assert not client.is_connected()
+
+
+def test_ready_only_after_subscriptions_are_acknowledged():
+    client = make_client(topics=["iot/device/+/status"])
+    client.connect()
+    try:
+        wait_for(client.is_connected)
+        assert client.client.subscribed == [[("iot/device/+/status", 0)]]
+        assert not client.is_ready()
+        client._on_subscribe(client.client, None, 6, (0,))
+        assert not client.is_ready()
+        client._on_subscribe(client.client, None, 7, (0,))
+        assert client.is_ready()
+
+        client._on_disconnect(client.client, None, 1)
+        assert not client.is_ready()
+    finally:
+        client.disconnect()
+
+
+def test_ready_endpoint_reports_mqtt_state(client, application, monkeypatch):
+    monkeypatch.setattr(application.mqtt_client, "is_ready", lambda: False)
+    response = client.get("/api/ready")
+    assert response.status_code == 503
+    assert response.get_json() == {"ready": False, "checks": {"mqtt": False}}
+
+    monkeypatch.setattr(application.mqtt_client, "is_ready", lambda: True)
+    response = client.get("/api/ready")
+    assert response.status_code == 200
+    assert response.get_json()["ready"] is True
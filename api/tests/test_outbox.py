@@ -0,0 +1,176 @@
+# tests/test_outbox.py
+import logging
+import threading
+import time
+
+from modules.mqtt_client import MQTTClient
+from modules.outbox import QUEUED, CommandOutbox
+
+
+def drain_all(outbox, publish):
+    outbox.drain(publish, lambda: True)
+    thread = outbox._drain_thread
+    if thread is not None:
+        thread.join(5)
+
+
+def recorder(sent):
+    def publish(topic, message, qos=None, device_id=None):
+        sent.append((topic, message))
+        return True
+    return publish
+
+
+def test_latest_command_wins_per_topic():
+    outbox = CommandOutbox(None, drain_rate=0)
+    outbox.put("a/command", "on")
+    outbox.put("b/command", "1")
+    outbox.put("a/command", "off")
+    assert len(outbox) == 2
+
+    sent = []
+    drain_all(outbox, recorder(sent))
+
+    assert sent == [("b/command", "1"), ("a/command", "off")]
+    assert len(outbox) == 0
+
+
+def test_expired_commands_are_not_sent():
+    outbox = CommandOutbox(None, drain_rate=0)
+    outbox.put("a/command", "on", ttl=-1)
+    outbox.put("b/command", "on")
+
+    sent = []
+    drain_all(outbox, recorder(sent))
+
+    assert sent == [("b/command", "on")]
+
+
+def test_overflow_drops_oldest_topic():
+    outbox = CommandOutbox(None, max_size=2, drain_rate=0)
+    for topic in ("a", "b", "c"):
+        outbox.put(topic, "x")
+
+    sent = []
+    drain_all(outbox, recorder(sent))
+
+    assert [topic for topic, _ in sent] == ["b", "c"]
+
+
+def test_failed_publish_keeps_command_for_next_drain():
+    outbox = CommandOutbox(None, drain_rate=0)
+    outbox.put("a/command", "on")
+
+    drain_all(outbox, lambda *args: False)
+    assert len(outbox) == 1
+
+    sent = []
+    drain_all(outbox, recorder(sent))
+    assert sent == [("a/command", "on")]
+
+
+def test_commands_persist_across_instances_and_reload(tmp_path):
+    path = str(tmp_path / "outbox.json")
+    first = CommandOutbox(path, fsync=False)
+    first.put("a/command", "on")
+    first.put("b/command", "off", ttl=-1)
+
+    second = CommandOutbox(path, fsync=False)
+    assert len(second) == 1
+
+    # Właściciel połączenia zmienia plik - reload zastępuje wpisy w pamięci
+    first.put("c/command", "on")
+    second.reload()
+    assert len(second) == 2
+
+
+def test_send_now_replaces_queued_command_for_the_topic():
+    outbox = CommandOutbox(None, drain_rate=0)
+    outbox.put("a/command", "old")
+    outbox.put("b/command", "old")
+
+    sent = []
+    publish = recorder(sent)
+    assert outbox.send_now("a/command", publish, "a/command", "new")
+
+    drain_all(outbox, publish)
+    assert sent == [("a/command", "new"), ("b/command", "old")]
+
+
+def test_send_now_during_drain_is_not_overtaken_by_stale_command():
+    outbox = CommandOutbox(None, drain_rate=0)
+    outbox.put("a/command", "old-a")
+    outbox.put("b/command", "old-b")
+
+    sent = []
+    publishing = threading.Event()
+    release = threading.Event()
+
+    def slow_publish(topic, message, qos=None, device_id=None):
+        if topic == "a/command":
+            publishing.set()
+            release.wait(5)
+        sent.append((topic, message))
+        return True
+
+    outbox.drain(slow_publish, lambda: True)
+    drain_thread = outbox._drain_thread
+    assert publishing.wait(5)
+
+    # Nowa komenda na temat b wydana w trakcie wysyłania starej komendy a
+    sender = threading.Thread(target=outbox.send_now, args=("b/command", slow_publish, "b/command", "NEW-b"))
+    sender.start()
+    time.sleep(0.05)
+    release.set()
+    sender.join(5)
+    drain_thread.join(5)
+
+    assert sent[0] == ("a/command", "old-a")
+    assert sent[-1] == ("b/command", "NEW-b")
+    assert len(outbox) == 0
+
+
+class FakePahoClient:
+    def __init__(self):
+        self.published = []
+
+    def publish(self, topic, message, qos):
+        self.published.append((topic, message))
+        return type("Info", (), {"rc": 0, "mid": len(self.published)})()
+
+
+class ConnectingOutbox(CommandOutbox):
+    # Połączenie nawiązane między sprawdzeniem _connected a put
+    def __init__(self, client):
+        super().__init__(None, drain_rate=0)
+        self.client = client
+
+    def put(self, *args, **kwargs):
+        if not self.client.is_connected():
+            self.client._on_connect(self.client.client, None, None, 0)
+        super().put(*args, **kwargs)
+
+
+def test_command_queued_while_connecting_is_still_drained():
+    client = MQTTClient("localhost", 1883, "", "", 60, logging.getLogger("tests.outbox"))
+    client.client = FakePahoClient()
+    client.outbox = outbox = ConnectingOutbox(client)
+
+    assert client.publish_many([("lamp/command", "on")], ["lamp"]) == [QUEUED]
+
+    thread = outbox._drain_thread
+    if thread is not None:
+        thread.join(5)
+    assert client.client.published == [("lamp/command", "on")]
+    assert len(outbox) == 0
+
+
+def test_command_put_as_drain_finishes_starts_a_new_drain():
+    outbox = CommandOutbox(None, drain_rate=0)
+    sent = []
+    outbox.put("a/command", "1")
+    drain_all(outbox, recorder(sent))
+    outbox.put("b/command", "2")
+    drain_all(outbox, recorder(sent))
+
+    assert sent == [("a/command", "1"), ("b/command", "2")]
@@ -0,0 +1,69 @@
+# tests/test_payload_decoder.py
+import json
+
+from modules.device_manager import DeviceManager
+from modules.payload_decoder import PayloadSpec, payload_specs
+
+
+def test_decode_typed_values():
+    assert PayloadSpec("number").decode(" 21 ") == 21
+    assert PayloadSpec("number").decode("21.5") == 21.5
+    assert PayloadSpec("boolean").decode("ON") is True
+    assert PayloadSpec("boolean").decode("0") is False
+    assert PayloadSpec({"type": "enum", "options": ["armed", "disarmed"]}).decode("armed") == "armed"
+    assert PayloadSpec("json").decode('{"a": 1}') == {"a": 1}
+    assert PayloadSpec().decode("tekst") == "tekst"
+
+
+def test_undecodable_payload_is_returned_unchanged():
+    assert PayloadSpec("number").decode("abc") == "abc"
+    assert PayloadSpec("boolean").decode("może") == "może"
+    assert PayloadSpec({"type": "enum", "options": ["armed"]}).decode("open") == "open"
+    assert PayloadSpec("json").decode("{") == "{"
+
+
+def test_deadband_suppresses_small_numeric_changes():
+    spec = PayloadSpec({"type": "number", "deadband": 0.5})
+
+    assert spec.is_change(None, 21.0)
+    assert not spec.is_change(21.0, 21.3)
+    assert not spec.is_change(21, 21.4)
+    assert spec.is_change(21.0, 21.5)
+    assert spec.is_change(21.0, 20.4)
+    assert spec.is_change(21.0, "błąd")
+
+
+def test_without_deadband_any_difference_is_a_change():
+    spec = PayloadSpec("number")
+
+    assert not spec.is_change(21, 21.0)
+    assert spec.is_change(21.0, 21.01)
+    assert not PayloadSpec("boolean").is_change(True, True)
+    assert PayloadSpec("boolean").is_change(1, True)
+
+
+def test_payload_specs_from_device_definition():
+    specs = payload_specs({"payloads": {"status": "boolean", "t": {"type": "number", "deadband": 0.2}}})
+
+    assert specs["status"].type == "boolean"
+    assert specs["t"].deadband == 0.2
+    assert payload_specs({}) == {}
+
+
+def test_device_manager_notifies_only_changes_outside_the_deadband(tmp_path):
+    sensor = {
+        "id": "temp", "name": "Termometr", "type": "sensor", "room": "kitchen",
+        "topic": "iot/device/temp", "payloads": {"temperature": {"type": "number", "deadband": 0.5}},
+    }
+    path = tmp_path / "devices.json"
+    path.write_text(json.dumps({"devices": [sensor], "rooms": []}), encoding="utf-8")
+    manager = DeviceManager({"DEVICES_FILE": str(path), "CONFIG_FSYNC": False})
+    changes = []
+    manager.add_status_listener(lambda device_id, change: changes.append(change.get("values")))
+
+    for payload in ("21.0", "21.2", "21.6", "21.9"):
+        manager.update_device_status_from_mqtt("iot/device/temp/value/temperature", payload)
+
+    assert [c for c in changes if c] == [{"temperature": 21.0}, {"temperature": 21.6}]
+    assert manager.get_device_status("temp")["values"]["temperature"] == 21.6
+    manager.close()
@@ -0,0 +1,81 @@
+# tests/test_response_cache.py
+import gzip
+
+from modules.response_cache import CachedBody, ResponseCache
+
+
+class Accept(dict):
+    # Zamiennik request.accept_encodings - brak kodowania oznacza 0
+    def __getitem__(self, key):
+        return self.get(key, 0)
+
+
+def test_small_body_is_not_compressed():
+    entry = CachedBody(b"[]", min_compress_size=512)
+
+    assert entry.encodings == {}
+    assert entry.select(Accept(gzip=1)) == (b"[]", None)
+
+
+def test_gzip_variant_is_selected_only_when_accepted():
+    body = b'{"id": "lamp"}' * 100
+    entry = CachedBody(body, min_compress_size=512)
+
+    data, encoding = entry.select(Accept(gzip=1))
+    assert encoding == "gzip"
+    assert gzip.decompress(data) == body
+    assert entry.select(Accept()) == (body, None)
+    # Ta sama treść - ten sam ETag i te same bajty gzip (mtime=0)
+    assert CachedBody(body).etag == entry.etag
+    assert CachedBody(body).encodings["gzip"] == entry.encodings["gzip"]
+
+
+def test_body_is_built_once_until_invalidated():
+    builds = []
+    cache = ResponseCache()
+    cache.register("devices", lambda: builds.append(1) or f"[{len(builds)}]".encode())
+    cache.register("rooms", lambda: b"[]")
+
+    first = cache.get("devices")
+    assert cache.get("devices") is first
+    cache.invalidate("rooms")
+    assert cache.get("devices") is first
+    cache.invalidate("devices")
+    second = cache.get("devices")
+
+    assert len(builds) == 2
+    assert second.body == b"[2]" and second.etag != first.etag
+
+
+def test_invalidation_during_build_is_not_cached():
+    cache = ResponseCache()
+
+    def build():
+        cache.invalidate("devices")
+        return b"[]"
+
+    cache.register("devices", build)
+    assert cache.get("devices") is not cache.get("devices")
+
+
+def test_endpoint_returns_not_modified_for_matching_etag(client):
+    response = client.get("/api/devices")
+    etag = response.headers["ETag"]
+
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == "no-cache"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    not_modified = client.get("/api/devices", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["ETag"] == etag
+
+
+def test_endpoint_etag_changes_after_configuration_change(client):
+    etag = client.get("/api/scenes").headers["ETag"]
+    scene = {"id": "cache_test", "name": "Test", "commands": [{"room": "living_room", "command": "off"}]}
+    assert client.post("/api/scenes", json=scene).status_code == 200
+
+    response = client.get("/api/scenes", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert any(item["id"] == "cache_test" for item in response.get_json())
+    assert client.delete("/api/scene/cache_test").status_code == 200
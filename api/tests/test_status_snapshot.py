@@ -0,0 +1,114 @@
+# tests/test_status_snapshot.py
+import json
+import time
+
+from modules.device_manager import DeviceManager
+from modules.status_snapshot import StatusSnapshot
+
+
+def test_save_writes_only_when_dirty(tmp_path):
+    path = tmp_path / "status.json"
+    state = {"lamp": {"status": "on"}}
+    snapshot = StatusSnapshot(str(path), lambda: state, fsync=False)
+
+    assert snapshot.save() is False
+    assert not path.exists()
+    snapshot.mark_dirty()
+    assert snapshot.save() is True
+    assert snapshot.save() is False
+
+    saved_at, devices = snapshot.load()
+    assert devices == state and saved_at <= time.time()
+
+
+def test_missing_or_corrupt_file_loads_empty_state(tmp_path):
+    path = tmp_path / "status.json"
+    snapshot = StatusSnapshot(str(path), dict, logger=None)
+    assert snapshot.load() == (None, {})
+
+    path.write_text("{nie json", encoding="utf-8")
+    assert snapshot.load() == (None, {})
+
+
+def test_close_stops_thread_and_writes_pending_state(tmp_path):
+    path = tmp_path / "status.json"
+    snapshot = StatusSnapshot(str(path), lambda: {"lamp": {}}, interval=60.0, fsync=False)
+    snapshot.start()
+    snapshot.mark_dirty()
+
+    snapshot.close()
+
+    assert snapshot._thread is None
+    assert json.loads(path.read_text(encoding="utf-8"))["devices"] == {"lamp": {}}
+
+
+def make_manager(tmp_path, devices):
+    path = tmp_path / "devices.json"
+    if not path.exists():
+        path.write_text(json.dumps({"devices": devices, "rooms": []}), encoding="utf-8")
+    return DeviceManager({
+        "DEVICES_FILE": str(path),
+        "CONFIG_FSYNC": False,
+        "STATUS_SNAPSHOT_FILE": str(tmp_path / "status.json"),
+        "LIVENESS_TIMEOUT": 60,
+    })
+
+
+def test_restart_restores_last_known_state(tmp_path):
+    devices = [
+        {"id": "lamp", "type": "switch", "room": "kitchen", "topic": "iot/device/lamp"},
+        {"id": "sensor", "type": "sensor", "room": "kitchen", "topic": "iot/device/sensor"},
+        {"id": "fan", "type": "fan", "room": "kitchen", "topic": "iot/device/fan", "heartbeat_timeout": 0},
+    ]
+    manager = make_manager(tmp_path, devices)
+    manager.start_persistence()
+    manager.update_device_status_from_mqtt("iot/device/lamp/status", "on")
+    manager.update_device_status_from_mqtt("iot/device/sensor/value/temperature", "21.5")
+    manager.update_device_status_from_mqtt("iot/device/fan/status", "on")
+    manager.close()
+
+    # Czujnik milczy dłużej niż jego termin wygaśnięcia
+    path = tmp_path / "status.json"
+    data = json.loads(path.read_text(encoding="utf-8"))
+    data["devices"]["sensor"]["last_seen"] -= 120
+    data["devices"]["removed"] = {"status": "on", "online": True}
+    path.write_text(json.dumps(data), encoding="utf-8")
+
+    restarted = make_manager(tmp_path, devices)
+    lamp = restarted.get_device_status("lamp")
+    sensor = restarted.get_device_status("sensor")
+
+    assert lamp["status"] == "on" and lamp["online"] is True
+    assert "lamp" in restarted.liveness
+    assert sensor["values"] == {"temperature": "21.5"} and sensor["online"] is False
+    assert restarted.get_device_status("fan")["online"] is True
+    assert restarted.get_device_status("removed") is None
+    restarted.close()
+
+
+def test_corrupt_snapshot_entries_are_skipped(tmp_path, capsys):
+    devices = [
+        {"id": "lamp", "type": "switch", "room": "kitchen", "topic": "iot/device/lamp"},
+        {"id": "sensor", "type": "sensor", "room": "kitchen", "topic": "iot/device/sensor"},
+        {"id": "fan", "type": "fan", "room": "kitchen", "topic": "iot/device/fan"},
+        {"id": "door", "type": "sensor", "room": "kitchen", "topic": "iot/device/door"},
+    ]
+    (tmp_path / "status.json").write_text(json.dumps({"saved_at": time.time(), "devices": {
+        "lamp": {"status": "on", "online": True, "last_seen": time.time()},
+        "sensor": ["on"],
+        "fan": {"status": "on", "online": True, "last_seen": "wczoraj"},
+        "door": {"values": [1, 2]},
+    }}), encoding="utf-8")
+
+    manager = make_manager(tmp_path, devices)
+
+    assert manager.get_device_status("lamp")["status"] == "on"
+    for device_id in ("sensor", "fan", "door"):
+        assert manager.get_device_status(device_id) == {"online": False, "last_seen": None, "status": None, "values": {}}
+    assert capsys.readouterr().out.count("pominięto") == 3
+    manager.close()
+
+    (tmp_path / "status.json").write_text(json.dumps({"devices": ["lamp"]}), encoding="utf-8")
+    manager = make_manager(tmp_path, devices)
+    assert manager.get_device_status("lamp")["status"] is None
+    manager.close()
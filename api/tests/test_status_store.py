@@ -0,0 +1,76 @@
+# tests/test_status_store.py
+from modules.status_store import EMPTY_STATUS, DeviceStatus, StatusStore
+
+
+def test_snapshot_is_not_affected_by_later_updates():
+    store = StatusStore(shards=1)
+    store.put("lamp", EMPTY_STATUS.with_changes({"status": "on"}))
+
+    snapshot = store.items()
+    record = store.get("lamp")
+    store.update("lamp", lambda previous: previous.with_changes({"status": "off"}))
+    store.put("fan", EMPTY_STATUS)
+
+    assert snapshot == [("lamp", record)]
+    assert record.status == "on"
+    assert store.get("lamp").status == "off"
+    assert len(store) == 2
+
+
+def test_update_returns_previous_and_new_record():
+    store = StatusStore()
+    previous, record = store.update("lamp", lambda previous: EMPTY_STATUS.with_changes({"online": True}))
+    assert previous is None and record.online
+
+    previous, record = store.update("lamp", lambda previous: None)
+    assert previous.online and record is None
+    assert "lamp" not in store
+
+
+def test_remove_and_replace_all():
+    store = StatusStore(shards=4)
+    store.put("a", EMPTY_STATUS)
+    store.put("b", EMPTY_STATUS)
+    store.remove("a")
+    assert sorted(device_id for device_id, _ in store.items()) == ["b"]
+
+    store.replace_all({"c": EMPTY_STATUS, "d": EMPTY_STATUS})
+    assert sorted(device_id for device_id, _ in store.items()) == ["c", "d"]
+    assert store.get("b") is None
+
+
+def test_values_are_merged_and_schemas_shared():
+    first = EMPTY_STATUS.with_changes({"values": {"temperature": 21.5}})
+    first = first.with_changes({"values": {"humidity": 40, "temperature": 22}})
+    second = EMPTY_STATUS.with_changes({"values": {"temperature": 1, "humidity": 2}})
+
+    assert first.values == {"temperature": 22, "humidity": 40}
+    assert first.value("humidity") == 40
+    assert first.value("pressure", "-") == "-"
+    # Te same nazwy wartości w tej samej kolejności - jedna współdzielona krotka
+    assert first.value_names is second.value_names
+
+
+def test_dict_round_trip():
+    data = {"online": True, "last_seen": 123.5, "status": "on", "values": {"level": 50}}
+    record = DeviceStatus.from_dict(data)
+
+    assert record.as_dict() == data
+    assert DeviceStatus.from_dict({}) == EMPTY_STATUS
+
+
+def test_update_of_existing_device_does_not_copy_the_shard():
+    store = StatusStore(shards=1)
+    store.put("lamp", EMPTY_STATUS)
+    shard = store._shards[0]
+
+    store.update("lamp", lambda previous: previous.with_changes({"status": "on"}))
+    assert store._shards[0] is shard
+    assert store.get("lamp").status == "on"
+
+    # Dodanie i usunięcie nadal tworzą nową kopię sekcji
+    store.put("fan", EMPTY_STATUS)
+    assert store._shards[0] is not shard
+    shard = store._shards[0]
+    store.remove("fan")
+    assert store._shards[0] is not shard
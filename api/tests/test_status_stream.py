@@ -0,0 +1,49 @@
+# tests/test_status_stream.py
+import threading
+
+from modules.status_stream import StatusStream
+
+
+def test_event_ids_round_trip_only_for_this_process():
+    stream = StatusStream()
+    other = StatusStream()
+
+    assert stream.parse_id(stream.format_id(7)) == 7
+    assert stream.parse_id(other.format_id(7)) is None
+    assert stream.parse_id("garbage") is None
+    assert stream.parse_id(None) is None
+
+
+def test_events_since_returns_events_after_cursor():
+    stream = StatusStream()
+    stream.publish("lamp", {"status": "on"})
+    stream.publish("fan", None)
+
+    assert stream.cursor == 2
+    assert stream.events_since(0) == [(1, "lamp", {"status": "on"}), (2, "fan", None)]
+    assert stream.events_since(1) == [(2, "fan", None)]
+    assert stream.events_since(2) == []
+
+
+def test_cursor_outside_backlog_requires_full_state():
+    stream = StatusStream(backlog=2)
+    for i in range(4):
+        stream.publish("lamp", {"status": i})
+
+    # Zdarzenia 1-2 wypadły z bufora
+    assert stream.events_since(1) is None
+    assert [event[0] for event in stream.events_since(2)] == [3, 4]
+    # Kursor z poprzedniego uruchomienia serwera
+    assert stream.events_since(10) is None
+
+
+def test_wait_for_events_wakes_on_publish_and_times_out():
+    stream = StatusStream()
+    assert stream.wait_for_events(0, 0.01) == []
+
+    timer = threading.Timer(0.05, stream.publish, args=("lamp", {"online": True}))
+    timer.start()
+    events = stream.wait_for_events(0, 5)
+    timer.join()
+
+    assert events == [(1, "lamp", {"online": True})]
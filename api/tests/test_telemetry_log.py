@@ -0,0 +1,103 @@
+# tests/test_telemetry_log.py
+import os
+
+from modules.telemetry_log import RECORD, TelemetryLog
+
+
+def open_log(directory, **kwargs):
+    kwargs.setdefault("fsync", False)
+    kwargs.setdefault("retention_days", None)
+    return TelemetryLog(str(directory), **kwargs)
+
+
+def fill(log, count, device_id="sensor", value_name="temperature", start=1000.0):
+    for i in range(count):
+        log.append(device_id, value_name, start + i, float(i))
+    log.flush()
+
+
+def test_query_returns_range_of_one_series(tmp_path):
+    log = open_log(tmp_path, index_interval=4)
+    fill(log, 50)
+    fill(log, 50, value_name="humidity")
+
+    points = list(log.query("sensor", "temperature", 1010, 1014))
+    assert points == [(1010.0 + i, 10.0 + i) for i in range(5)]
+    assert list(log.query("sensor", "pressure", 0, 2000)) == []
+    log.close()
+
+
+def test_records_span_segments_and_survive_reopen(tmp_path):
+    log = open_log(tmp_path, segment_size=RECORD.size * 10, index_interval=3)
+    fill(log, 35)
+    log.close()
+    assert len([name for name in os.listdir(tmp_path) if name.endswith(".seg")]) == 4
+
+    reopened = open_log(tmp_path, segment_size=RECORD.size * 10, index_interval=3)
+    points = list(reopened.query("sensor", "temperature", 1008, 1031))
+    assert [timestamp for timestamp, _ in points] == [1008.0 + i for i in range(24)]
+    reopened.close()
+
+
+def test_partial_record_and_missing_index_are_repaired_on_open(tmp_path):
+    log = open_log(tmp_path, index_interval=2)
+    fill(log, 6)
+    log.close()
+    segment_path = os.path.join(tmp_path, "00000001.seg")
+    with open(segment_path, "ab") as f:
+        f.write(b"\x00" * 7)
+    os.remove(os.path.join(tmp_path, "00000001.idx"))
+
+    reopened = open_log(tmp_path, index_interval=2)
+    assert os.path.getsize(segment_path) == 6 * RECORD.size
+    assert len(list(reopened.query("sensor", "temperature", 0, 2000))) == 6
+    reopened.close()
+
+
+def test_read_only_log_sees_owner_writes(tmp_path):
+    owner = open_log(tmp_path)
+    reader = open_log(tmp_path, read_only=True)
+    fill(owner, 3)
+
+    assert [value for _, value in reader.query("sensor", "temperature", 0, 2000)] == [0.0, 1.0, 2.0]
+    fill(owner, 2, start=2000.0)
+    assert len(list(reader.query("sensor", "temperature", 0, 3000))) == 5
+    owner.close()
+
+
+def test_retention_removes_oldest_segments_over_size_limit(tmp_path):
+    log = open_log(tmp_path, segment_size=RECORD.size * 10, max_bytes=RECORD.size * 25)
+    fill(log, 30)
+
+    assert log.apply_retention() == 1
+    points = list(log.query("sensor", "temperature", 0, 2000))
+    assert points[0] == (1010.0, 10.0) and len(points) == 20
+    log.close()
+
+
+def test_compact_merges_small_segments_and_filters_series(tmp_path):
+    log = open_log(tmp_path, segment_size=RECORD.size * 100, index_interval=2)
+    for start in (0, 10, 20):
+        fill(log, 5, start=start)
+        fill(log, 5, value_name="humidity", start=start + 5)
+        log._close_active()
+
+    assert log.compact(min_size=RECORD.size * 20) == 3
+    assert len(log._segments) == 1
+    assert len(list(log.query("sensor", "humidity", 0, 100))) == 15
+
+    log.compact(keep_series={("sensor", "temperature")})
+    assert list(log.query("sensor", "humidity", 0, 100)) == []
+    assert len(list(log.query("sensor", "temperature", 0, 100))) == 15
+    log.close()
+
+
+def test_on_status_change_records_finite_numeric_values(tmp_path):
+    log = open_log(tmp_path)
+    log.on_status_change("sensor", {"last_seen": 5.0, "values": {"temperature": "21.5", "label": "x", "bad": "inf"}})
+    log.on_status_change("sensor", None)
+    log.flush()
+
+    assert list(log.query("sensor", "temperature", 0, 10)) == [(5.0, 21.5)]
+    assert list(log.query("sensor", "bad", 0, 10)) == []
+    log.close()
@@ -0,0 +1,68 @@
+# tests/test_timeseries.py
+from modules.timeseries import RingSeries, TimeSeriesStore, downsample
+
+
+def test_ring_series_overwrites_oldest_points():
+    series = RingSeries(3)
+    for i in range(5):
+        series.append(float(i), i * 10.0)
+
+    assert len(series) == 3
+    assert series.first_timestamp() == 2.0
+    assert series.last() == (4.0, 40.0)
+    assert list(series.iter_range(0, 10)) == [(2.0, 20.0), (3.0, 30.0), (4.0, 40.0)]
+    assert list(series.iter_range(2.5, 3.5)) == [(3.0, 30.0)]
+
+
+def test_empty_ring_series():
+    series = RingSeries(2)
+    assert series.first_timestamp() is None
+    assert series.last() is None
+    assert list(series.iter_range(0, 10)) == []
+
+
+def test_downsample_aggregates_buckets():
+    points = [(0.0, 1.0), (5.0, 3.0), (10.0, 10.0), (25.0, 4.0), (31.0, 99.0)]
+
+    assert downsample(points, 0, 30, 10) == [
+        {"t": 0, "min": 1.0, "max": 3.0, "count": 2, "avg": 2.0},
+        {"t": 10, "min": 10.0, "max": 10.0, "count": 1, "avg": 10.0},
+        {"t": 20, "min": 4.0, "max": 4.0, "count": 1, "avg": 4.0},
+    ]
+
+
+def test_store_records_numeric_values_from_status_changes():
+    store = TimeSeriesStore(capacity=16)
+    store.on_status_change("sensor", {"last_seen": 100.0, "values": {"temperature": "21.5", "label": "hot"}})
+    store.on_status_change("sensor", {"last_seen": 110.0, "values": {"temperature": 22, "humidity": "nan"}})
+    store.on_status_change("sensor", {"status": "on"})
+
+    assert store.value_names("sensor") == ["temperature"]
+    assert store.query("sensor", "temperature", 100, 120, 60) == [
+        {"t": 100, "min": 21.5, "max": 22.0, "count": 2, "avg": 21.75}
+    ]
+    assert store.query("sensor", "label", 0, 200, 60) == []
+
+    store.on_status_change("sensor", None)
+    assert store.value_names("sensor") == []
+
+
+def test_values_without_last_seen_use_receive_time():
+    store = TimeSeriesStore(capacity=4)
+    store.on_status_change("sensor", {"values": {"temperature": 20}})
+
+    timestamp, value = store.get_series("sensor", "temperature").last()
+    assert value == 20.0 and timestamp > 0
+
+
+def test_range_returns_a_copy_taken_under_the_lock():
+    store = TimeSeriesStore(capacity=3)
+    for timestamp in (1.0, 2.0, 3.0):
+        store.append("sensor", "temperature", timestamp, timestamp * 10)
+
+    points = store.range("sensor", "temperature", 2.0, 10.0)
+    store.append("sensor", "temperature", 4.0, 40.0)
+
+    assert points == [(2.0, 20.0), (3.0, 30.0)]
+    assert store.range("sensor", "temperature", 0, 10.0) == [(2.0, 20.0), (3.0, 30.0), (4.0, 40.0)]
+    assert store.range("sensor", "humidity", 0, 10.0) == []
@@ -0,0 +1,52 @@
+# tests/test_topic_router.py
+from modules.topic_router import TopicRouter
+
+
+def handlers_for(router, topic):
+    return sorted(router.match(topic))
+
+
+def test_exact_and_single_level_wildcard():
+    router = TopicRouter()
+    router.add("iot/device/lamp/status", "exact")
+    router.add("iot/device/+/status", "plus")
+
+    assert handlers_for(router, "iot/device/lamp/status") == ["exact", "plus"]
+    assert handlers_for(router, "iot/device/fan/status") == ["plus"]
+    assert handlers_for(router, "iot/device/fan/value/x") == []
+    assert handlers_for(router, "iot/device/status") == []
+
+
+def test_multi_level_wildcard_matches_parent_and_descendants():
+    router = TopicRouter()
+    router.add("iot/device/+/value/#", "values")
+
+    assert handlers_for(router, "iot/device/a/value/temperature") == ["values"]
+    assert handlers_for(router, "iot/device/a/value/x/y") == ["values"]
+    # "a/#" pasuje również do samego "a"
+    assert handlers_for(router, "iot/device/a/value") == ["values"]
+    assert handlers_for(router, "iot/device/a/command") == []
+
+
+def test_wildcards_do_not_match_system_topics_at_first_level():
+    router = TopicRouter()
+    router.add("#", "all")
+    router.add("+/broker/uptime", "plus")
+    router.add("$SYS/#", "sys")
+
+    assert handlers_for(router, "$SYS/broker/uptime") == ["sys"]
+    assert handlers_for(router, "home/broker/uptime") == ["all", "plus"]
+
+
+def test_remove_handler_and_filter_bookkeeping():
+    router = TopicRouter()
+    router.add("a/+/c", "first")
+    router.add("a/+/c", "second")
+    assert len(router) == 1 and "a/+/c" in router
+
+    assert router.remove("a/+/c", "first")
+    assert handlers_for(router, "a/b/c") == ["second"]
+    assert router.remove("a/+/c")
+    assert handlers_for(router, "a/b/c") == []
+    assert "a/+/c" not in router
+    assert not router.remove("a/+/c")
@@ -0,0 +1,151 @@
+# tests/test_worker_sync.py
+import json
+import logging
+import os
+import socket
+import threading
+import time
+
+from modules.device_manager import DeviceManager
+from modules.worker_sync import WorkerCoordinator, _Peer, acquire_owner_lock
+
+LAMP = {"id": "lamp", "name": "Lampa", "type": "switch", "room": "kitchen", "topic": "iot/device/lamp"}
+LOGGER = logging.getLogger("tests.worker_sync")
+
+
+class FakeMqttClient:
+    def __init__(self):
+        self.published = []
+        self.forwarder = None
+
+    def is_connected(self):
+        return True
+
+    def is_ready(self):
+        return True
+
+    def set_publish_forwarder(self, forwarder):
+        self.forwarder = forwarder
+
+    def publish_many(self, messages, device_ids=None):
+        self.published.extend(messages)
+        return [True] * len(messages)
+
+    def get_command_stats(self):
+        return {"sent": len(self.published)}
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def make_manager(tmp_path, name):
+    path = tmp_path / f"{name}.json"
+    if not path.exists():
+        path.write_text(json.dumps({"devices": [LAMP], "rooms": []}), encoding="utf-8")
+    return DeviceManager({"DEVICES_FILE": str(path), "CONFIG_FSYNC": False})
+
+
+def test_stalled_observer_is_dropped_without_blocking_the_broadcast():
+    coordinator = WorkerCoordinator(None, None, "", "", LOGGER)
+    owner_end, observer_end = socket.socketpair()
+    stalled = _Peer(owner_end, LOGGER, max_pending=2)
+    healthy_end, healthy_reader = socket.socketpair()
+    healthy = _Peer(healthy_end, LOGGER)
+    coordinator._peers = [stalled, healthy]
+
+    # Obserwator nie czyta - bufor gniazda i kolejka się zapełniają
+    message = {"type": "status", "changes": {"status": "x" * (1 << 20)}}
+    sender = threading.Thread(
+        target=lambda: [coordinator._broadcast(message) for _ in range(20)], daemon=True
+    )
+    sender.start()
+    sender.join(2.0)
+
+    assert not sender.is_alive()
+    assert stalled.closed and coordinator._peers == [healthy]
+    assert not stalled.send(b"late\n")
+    healthy.close()
+    observer_end.close()
+    healthy_reader.close()
+
+
+def test_observer_receives_state_and_forwards_changes_to_owner(tmp_path):
+    socket_path = str(tmp_path / "sync.sock")
+    lock_path = str(tmp_path / "sync.lock")
+    owner_manager = make_manager(tmp_path, "owner")
+    observer_manager = make_manager(tmp_path, "observer")
+    owner_mqtt, observer_mqtt = FakeMqttClient(), FakeMqttClient()
+    became_owner = threading.Event()
+
+    owner = WorkerCoordinator(owner_manager, owner_mqtt, socket_path, lock_path, LOGGER)
+    owner.start(became_owner.set)
+    assert became_owner.wait(5.0)
+    observer = WorkerCoordinator(observer_manager, observer_mqtt, socket_path, lock_path, LOGGER,
+                                 retry_interval=0.05)
+    observer.start(None)
+    assert wait_until(observer.is_synced)
+    assert not observer.is_owner and observer.is_mqtt_ready()
+
+    # Zmiana statusu u właściciela trafia do obserwatora z tą samą wersją
+    owner_manager.update_device_status_from_mqtt("iot/device/lamp/status", "on")
+    assert wait_until(lambda: (observer_manager.get_device_status("lamp") or {}).get("status") == "on")
+    assert observer_manager.get_device_version("lamp") == owner_manager.get_device_version("lamp")
+
+    # Zmiany konfiguracji i komendy obserwatora wykonuje właściciel
+    success, _ = observer_manager.add_device(dict(LAMP, id="fan", topic="iot/device/fan"))
+    assert success
+    assert owner_manager.get_device("fan") is not None
+    assert wait_until(lambda: observer_manager.get_device("fan") is not None)
+    assert observer_mqtt.forwarder([("iot/device/fan/command", "on", 0, None)], ["fan"]) == [True]
+    assert owner_mqtt.published == [["iot/device/fan/command", "on", 0, None]]
+
+
+def test_second_owner_is_refused_until_the_first_releases_the_lock(tmp_path):
+    lock_path = str(tmp_path / "owner.lock")
+    first = acquire_owner_lock(lock_path)
+
+    assert first is not None
+    assert acquire_owner_lock(lock_path, timeout=0.1, retry_interval=0.05) is None
+    first.close()
+    second = acquire_owner_lock(lock_path)
+    assert second is not None
+    second.close()
+
+
+def test_reloader_parent_leaves_the_owner_lock_to_the_serving_child(application, tmp_path, monkeypatch):
+    lock_path = str(tmp_path / "owner.lock")
+    locks = []
+
+    def start_services():
+        lock = acquire_owner_lock(lock_path)
+        if lock is None:
+            raise RuntimeError("Inny proces jest już właścicielem")
+        locks.append(lock)
+
+    def run(**kwargs):
+        # Reloader Werkzeuga uruchamia app.py ponownie w procesie potomnym
+        if kwargs["debug"] and os.environ.get("WERKZEUG_RUN_MAIN") != "true":
+            monkeypatch.setenv("WERKZEUG_RUN_MAIN", "true")
+            application.main()
+
+    monkeypatch.setattr(application, "start_services", start_services)
+    monkeypatch.setattr(application.app, "run", run)
+    monkeypatch.setitem(application.app.config, "DEBUG", True)
+    monkeypatch.delenv("WERKZEUG_RUN_MAIN", raising=False)
+
+    application.main()
+    assert len(locks) == 1
+
+    # Bez DEBUG nie ma reloadera - usługi startują w jedynym procesie
+    locks.pop().close()
+    monkeypatch.setitem(application.app.config, "DEBUG", False)
+    monkeypatch.delenv("WERKZEUG_RUN_MAIN")
+    application.main()
+    assert len(locks) == 1
+    locks.pop().close()
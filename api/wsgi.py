@@ -1,4 +1,8 @@
-from app import app
+from app import app, start_services
+
+# Każdy worker gunicorna uruchamia własne usługi w tle (bez --preload)
+start_services()
 
 if __name__ == "__main__":
-    app.run()
+    # Usługi działają już w tym procesie - reloader uruchomiłby je drugi raz
+    app.run(use_reloader=False)